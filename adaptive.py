@@ -0,0 +1,271 @@
+"""
+Adaptive per-body time sampling for precomputed trajectories.
+
+Instead of storing every body at every one of the Nframes frames, each body
+keeps only the sample times (knots) needed to reproduce its motion within a
+configured error, with positions and velocities at each knot. Positions in
+between are rebuilt with cubic Hermite interpolation.
+
+A parent-relative Kepler orbit repeats exactly every period, so a body whose
+period is shorter than the simulated span stores a single orbit and is
+looked up by phase; longer-period bodies store the span. Knots are then
+chosen by refinement: sampling starts at INITIAL_KNOTS_PER_ORBIT per period,
+and any interval whose interpolated positions (checked at 1/4, 1/2 and 3/4
+of the way) stray more than the body's error budget from the exact Kepler
+solution is split in half. The knots are then checked at every frame of the
+grid, and intervals that still fail are split again, so the measured error
+(AdaptiveTrajectories.errors) is the largest error any frame can show. Outer
+planets end up with a few dozen knots, short-period moons with one orbit's
+worth, and high-eccentricity orbits get dense knots only around periapsis.
+
+Positions are relative to each body's parent, like Ephemeris.trajectories.
+An absolute moon position adds up the errors of every track along its parent
+chain, so with parent_rows the budget max_error is split evenly along the
+longest chain through each body; absolute positions then stay within
+max_error too.
+"""
+import numpy as np
+
+from ephemeris import propagate_batch
+
+# Default largest interpolation error per body, in AU (about 150 km)
+DEFAULT_MAX_ERROR = 1e-6
+
+# Initial knots per orbital period before refinement
+INITIAL_KNOTS_PER_ORBIT = 16
+
+# Half-width of the central difference used for knot velocities (days)
+VELOCITY_STEP_DAYS = 1e-3
+
+# Intervals shorter than this (days) are never split further
+MIN_INTERVAL_DAYS = 1e-6
+
+# Fractions of each interval where the interpolation error is checked
+CHECK_FRACTIONS = (0.25, 0.5, 0.75)
+
+
+def _hermite(p0, v0, p1, v1, h, t):
+    """
+    Cubic Hermite interpolation between two knots.
+
+    Args:
+        p0, p1: Positions at the knots (..., 3)
+        v0, v1: Velocities at the knots (..., 3), per day
+        h: Interval length in days (...)
+        t: Fraction of the interval, 0..1 (...)
+
+    Returns:
+        Interpolated positions (..., 3)
+    """
+    t = t[..., None]
+    h = h[..., None]
+    t2 = t * t
+    t3 = t2 * t
+    return ((2*t3 - 3*t2 + 1) * p0 + (t3 - 2*t2 + t) * h * v0 +
+            (-2*t3 + 3*t2) * p1 + (t3 - t2) * h * v1)
+
+
+def _interpolate(knots, pos, vel, days):
+    """Hermite interpolation of one body's knots at days within [knots[0], knots[-1]]."""
+    j = np.clip(np.searchsorted(knots, days, side='right') - 1, 0, len(knots) - 2)
+    h = knots[j + 1] - knots[j]
+    return _hermite(pos[j], vel[j], pos[j + 1], vel[j + 1], h, (days - knots[j]) / h), j
+
+
+def chain_lengths(parent_rows):
+    """
+    Longest root-to-leaf chain of parent-relative tracks through each body.
+
+    A body at depth d whose deepest descendant is h levels below it lies on
+    chains of up to d + h + 1 tracks (planets without moons: 1).
+
+    Args:
+        parent_rows: Row of each body's parent (-1 for primaries)
+
+    Returns:
+        Integer array of chain lengths
+    """
+    parent_rows = np.asarray(parent_rows, dtype=int)
+    has_parent = parent_rows >= 0
+    depth = np.zeros(len(parent_rows), dtype=int)
+    while True:
+        deeper = np.where(has_parent, depth[parent_rows] + 1, 0)
+        if np.array_equal(deeper, depth):
+            break
+        depth = deeper
+    # VECTORIZED: heights propagate up one tree level at a time, deepest first
+    height = np.zeros(len(parent_rows), dtype=int)
+    for d in range(depth.max(initial=0), 0, -1):
+        level = np.flatnonzero(depth == d)
+        np.maximum.at(height, parent_rows[level], height[level] + 1)
+    return depth + height + 1
+
+
+def _states(elements, days):
+    """Positions and central-difference velocities of one body at given days."""
+    p = propagate_batch(elements, days)[0]
+    ahead = propagate_batch(elements, days + VELOCITY_STEP_DAYS)[0]
+    behind = propagate_batch(elements, days - VELOCITY_STEP_DAYS)[0]
+    return p, (ahead - behind) / (2 * VELOCITY_STEP_DAYS)
+
+
+class AdaptiveTrajectories:
+    """
+    Knot-based trajectories of many bodies over a fixed frame grid.
+
+    All bodies' knots are stored in flat arrays, body after body, so the
+    knots around any set of (body, frame) queries are found with a single
+    searchsorted call.
+
+    Attributes:
+        n_frames: Length of the frame grid
+        days_per_frame: Days between frames
+        domain: Days covered by each body's knots (its period if periodic, else the span)
+        periodic: Whether each body wraps around its domain
+        knots: Knot times in days from frame 0 (all bodies, concatenated)
+        offsets: knots[offsets[i]:offsets[i + 1]] belong to body i
+        pos: Knot positions (n_knots, 3) in AU
+        vel: Knot velocities (n_knots, 3) in AU/day
+        budget: Largest parent-relative error allowed for each body (AU)
+        errors: Largest parent-relative error measured over every frame (AU)
+    """
+
+    def __init__(self, n_frames, days_per_frame, domain, periodic, knots, offsets, pos, vel,
+                 budget=None, errors=None):
+        self.n_frames = n_frames
+        self.days_per_frame = days_per_frame
+        self.domain = domain
+        self.periodic = periodic
+        self.knots = knots
+        self.offsets = offsets
+        self.pos = pos
+        self.vel = vel
+        self.budget = budget
+        self.errors = errors
+
+        # Body-major keys are globally sorted, so one searchsorted covers every body
+        self._key_stride = 2.0 * domain.max()
+        body = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        self._keys = body * self._key_stride + knots
+
+    @classmethod
+    def fit(cls, elements, frame_days, max_error=DEFAULT_MAX_ERROR, progress=None, parent_rows=None):
+        """
+        Choose knots for every body so interpolation stays within max_error at every frame.
+
+        Args:
+            elements: OrbitalElements of n_bodies (parent-relative orbits)
+            frame_days: Days since epoch of each frame (uniform grid)
+            max_error: Largest allowed interpolation error in AU
+            progress: Optional callback(count, total) after each body
+            parent_rows: Row of each body's parent (-1 for primaries); when given,
+                max_error bounds absolute positions instead of each track alone
+
+        Returns:
+            AdaptiveTrajectories
+        """
+        n_frames = len(frame_days)
+        if n_frames < 2:
+            raise ValueError("adaptive sampling needs at least two frames")
+        start_day = frame_days[0]
+        days_per_frame = frame_days[1] - frame_days[0]
+        span = (n_frames - 1) * days_per_frame
+
+        periodic = (elements.period > 0) & (elements.period < span)
+        domain = np.where(periodic, elements.period, span)
+        budget = np.full(len(elements), float(max_error))
+        if parent_rows is not None:
+            budget /= chain_lengths(parent_rows)
+        frame_offsets = np.arange(n_frames) * days_per_frame
+
+        all_knots, all_pos, all_vel, errors = [], [], [], np.zeros(len(elements))
+        for i in range(len(elements)):
+            body = elements[i:i + 1]
+            period = body.period[0]
+            if period > 0:
+                n_initial = int(np.ceil(domain[i] / period * INITIAL_KNOTS_PER_ORBIT))
+            else:
+                n_initial = 1  # Fixed body: the two end knots are exact
+            knots = np.linspace(0.0, domain[i], n_initial + 1)
+
+            # Every frame as a time into this body's domain (phase for periodic bodies)
+            if periodic[i]:
+                check_days = np.unique(frame_offsets % domain[i])
+            else:
+                check_days = frame_offsets
+            check_exact = propagate_batch(body, start_day + check_days)[0]
+
+            while True:
+                pos, vel = _states(body, start_day + knots)
+                k0, k1 = knots[:-1], knots[1:]
+                h = k1 - k0
+
+                # Largest error at the check points of every interval
+                err = np.zeros(len(h))
+                for f in CHECK_FRACTIONS:
+                    t = np.full(len(h), f)
+                    exact = propagate_batch(body, start_day + k0 + f * h)[0]
+                    approx = _hermite(pos[:-1], vel[:-1], pos[1:], vel[1:], h, t)
+                    err = np.maximum(err, np.linalg.norm(approx - exact, axis=-1))
+
+                bad = (err > budget[i]) & (h > MIN_INTERVAL_DAYS)
+                if not bad.any():
+                    # Verify at every frame; split the intervals of frames that still fail
+                    approx, j = _interpolate(knots, pos, vel, check_days)
+                    frame_err = np.linalg.norm(approx - check_exact, axis=-1)
+                    errors[i] = frame_err.max(initial=0.0)
+                    bad = np.zeros(len(h), dtype=bool)
+                    bad[j[frame_err > budget[i]]] = True
+                    bad &= h > MIN_INTERVAL_DAYS
+                    if not bad.any():
+                        break
+                knots = np.sort(np.concatenate([knots, k0[bad] + h[bad] / 2]))
+
+            all_knots.append(knots)
+            all_pos.append(pos)
+            all_vel.append(vel)
+            if progress is not None:
+                progress(i + 1, len(elements))
+
+        offsets = np.concatenate([[0], np.cumsum([len(k) for k in all_knots])])
+        return cls(n_frames, days_per_frame, domain, periodic, np.concatenate(all_knots), offsets,
+                   np.concatenate(all_pos), np.concatenate(all_vel), budget, errors)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def sample_counts(self):
+        """Number of knots stored for each body."""
+        return np.diff(self.offsets)
+
+    @property
+    def nbytes(self):
+        """Memory held by the knot arrays."""
+        return self.knots.nbytes + self.pos.nbytes + self.vel.nbytes + self._keys.nbytes
+
+    def positions(self, frames):
+        """
+        Parent-relative positions of every body at frame indices.
+
+        Args:
+            frames: Frame indices (scalar or array, may be fractional)
+
+        Returns:
+            Array of shape (n_bodies, n_frames, 3) in AU
+        """
+        frames = np.clip(np.atleast_1d(np.asarray(frames, dtype=float)), 0, self.n_frames - 1)
+
+        # Time into each body's domain (phase within the orbit for periodic bodies)
+        days = frames[None, :] * self.days_per_frame
+        domain = self.domain[:, None]
+        days = np.where(self.periodic[:, None], days % domain, np.minimum(days, domain))
+
+        # Knot at or before each query, kept off each body's last knot
+        query = np.arange(len(self))[:, None] * self._key_stride + days
+        j = np.searchsorted(self._keys, query, side='right') - 1
+        j = np.minimum(j, self.offsets[1:, None] - 2)
+        j = np.maximum(j, self.offsets[:-1, None])
+
+        h = self.knots[j + 1] - self.knots[j]
+        t = (days - self.knots[j]) / h
+        return _hermite(self.pos[j], self.vel[j], self.pos[j + 1], self.vel[j + 1], h, t)
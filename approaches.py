@@ -0,0 +1,430 @@
+"""
+Close-approach and conjunction finder.
+
+Scanning every pair of bodies at every frame is O(N^2 * Nframes); instead
+the span is walked in coarse blocks:
+
+1. Positions are sampled every coarse_days. Each body gets a box around
+   its samples in the block, padded so the whole path between samples fits
+   (from the fastest speed its orbit allows, or, for moons, the size of
+   their orbit around the parent).
+2. Sweep-and-prune on the boxes keeps only pairs whose boxes come within
+   the threshold, O(N log N) per block.
+3. Candidate pairs are sampled finely over the block; every local minimum
+   of their separation is refined by Newton iteration on d|r|^2/dt = 0
+   using analytic positions, so encounter times are not limited to the
+   frame step.
+
+Close approaches are measured in space; conjunctions are angular close
+approaches as seen from an observer (default Earth), including the Sun.
+Pairs of bodies in the same moon system (Jupiter and Io, Io and Europa)
+are skipped by default since they are always close.
+
+    from approaches import find_close_approaches, find_conjunctions
+
+    for enc in find_close_approaches(eph, distance=0.1):
+        print(enc.date, enc.body_a, enc.body_b, enc.distance_km, enc.speed_km_s)
+
+    python approaches.py --distance 0.3
+    python approaches.py --conjunctions 1.0 --observer Earth --output events.json
+"""
+import argparse
+import json
+from datetime import timedelta
+
+import numpy as np
+
+from ephemeris import AU_KM, DEFAULT_CATALOG, Ephemeris, days_since_epoch
+
+# Coarse sampling step (days) and coarse steps per pruning block
+DEFAULT_COARSE_DAYS = 1.0
+DEFAULT_BLOCK_STEPS = 16
+
+# Fine samples per orbit of the fastest body in a candidate pair (never coarser than coarse_days)
+FINE_SAMPLES_PER_ORBIT = 16
+
+# Newton refinement of an encounter time
+REFINE_STEP_DAYS = 1e-3  # Finite-difference step for velocity and acceleration
+REFINE_TOLERANCE_DAYS = 1e-8  # About a millisecond
+REFINE_MAX_ITERATIONS = 20
+
+# Conjunction boxes are padded by this multiple of half the largest apparent step
+# (apparent motion has no simple analytic bound)
+CONJUNCTION_PADDING = 2.0
+
+SECONDS_PER_DAY = 86400.0
+
+
+class Encounter:
+    """
+    One close approach or conjunction.
+
+    Attributes:
+        kind: 'approach' or 'conjunction'
+        body_a, body_b: Body names
+        day: Days since the catalog epoch at minimum separation
+        date: datetime of the minimum
+        separation: Minimum distance in AU (approach) or angle in degrees (conjunction)
+        rate: Relative speed in AU/day (approach) or apparent rate in degrees/day (conjunction)
+    """
+
+    __slots__ = ('kind', 'body_a', 'body_b', 'day', 'date', 'separation', 'rate')
+
+    def __init__(self, kind, body_a, body_b, day, date, separation, rate):
+        self.kind = kind
+        self.body_a = body_a
+        self.body_b = body_b
+        self.day = day
+        self.date = date
+        self.separation = separation
+        self.rate = rate
+
+    @property
+    def distance_km(self):
+        """Minimum distance in km (close approaches)."""
+        return self.separation * AU_KM
+
+    @property
+    def speed_km_s(self):
+        """Relative speed at the minimum in km/s (close approaches)."""
+        return self.rate * AU_KM / SECONDS_PER_DAY
+
+    def to_dict(self):
+        record = {'kind': self.kind, 'body_a': self.body_a, 'body_b': self.body_b,
+                  'date': self.date.isoformat(), 'day': self.day}
+        if self.kind == 'approach':
+            record.update(distance_au=self.separation, distance_km=self.distance_km,
+                          speed_km_s=self.speed_km_s)
+        else:
+            record.update(separation_deg=self.separation, rate_deg_per_day=self.rate)
+        return record
+
+    def __repr__(self):
+        return (f"Encounter({self.kind}, {self.body_a} - {self.body_b}, {self.date:%Y-%m-%d %H:%M}, "
+                f"{self.separation:.6g})")
+
+
+def sweep_and_prune(lo, hi):
+    """
+    Pairs of axis-aligned boxes that overlap.
+
+    Boxes are sorted along the axis where they are most spread out; each
+    box is then only compared with the boxes that start before it ends on
+    that axis, and the survivors are checked on all three axes.
+
+    Args:
+        lo: Box minima, shape (n, 3)
+        hi: Box maxima, shape (n, 3)
+
+    Returns:
+        (i, j): index arrays of overlapping pairs, i < j
+    """
+    axis = np.argmax(np.ptp(lo + hi, axis=0)) if len(lo) else 0
+    order = np.argsort(lo[:, axis], kind='stable')
+    lo, hi = lo[order], hi[order]
+
+    # VECTORIZED: boxes after k in sweep order that start before k ends
+    end = np.searchsorted(lo[:, axis], hi[:, axis], side='right')
+    count = np.maximum(end - np.arange(len(lo)) - 1, 0)
+    i = np.repeat(np.arange(len(lo)), count)
+    j = i + 1 + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+
+    overlap = np.all((lo[j] <= hi[i]) & (lo[i] <= hi[j]), axis=1)
+    a, b = order[i[overlap]], order[j[overlap]]
+    return np.minimum(a, b), np.maximum(a, b)
+
+
+def _root_and_chain(eph, rows):
+    """bodies_list row of each body's top-level ancestor, and the rows of its chain below it."""
+    roots, chains = [], []
+    for r in rows:
+        chain = []
+        while eph.parent_rows[r] >= 0:
+            chain.append(r)
+            r = eph.parent_rows[r]
+        roots.append(r)
+        chains.append(chain)
+    return np.array(roots, dtype=int), chains
+
+
+def _speed_bounds(elements):
+    """Periapsis speed (fastest point) of each orbit relative to its parent, AU/day."""
+    moving = (elements.period > 0) & (elements.a > 0)
+    n = np.zeros(len(elements))
+    n[moving] = 2 * np.pi / elements.period[moving]
+    return n * elements.a * np.sqrt((1 + elements.e) / (1 - elements.e))
+
+
+class _Search:
+    """Coarse-to-fine minimum search over pairs of tracks produced by sample(names, days)."""
+
+    def __init__(self, eph, names, sample, padding, fine_days, pair_ok):
+        self.eph = eph
+        self.names = names
+        self.sample = sample  # (names, days) -> (n, n_times, 3)
+        self.padding = padding  # (xyz, coarse_days) -> (n,) box padding
+        self.fine_days = fine_days  # (n,) fine sampling step per body
+        self.pair_ok = pair_ok  # (n, n) bool
+
+    def run(self, threshold, first, last, coarse_days, block_steps, progress=None):
+        """Encounters below threshold (chord units), as (i, j, day, separation, rate) tuples."""
+        block_days = coarse_days * block_steps
+        n_blocks = max(1, int(np.ceil((last - first) / block_days)))
+        found = []
+        for k in range(n_blocks):
+            d0 = first + k * block_days
+            d1 = min(d0 + block_days, last)
+            days = d0 + np.arange(int(np.ceil((d1 - d0) / coarse_days)) + 1) * coarse_days
+            xyz = self.sample(self.names, days)
+
+            pad = self.padding(xyz, coarse_days) + threshold / 2
+            i, j = sweep_and_prune(xyz.min(axis=1) - pad[:, None], xyz.max(axis=1) + pad[:, None])
+            keep = self.pair_ok[i, j]
+            for a, b in zip(i[keep], j[keep]):
+                found.extend(self._refine_pair(a, b, k, block_days, threshold, first, last, coarse_days))
+            if progress is not None:
+                progress(k + 1, n_blocks)
+        return found
+
+    def _separation(self, a, b, days):
+        """Relative vectors b - a, shape (n_times, 3)."""
+        xyz = self.sample([self.names[a], self.names[b]], days)
+        return xyz[1] - xyz[0]
+
+    def _refine_pair(self, a, b, block, block_days, threshold, first, last, coarse_days):
+        # Fine grid on absolute time with a step that divides the block, so adjacent
+        # blocks share grid points and every sampled minimum belongs to exactly one block
+        per_block = int(np.ceil(block_days / min(coarse_days, self.fine_days[a], self.fine_days[b])))
+        step = block_days / per_block
+        i0 = block * per_block
+        i1 = min(i0 + per_block, int(np.ceil((last - first) / step)))
+        grid = np.arange(i0 - 1, i1 + 2)
+        days = first + grid * step
+        r = np.linalg.norm(self._separation(a, b, days), axis=-1)
+
+        # Local minima of the sampled separation on this block's grid points
+        k = np.flatnonzero((r[1:-1] <= r[:-2]) & (r[1:-1] < r[2:])) + 1
+        k = k[(grid[k] >= i0) & (grid[k] < i1)]
+        results = []
+        for idx in k:
+            day, sep, rate = self._newton(a, b, days[idx], days[idx - 1], days[idx + 1])
+            if sep <= threshold and first <= day <= last:
+                results.append((a, b, day, sep, rate))
+        return results
+
+    def _newton(self, a, b, t, lo, hi):
+        """Minimize |r(t)| in [lo, hi]: Newton on f = r.v with finite-difference derivatives."""
+        h = REFINE_STEP_DAYS
+        for _ in range(REFINE_MAX_ITERATIONS):
+            r_m, r_0, r_p = self._separation(a, b, np.array([t - h, t, t + h]))
+            v = (r_p - r_m) / (2 * h)
+            acc = (r_p - 2 * r_0 + r_m) / h**2
+            f = r_0 @ v
+            df = v @ v + r_0 @ acc
+            if df <= 0:
+                break
+            t_new = min(max(t - f / df, lo), hi)
+            done = abs(t_new - t) < REFINE_TOLERANCE_DAYS
+            t = t_new
+            if done:
+                break
+        r_m, r_0, r_p = self._separation(a, b, np.array([t - h, t, t + h]))
+        return t, float(np.linalg.norm(r_0)), float(np.linalg.norm((r_p - r_m) / (2 * h)))
+
+
+def _span(eph, start, end):
+    first = eph.start_day if start is None else float(days_since_epoch(start, eph.epoch_date))
+    last = (eph.start_day + eph.total_sim_days if end is None
+            else float(days_since_epoch(end, eph.epoch_date)))
+    if last <= first:
+        raise ValueError("end must be after start")
+    return first, last
+
+
+def _rows(eph, bodies):
+    names = list(eph.bodies_list) if bodies is None else list(bodies)
+    unknown = [name for name in names if name not in eph.metadata]
+    if unknown:
+        raise KeyError(f"Unknown body: {unknown[0]}")
+    row = {name: i for i, name in enumerate(eph.bodies_list)}
+    return names, np.array([row[name] for name in names], dtype=int)
+
+
+def _fine_days(eph, rows, chains, coarse_days):
+    """Fine sampling step per body: a fraction of the shortest period in its chain below the root."""
+    period = eph.elements.period
+    fine = np.full(len(rows), coarse_days)
+    for i, chain in enumerate(chains):
+        periods = [period[r] for r in chain if period[r] > 0]
+        if periods:
+            fine[i] = min(coarse_days, min(periods) / FINE_SAMPLES_PER_ORBIT)
+    return fine
+
+
+def _encounters(eph, kind, names, raw, to_units):
+    out = []
+    for a, b, day, sep, rate in raw:
+        sep, rate = to_units(sep, rate)
+        out.append(Encounter(kind, names[a], names[b], day, eph.epoch_date + timedelta(days=day),
+                             sep, rate))
+    out.sort(key=lambda enc: enc.day)
+    return out
+
+
+def find_close_approaches(eph, distance, bodies=None, start=None, end=None, same_system=False,
+                          coarse_days=DEFAULT_COARSE_DAYS, block_steps=DEFAULT_BLOCK_STEPS,
+                          progress=None):
+    """
+    Every time two bodies pass within a distance of each other.
+
+    Positions come from eph.positions (Kepler orbits, or the attached
+    Chebyshev fit), so any span can be searched in lazy mode.
+
+    Args:
+        eph: Loaded Ephemeris
+        distance: Threshold in AU
+        bodies: Body names to consider (default: all, moons included)
+        start: First instant - datetime, datetime64 or Julian date (default: eph.start_date)
+        end: Last instant (default: eph.end_date)
+        same_system: Also report pairs in the same moon system (a planet and its moons)
+        coarse_days: Coarse sampling step in days
+        block_steps: Coarse steps per pruning block
+        progress: Optional callback(block, n_blocks)
+
+    Returns:
+        List of Encounter (kind 'approach') sorted by time
+    """
+    names, rows = _rows(eph, bodies)
+    first, last = _span(eph, start, end)
+    roots, chains = _root_and_chain(eph, rows)
+
+    # A body strays at most v * dt / 2 from its nearest sample: top-level bodies
+    # move at most at their periapsis speed, and a moon cannot leave its orbit
+    # (twice its apoapsis distance) around a parent that is itself bounded
+    speed = _speed_bounds(eph.elements)
+    apo = eph.elements.a * (1 + eph.elements.e)
+    root_speed = speed[roots]
+    chain_speed = np.array([speed[chain].sum() for chain in chains])
+    chain_size = np.array([2 * apo[chain].sum() for chain in chains])
+
+    def padding(xyz, dt):
+        return root_speed * dt / 2 + np.minimum(chain_speed * dt / 2, chain_size)
+
+    pair_ok = np.ones((len(rows), len(rows)), dtype=bool)
+    if not same_system:
+        pair_ok &= roots[:, None] != roots[None, :]
+
+    search = _Search(eph, names, eph.positions, padding, _fine_days(eph, rows, chains, coarse_days),
+                     pair_ok)
+    raw = search.run(distance, first, last, coarse_days, block_steps, progress)
+    return _encounters(eph, 'approach', names, raw, lambda sep, rate: (sep, rate))
+
+
+def find_conjunctions(eph, separation_deg, observer='Earth', bodies=None, start=None, end=None,
+                      same_system=False, coarse_days=DEFAULT_COARSE_DAYS, block_steps=DEFAULT_BLOCK_STEPS,
+                      progress=None):
+    """
+    Every time two bodies appear within an angle of each other from an observer.
+
+    Directions are unit vectors from the observer, so the same pruning and
+    refinement run on chord length; apparent motion must be resolved by
+    coarse_days (true for planets and the Sun at the 1-day default, and for
+    the Moon seen from Earth).
+
+    Args:
+        eph: Loaded Ephemeris
+        separation_deg: Threshold angle in degrees
+        observer: Body the sky is seen from
+        bodies: Body names to consider (default: the top-level bodies but the observer's)
+        start, end, same_system, coarse_days, block_steps, progress: As for find_close_approaches
+
+    Returns:
+        List of Encounter (kind 'conjunction', separation in degrees) sorted by time
+    """
+    if observer not in eph.metadata:
+        raise KeyError(f"Unknown body: {observer}")
+    if bodies is None:
+        observer_root = eph.bodies_list[_root_and_chain(eph, _rows(eph, [observer])[1])[0][0]]
+        bodies = [name for name in eph.primary_bodies if name != observer_root]
+    elif observer in bodies:
+        raise ValueError(f"the observer {observer} cannot be one of the bodies")
+    names, rows = _rows(eph, bodies)
+    roots, chains = _root_and_chain(eph, rows)
+    first, last = _span(eph, start, end)
+
+    def directions(query, days):
+        xyz = eph.positions(list(query) + [observer], days)
+        rel = xyz[:-1] - xyz[-1]
+        return rel / np.linalg.norm(rel, axis=-1, keepdims=True)
+
+    def padding(xyz, dt):
+        steps = np.linalg.norm(np.diff(xyz, axis=1), axis=-1)
+        return CONJUNCTION_PADDING * steps.max(axis=1, initial=0.0) / 2
+
+    pair_ok = np.ones((len(rows), len(rows)), dtype=bool)
+    if not same_system:
+        pair_ok &= roots[:, None] != roots[None, :]
+
+    chord = 2 * np.sin(np.radians(separation_deg) / 2)
+    search = _Search(eph, names, directions, padding, _fine_days(eph, rows, chains, coarse_days),
+                     pair_ok)
+    raw = search.run(chord, first, last, coarse_days, block_steps, progress)
+
+    def to_degrees(sep, rate):
+        return float(np.degrees(2 * np.arcsin(min(sep / 2, 1.0)))), float(np.degrees(rate))
+    return _encounters(eph, 'conjunction', names, raw, to_degrees)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Find close approaches and conjunctions over the simulated span")
+    parser.add_argument('catalog', nargs='?', default=DEFAULT_CATALOG,
+                        help='celestial bodies JSON catalog (default: %(default)s)')
+    parser.add_argument('--distance', type=float, default=None, metavar='AU',
+                        help='report close approaches within this distance')
+    parser.add_argument('--conjunctions', type=float, default=None, metavar='DEG',
+                        help='report conjunctions within this angle')
+    parser.add_argument('--observer', default='Earth',
+                        help='body conjunctions are seen from (default: %(default)s)')
+    parser.add_argument('--bodies', nargs='+', default=None, metavar='NAME',
+                        help='only these bodies (moons as Parent_Moon, default: all)')
+    parser.add_argument('--same-system', action='store_true',
+                        help='include pairs within one moon system')
+    parser.add_argument('--start', type=str, default=None, metavar='DATE',
+                        help='first date searched, e.g. 2020-01-01 (default: catalog epoch)')
+    parser.add_argument('--end', type=str, default=None, metavar='DATE',
+                        help='last date searched (default: 12 years after --start)')
+    parser.add_argument('--coarse-days', type=float, default=DEFAULT_COARSE_DAYS,
+                        help='coarse sampling step (default: %(default)s days)')
+    parser.add_argument('--output', default=None, metavar='FILE',
+                        help='also write the encounters as JSON')
+    args = parser.parse_args()
+    if args.distance is None and args.conjunctions is None:
+        parser.error('give --distance and/or --conjunctions')
+
+    from datetime import datetime
+    start = None if args.start is None else datetime.fromisoformat(args.start)
+    end = None if args.end is None else datetime.fromisoformat(args.end)
+    eph = Ephemeris(lazy=True, start_date=start, end_date=end).load(args.catalog)
+
+    encounters = []
+    if args.distance is not None:
+        found = find_close_approaches(eph, args.distance, bodies=args.bodies, same_system=args.same_system,
+                                      coarse_days=args.coarse_days)
+        print(f"{len(found)} close approaches within {args.distance:g} AU")
+        for enc in found:
+            print(f"  {enc.date:%Y-%m-%d %H:%M}  {enc.body_a:>16} - {enc.body_b:<16} "
+                  f"{enc.separation:9.5f} AU ({enc.distance_km:13,.0f} km)  {enc.speed_km_s:7.2f} km/s")
+        encounters += found
+    if args.conjunctions is not None:
+        found = find_conjunctions(eph, args.conjunctions, observer=args.observer, bodies=args.bodies,
+                                  same_system=args.same_system, coarse_days=args.coarse_days)
+        print(f"{len(found)} conjunctions within {args.conjunctions:g} deg seen from {args.observer}")
+        for enc in found:
+            print(f"  {enc.date:%Y-%m-%d %H:%M}  {enc.body_a:>16} - {enc.body_b:<16} "
+                  f"{enc.separation:8.4f} deg  {enc.rate:7.3f} deg/day")
+        encounters += found
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump([enc.to_dict() for enc in encounters], f, indent=2)
+        print(f"Wrote {args.output}")
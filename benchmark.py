@@ -0,0 +1,310 @@
+"""
+Benchmarks for the propagation and rendering hot paths.
+
+Times the vectorized Kepler solver across eccentricity ranges, whole-catalog
+precomputation (with peak memory) at several frame counts, and per-frame
+render time on an off-screen Agg canvas for each animation speed preset.
+Results are written as JSON so runs can be compared between releases.
+
+    python benchmark.py                            # all suites, JSON on stdout
+    python benchmark.py --output bench.json
+    python benchmark.py --suite kepler --suite propagate --frames 5000 50000
+    python benchmark.py --quick                    # smaller sizes for a smoke run
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from ephemeris import DEFAULT_CATALOG, Ephemeris, solve_kepler_equation_vectorized
+
+SUITES = ('kepler', 'propagate', 'render')
+
+# Eccentricity bands timed by the kepler suite: near-circular planets up to
+# comet-like orbits, where Newton needs the most steps
+ECCENTRICITY_RANGES = ((0.0, 0.1), (0.1, 0.5), (0.5, 0.8), (0.8, 0.95), (0.95, 0.99))
+
+# Playback speeds of the preset buttons in SolarSystem.py (frames advanced per tick)
+SPEED_PRESETS = (1, 2, 5, 10, 25, 50, 100)
+
+DEFAULT_KEPLER_SAMPLES = 1_000_000
+DEFAULT_FRAME_COUNTS = (1_000, 10_000, 100_000)
+DEFAULT_RENDER_FRAMES = 50
+DEFAULT_REPEAT = 3
+
+
+def _best_of(fn, repeat):
+    """Smallest wall time of repeat calls to fn, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _peak_bytes(fn):
+    """Peak bytes allocated (NumPy buffers included) while fn runs."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _percentiles_ms(seconds):
+    seconds = np.asarray(seconds) * 1e3
+    return {'mean_ms': float(seconds.mean()), 'median_ms': float(np.median(seconds)),
+            'p95_ms': float(np.percentile(seconds, 95)), 'max_ms': float(seconds.max())}
+
+
+def bench_kepler(samples=DEFAULT_KEPLER_SAMPLES, repeat=DEFAULT_REPEAT, seed=0):
+    """
+    Time solve_kepler_equation_vectorized on random anomalies per eccentricity band.
+
+    Args:
+        samples: Mean anomalies solved per band
+        repeat: Runs per band (the fastest is reported)
+        seed: Random seed, so every run solves the same inputs
+
+    Returns:
+        List of result dicts, one per band in ECCENTRICITY_RANGES
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for lo, hi in ECCENTRICITY_RANGES:
+        M = rng.uniform(0, 2 * np.pi, samples)
+        e = rng.uniform(lo, hi, samples)
+        seconds = _best_of(lambda: solve_kepler_equation_vectorized(M, e), repeat)
+        _, iterations = solve_kepler_equation_vectorized(M, e, return_iterations=True)
+        results.append({
+            'e_min': lo, 'e_max': hi, 'samples': samples, 'seconds': seconds,
+            'ns_per_solve': seconds / samples * 1e9,
+            'mean_iterations': float(iterations.mean()), 'max_iterations': int(iterations.max()),
+        })
+    return results
+
+
+def _ephemeris_for_frames(catalog_path, n_frames, **options):
+    """Ephemeris whose span holds n_frames frames at the catalog's frame step."""
+    base = Ephemeris().load(catalog_path)
+    end_date = base.start_date + timedelta(days=n_frames * base.days_per_frame)
+    return Ephemeris(end_date=end_date, **options).load(catalog_path)
+
+
+def bench_propagate(catalog_path=DEFAULT_CATALOG, frame_counts=DEFAULT_FRAME_COUNTS,
+                    repeat=DEFAULT_REPEAT, workers=1, dtype=np.float64):
+    """
+    Time whole-catalog precomputation (Ephemeris.generate_all) and its peak memory.
+
+    Args:
+        catalog_path: Path to the celestial bodies JSON catalog
+        frame_counts: Nframes values to precompute
+        repeat: Timed runs per frame count (the fastest is reported)
+        workers: Worker processes passed to Ephemeris
+        dtype: Trajectory store dtype
+
+    Returns:
+        List of result dicts, one per frame count
+    """
+    results = []
+    for n_frames in frame_counts:
+        eph = _ephemeris_for_frames(catalog_path, n_frames, workers=workers, dtype=dtype)
+        seconds = _best_of(eph.generate_all, repeat)
+        # Timed separately: tracing allocations slows the run down
+        peak = _peak_bytes(eph.generate_all)
+        n_bodies = len(eph.bodies_list)
+        results.append({
+            'frames': eph.Nframes, 'bodies': n_bodies, 'workers': workers,
+            'dtype': np.dtype(dtype).name, 'seconds': seconds,
+            'positions_per_second': n_bodies * eph.Nframes / seconds,
+            'peak_mb': peak / 1e6, 'store_mb': eph.trajectories.nbytes / 1e6,
+        })
+    return results
+
+
+def bench_render(catalog_path=DEFAULT_CATALOG, n_frames=DEFAULT_RENDER_FRAMES,
+                 speeds=SPEED_PRESETS, size=(1800, 1200), dpi=100, blit=True, lazy=False,
+                 focus='Sun', camera_distance=50):
+    """
+    Time the animation's per-frame work on an Agg canvas at each speed preset.
+
+    Each tick does what the interactive window does: advance by the speed,
+    move every artist (scene.update), follow the focused body and draw -
+    blitted over a cached background when blit is True, else a full redraw.
+
+    Args:
+        catalog_path: Path to the celestial bodies JSON catalog
+        n_frames: Ticks timed per speed
+        speeds: Frames advanced per tick (SolarSystem.py's preset buttons)
+        size: Figure size in pixels
+        dpi: Figure resolution
+        blit: Draw only the moving artists while the camera is still
+        lazy: Solve frames on demand instead of precomputing
+        focus: Body to follow (None = fixed whole-system view)
+        camera_distance: View width in AU when following
+
+    Returns:
+        List of result dicts, one per speed
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    from scene import FOLLOW_TOLERANCE, BlitManager, SolarSystemScene
+
+    eph = Ephemeris(lazy=lazy, dtype=np.float32).load(catalog_path)
+    eph.generate_all()
+
+    results = []
+    for speed in speeds:
+        fig = Figure(figsize=(size[0] / dpi, size[1] / dpi), dpi=dpi)
+        canvas = FigureCanvasAgg(fig)
+        scene = SolarSystemScene(eph, fig)
+        blitter = BlitManager(fig, scene.ax, scene.animated_artists()) if blit else None
+
+        def tick(idx):
+            _, frame_xyz = scene.update(idx)
+            if focus is not None:
+                scene.follow(frame_xyz[scene.body_index[focus]], camera_distance,
+                             tolerance=FOLLOW_TOLERANCE if blit else 0.0)
+            t = time.perf_counter()
+            if blitter is not None:
+                blitter.update()
+            else:
+                canvas.draw()
+            return t
+
+        # One untimed tick moves the camera onto the focus and caches the background
+        tick(0.0)
+        full_draws = [0]
+
+        def count_draw(event):
+            full_draws[0] += 1
+
+        canvas.mpl_connect('draw_event', count_draw)
+
+        update_times, tick_times = [], []
+        idx = 0.0
+        for _ in range(n_frames):
+            idx = (idx + speed) % eph.Nframes
+            t0 = time.perf_counter()
+            t1 = tick(idx)
+            t2 = time.perf_counter()
+            update_times.append(t1 - t0)
+            tick_times.append(t2 - t0)
+
+        tick_stats = _percentiles_ms(tick_times)
+        results.append(dict({'speed': speed, 'frames': n_frames, 'blit': blit, 'lazy': lazy,
+                             'focus': focus, 'full_redraws': full_draws[0],
+                             'update_mean_ms': float(np.mean(update_times) * 1e3),
+                             'fps': 1e3 / tick_stats['mean_ms']}, **tick_stats))
+    return results
+
+
+def environment(catalog_path):
+    """Versions and machine details recorded with every run."""
+    import matplotlib
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'catalog': os.path.basename(catalog_path),
+    }
+
+
+def run(suites=SUITES, catalog_path=DEFAULT_CATALOG, quick=False, kepler_samples=None,
+        frame_counts=None, render_frames=None, repeat=DEFAULT_REPEAT, workers=1, blit=True,
+        progress=None):
+    """
+    Run the selected suites.
+
+    Args:
+        suites: Names from SUITES
+        catalog_path: Path to the celestial bodies JSON catalog
+        quick: Use small sizes (a smoke run, not comparable with full runs)
+        kepler_samples, frame_counts, render_frames: Override the suite sizes
+        repeat: Timed runs per case (the fastest is reported)
+        workers: Worker processes for the propagate suite
+        blit: Blitted (True) or full-redraw (False) render suite
+        progress: Optional callback(suite_name) before each suite
+
+    Returns:
+        Dict with 'environment', 'settings' and one result list per suite
+    """
+    if kepler_samples is None:
+        kepler_samples = 100_000 if quick else DEFAULT_KEPLER_SAMPLES
+    if frame_counts is None:
+        frame_counts = (500, 5_000) if quick else DEFAULT_FRAME_COUNTS
+    if render_frames is None:
+        render_frames = 5 if quick else DEFAULT_RENDER_FRAMES
+    if quick:
+        repeat = 1
+
+    report = {
+        'environment': environment(catalog_path),
+        'settings': {'suites': list(suites), 'quick': quick, 'repeat': repeat,
+                     'kepler_samples': kepler_samples, 'frame_counts': list(frame_counts),
+                     'render_frames': render_frames, 'workers': workers, 'blit': blit},
+    }
+    for suite in suites:
+        if progress is not None:
+            progress(suite)
+        if suite == 'kepler':
+            report['kepler'] = bench_kepler(kepler_samples, repeat)
+        elif suite == 'propagate':
+            report['propagate'] = bench_propagate(catalog_path, frame_counts, repeat, workers)
+        elif suite == 'render':
+            report['render'] = bench_render(catalog_path, render_frames, blit=blit)
+        else:
+            raise ValueError(f"unknown suite {suite!r}, expected one of {SUITES}")
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark propagation and rendering hot paths")
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG,
+                        help='celestial bodies JSON catalog (default: %(default)s)')
+    parser.add_argument('--suite', action='append', choices=SUITES, default=None,
+                        help='suite to run, may be repeated (default: all)')
+    parser.add_argument('--output', default=None, metavar='FILE',
+                        help='write the JSON report to FILE (default: stdout)')
+    parser.add_argument('--quick', action='store_true',
+                        help='small sizes for a fast smoke run')
+    parser.add_argument('--samples', type=int, default=None,
+                        help=f'Kepler solves per eccentricity band (default: {DEFAULT_KEPLER_SAMPLES:,})')
+    parser.add_argument('--frames', type=int, nargs='+', default=None,
+                        help='Nframes values for the propagate suite (default: 1000 10000 100000)')
+    parser.add_argument('--render-frames', type=int, default=None,
+                        help=f'ticks timed per speed preset (default: {DEFAULT_RENDER_FRAMES})')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help='timed runs per case, fastest reported (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes for the propagate suite (default: 1)')
+    parser.add_argument('--no-blit', dest='blit', action='store_false',
+                        help='time full redraws instead of blitting in the render suite')
+    args = parser.parse_args()
+
+    report = run(args.suite or SUITES, catalog_path=args.catalog, quick=args.quick,
+                 kepler_samples=args.samples, frame_counts=args.frames,
+                 render_frames=args.render_frames, repeat=args.repeat, workers=args.workers,
+                 blit=args.blit, progress=lambda suite: print(f"Running {suite}...", file=sys.stderr))
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Wrote {args.output}", file=sys.stderr)
@@ -0,0 +1,149 @@
+"""
+Persistent on-disk cache for precomputed trajectories.
+
+Each body's (3, Nframes) x/y/z array is stored as its own .npy file named
+after a hash of its orbital elements and the simulation parameters. Moons
+are stored relative to their parent, so their files do not depend on the
+parent at all. Editing one body changes only its own key; every other
+body, including its moons, still hits the cache. Display-only fields
+(color, markerSize, ...) are not part of the key.
+
+The per-body files are also assembled once into a whole-store file in the
+TrajectoryStore layout and dtype, (n_bodies, Nframes, 3), keyed by every
+body's key and the dtype. Later runs open that file with
+np.load(mmap_mode='r') and use it as the store directly, so a warm start
+neither allocates nor copies the trajectories.
+"""
+import hashlib
+import json
+import os
+import numpy as np
+
+DEFAULT_CACHE_DIR = '.trajectory_cache'
+
+# Bump when the stored layout or the propagation math changes
+# (2: moons stored relative to their parent)
+CACHE_FORMAT_VERSION = 2
+
+# Body fields that affect the computed positions
+ORBITAL_FIELDS = ('rad', 'frames', 'eccentricity', 'inclination', 'longitudeOfAscendingNode',
+                  'argumentOfPeriapsis', 'meanAnomalyAtEpoch')
+
+
+class TrajectoryCache:
+    """Directory of memory-mapped per-body and whole-store trajectory arrays."""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def body_keys(self, eph):
+        """
+        Cache key of every body in an Ephemeris.
+
+        Args:
+            eph: Loaded Ephemeris
+
+        Returns:
+            Dict of body name -> hex key
+        """
+        sim = {
+            'version': CACHE_FORMAT_VERSION,
+            'Nframes': eph.Nframes,
+            'total_sim_days': eph.total_sim_days,
+            'epoch': eph.epoch_date.isoformat(),
+            'start_day': eph.start_day,
+        }
+        if eph.accuracy_km is not None:
+            # Only when set, so caches made with the default tolerance stay valid
+            sim['accuracy_km'] = eph.accuracy_km
+        sim = json.dumps(sim, sort_keys=True)
+
+        keys = {}
+        for name in eph.bodies_list:
+            props = eph.body_props[name]
+            # As floats, so JSON and compiled catalogs (catalog.py) share cache entries
+            orbit = {field: float(props[field]) for field in ORBITAL_FIELDS}
+            payload = json.dumps({'sim': sim, 'orbit': orbit}, sort_keys=True)
+            keys[name] = hashlib.sha256(payload.encode()).hexdigest()[:32]
+        return keys
+
+    def store_key(self, body_keys, dtype):
+        """
+        Cache key of a whole store.
+
+        Args:
+            body_keys: Keys of the store's bodies, in row order
+            dtype: Position dtype of the store
+
+        Returns:
+            Hex key, prefixed 'store-'
+        """
+        payload = json.dumps({'bodies': list(body_keys), 'dtype': np.dtype(dtype).str})
+        return 'store-' + hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.npy')
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def load(self, key):
+        """Memory-map a cached array (read-only): (3, Nframes) per body, (n_bodies, Nframes, 3) per store."""
+        return np.load(self._path(key), mmap_mode='r')
+
+    def save(self, key, xyz):
+        """
+        Store a trajectory atomically, so a crash never leaves a truncated file.
+
+        Args:
+            key: Body cache key
+            xyz: (3, Nframes) array of x, y, z rows
+        """
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, np.ascontiguousarray(xyz, dtype=np.float64))
+        os.replace(tmp, path)
+
+    def save_store(self, key, tracks, n_frames, dtype):
+        """
+        Assemble per-body trajectories into a whole-store file, atomically.
+
+        Rows are written straight into a memory-mapped file one body at a
+        time, so the whole store is never held in memory.
+
+        Args:
+            key: Store cache key (from store_key)
+            tracks: Sequence of (3, Nframes) arrays, one per body in row order
+            n_frames: Frames per track
+            dtype: Position dtype of the store
+        """
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        out = np.lib.format.open_memmap(tmp, mode='w+', dtype=dtype, shape=(len(tracks), n_frames, 3))
+        for i, track in enumerate(tracks):
+            out[i] = track.T
+        out.flush()
+        del out  # Close the mapping before the rename
+        os.replace(tmp, path)
+
+    def prune(self, keep):
+        """
+        Delete cached trajectories whose keys are not in keep.
+
+        Args:
+            keep: Iterable of keys to retain (e.g. body_keys(eph).values(), plus
+                the store_key of every store still in use)
+
+        Returns:
+            Number of files removed
+        """
+        keep = set(keep)
+        removed = 0
+        for filename in os.listdir(self.directory):
+            key, ext = os.path.splitext(filename)
+            if ext == '.npy' and key not in keep:
+                os.remove(os.path.join(self.directory, filename))
+                removed += 1
+        return removed
@@ -0,0 +1,383 @@
+"""
+Catalog validation and the compiled binary catalog format.
+
+celestial_bodies.json is convenient to edit but slow to parse for large
+catalogs, and a mistyped key used to fall back to a default silently. The
+compiler validates the JSON once and writes a versioned binary file that
+Ephemeris.load() memory-maps: one contiguous column per orbital element, a
+parent-row column for the moon tree and a NUL-separated string table for
+names, colors and types. Opening it reads a small header and splits the
+string table; element columns are used in place without parsing.
+
+    python catalog.py check celestial_bodies.json
+    python catalog.py compile celestial_bodies.json celestial_bodies.sscat
+    python catalog.py info celestial_bodies.sscat
+
+    eph = Ephemeris().load('celestial_bodies.sscat')   # same as loading the JSON
+
+File layout (little-endian): the 8-byte MAGIC, a uint32 format version, a
+uint32 header length, a JSON header (simulation parameters and a directory
+of columns: dtype, length and byte offset from the data section), then the
+data section: the columns, each starting on a COLUMN_ALIGNMENT boundary.
+"""
+import argparse
+import json
+import math
+import mmap
+import struct
+from collections.abc import Mapping
+from datetime import datetime
+
+import numpy as np
+
+from ephemeris import DEFAULT_CATALOG, DEFAULT_EPOCH, OrbitalElements
+
+# First bytes of every compiled catalog
+MAGIC = b'SSCATLG\x00'
+
+# Format version written by compile_catalog (readers reject other versions)
+FORMAT_VERSION = 1
+
+# Byte alignment of every column in the file
+COLUMN_ALIGNMENT = 64
+
+# Orbital element keys of a catalog body (all required) and their columns
+ELEMENT_FIELDS = {
+    'rad': 'a',
+    'eccentricity': 'e',
+    'inclination': 'inc',
+    'longitudeOfAscendingNode': 'Omega',
+    'argumentOfPeriapsis': 'omega',
+    'meanAnomalyAtEpoch': 'M0',
+    'frames': 'period',
+}
+
+# Other numeric keys: required ones, and optional ones stored as NaN when absent
+REQUIRED_NUMBERS = ('markerSize',)
+OPTIONAL_NUMBERS = ('radP', 'radA', 'mass')
+
+# String keys: required ones, and optional ones stored as '' when absent
+REQUIRED_STRINGS = ('color',)
+OPTIONAL_STRINGS = ('type', 'lineColor')
+
+KNOWN_KEYS = (set(ELEMENT_FIELDS) | set(REQUIRED_NUMBERS) | set(OPTIONAL_NUMBERS)
+              | set(REQUIRED_STRINGS) | set(OPTIONAL_STRINGS) | {'moons'})
+
+# Number keys as float64 columns and string keys as uint32 string-table indices
+_NUMBER_COLUMNS = tuple(ELEMENT_FIELDS) + REQUIRED_NUMBERS + OPTIONAL_NUMBERS
+_STRING_COLUMNS = REQUIRED_STRINGS + OPTIONAL_STRINGS
+
+
+class CatalogError(ValueError):
+    """A catalog that fails validation; problems lists every issue found."""
+
+    def __init__(self, problems, source=None):
+        self.problems = list(problems)
+        where = f"{source}: " if source else ''
+        super().__init__(f"{where}{len(self.problems)} catalog problem(s):\n  " + '\n  '.join(self.problems))
+
+
+# ============================================================================
+# VALIDATION
+# ============================================================================
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _check_body(name, props, problems):
+    if not isinstance(props, dict):
+        problems.append(f"{name}: expected an object, got {type(props).__name__}")
+        return
+    for key in sorted(set(props) - KNOWN_KEYS):
+        problems.append(f"{name}: unknown key {key!r}")
+    for key in tuple(ELEMENT_FIELDS) + REQUIRED_NUMBERS + REQUIRED_STRINGS:
+        if key not in props:
+            problems.append(f"{name}: missing {key!r}")
+    for key in _NUMBER_COLUMNS:
+        if key in props and not _is_number(props[key]):
+            problems.append(f"{name}: {key!r} must be a finite number, got {props[key]!r}")
+    for key in _STRING_COLUMNS:
+        if key in props and not (isinstance(props[key], str) and '\x00' not in props[key]):
+            problems.append(f"{name}: {key!r} must be a string, got {props[key]!r}")
+
+    def bad(key, ok):
+        return _is_number(props.get(key)) and not ok(props[key])
+
+    if bad('rad', lambda v: v >= 0):
+        problems.append(f"{name}: 'rad' (semi-major axis) must be >= 0")
+    if bad('eccentricity', lambda v: 0 <= v < 1):
+        problems.append(f"{name}: 'eccentricity' must be in [0, 1) for an elliptical orbit")
+    if bad('frames', lambda v: v >= 0):
+        problems.append(f"{name}: 'frames' (period in days) must be >= 0")
+    if bad('markerSize', lambda v: v > 0):
+        problems.append(f"{name}: 'markerSize' must be > 0")
+    if bad('mass', lambda v: v >= 0):
+        problems.append(f"{name}: 'mass' must be >= 0")
+    if 'moons' in props and not isinstance(props['moons'], dict):
+        problems.append(f"{name}: 'moons' must be an object")
+
+
+def validate_catalog(data):
+    """
+    Check a parsed catalog (celestial_bodies.json layout) for missing,
+    unknown or out-of-range fields.
+
+    Args:
+        data: Dict from json.load
+
+    Returns:
+        List of problem descriptions (empty when the catalog is valid)
+    """
+    if not isinstance(data, dict):
+        return ["catalog must be a JSON object with 'simulation' and 'bodies'"]
+    problems = []
+
+    sim = data.get('simulation')
+    if not isinstance(sim, dict):
+        problems.append("missing 'simulation' object")
+    else:
+        if not (isinstance(sim.get('Nframes'), int) and not isinstance(sim['Nframes'], bool)
+                and sim['Nframes'] > 0):
+            problems.append("simulation: 'Nframes' must be a positive integer")
+        for key in ('rad', 'tinterval'):
+            if not (_is_number(sim.get(key)) and sim[key] > 0):
+                problems.append(f"simulation: {key!r} must be a positive number")
+        try:
+            datetime.fromisoformat(sim.get('epoch', DEFAULT_EPOCH))
+        except (TypeError, ValueError):
+            problems.append(f"simulation: 'epoch' must be an ISO date, got {sim.get('epoch')!r}")
+
+    bodies = data.get('bodies')
+    if not isinstance(bodies, dict) or not bodies:
+        problems.append("missing or empty 'bodies' object")
+        return problems
+
+    seen = set()
+    stack = [(name, props) for name, props in reversed(list(bodies.items()))]
+    while stack:
+        name, props = stack.pop()
+        if name in seen:
+            problems.append(f"{name}: duplicate body name")
+        seen.add(name)
+        _check_body(name, props, problems)
+        moons = props.get('moons') if isinstance(props, dict) else None
+        if isinstance(moons, dict):
+            stack.extend((f"{name}_{moon}", moon_props) for moon, moon_props in reversed(list(moons.items())))
+    return problems
+
+
+def load_json(path):
+    """
+    Parse and validate a JSON catalog.
+
+    Raises:
+        CatalogError: If validate_catalog finds any problem
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+    problems = validate_catalog(data)
+    if problems:
+        raise CatalogError(problems, path)
+    return data
+
+
+# ============================================================================
+# COMPILED CATALOG
+# ============================================================================
+
+def _flatten(data):
+    """Names, properties and parent rows in Ephemeris order (depth-first, each body followed by its moons)."""
+    names, props, parents = [], [], []
+    stack = [(name, p, -1) for name, p in reversed(list(data['bodies'].items()))]
+    while stack:
+        name, p, parent = stack.pop()
+        row = len(names)
+        names.append(name)
+        props.append(p)
+        parents.append(parent)
+        stack.extend((f"{name}_{moon}", moon_props, row)
+                     for moon, moon_props in reversed(list(p.get('moons', {}).items())))
+    return names, props, parents
+
+
+def compile_catalog(source, output):
+    """
+    Validate a JSON catalog and write it in the compiled binary format.
+
+    Args:
+        source: JSON catalog path
+        output: Compiled catalog path to write
+
+    Returns:
+        Number of bodies written
+
+    Raises:
+        CatalogError: If the JSON fails validation
+    """
+    data = load_json(source)
+    names, props, parents = _flatten(data)
+
+    strings, index = [], {}
+
+    def intern(s):
+        if s not in index:
+            index[s] = len(strings)
+            strings.append(s)
+        return index[s]
+
+    columns = {'parent': np.array(parents, dtype='<i4'),
+               'name': np.array([intern(n) for n in names], dtype='<u4')}
+    for key in _NUMBER_COLUMNS:
+        columns[key] = np.array([p.get(key, np.nan) for p in props], dtype='<f8')
+    for key in _STRING_COLUMNS:
+        columns[key] = np.array([intern(p.get(key, '')) for p in props], dtype='<u4')
+    columns['strings'] = np.frombuffer('\x00'.join(strings).encode('utf-8'), dtype=np.uint8)
+
+    sim = data['simulation']
+    header = {'simulation': {'Nframes': sim['Nframes'], 'rad': sim['rad'], 'tinterval': sim['tinterval'],
+                             'epoch': sim.get('epoch', DEFAULT_EPOCH)},
+              'n_bodies': len(names), 'columns': {}}
+
+    offset = 0
+    for key, column in columns.items():
+        header['columns'][key] = {'dtype': column.dtype.str, 'offset': offset, 'count': len(column)}
+        offset = _align(offset + column.nbytes)
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header_bytes))
+
+    with open(output, 'wb') as f:
+        f.write(MAGIC + struct.pack('<II', FORMAT_VERSION, len(header_bytes)) + header_bytes)
+        for key, column in columns.items():
+            f.write(b'\x00' * (data_start + header['columns'][key]['offset'] - f.tell()))
+            f.write(column.tobytes())
+    return len(names)
+
+
+def _align(offset):
+    return -(-offset // COLUMN_ALIGNMENT) * COLUMN_ALIGNMENT
+
+
+def is_compiled(path):
+    """Whether path starts with the compiled-catalog MAGIC."""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class CompiledCatalog:
+    """
+    Memory-mapped compiled catalog.
+
+    Columns are read-only views of the mapped file and are never parsed.
+    Opening still does O(n) work: it splits the string table and builds
+    names and parent_rows with one entry per body (about 0.04 s for 200,000
+    bodies). Ephemeris._load_compiled then adds per-body dicts and BodyInfo
+    records, so a full load takes about 0.5 s; only body_props stays lazy.
+
+    Attributes:
+        simulation: Dict with Nframes, rad, tinterval and epoch
+        names: Full body names in catalog order (moons as 'Parent_Moon')
+        parent_rows: Row of each body's parent (-1 for primaries)
+        columns: Column name -> read-only array (catalog keys, plus 'parent' and 'name')
+        strings: String table (list of str) indexed by the string columns
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: not a compiled catalog")
+        version, header_size = struct.unpack_from('<II', self._map, len(MAGIC))
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported catalog format version {version}")
+        start = len(MAGIC) + 8
+        header = json.loads(self._map[start:start + header_size])
+        data_start = _align(start + header_size)
+
+        self.path = path
+        self.simulation = header['simulation']
+        self.columns = {key: np.frombuffer(self._map, dtype=spec['dtype'], count=spec['count'],
+                                           offset=data_start + spec['offset'])
+                        for key, spec in header['columns'].items()}
+        self.strings = self.columns.pop('strings').tobytes().decode('utf-8').split('\x00')
+        self.parent_rows = self.columns['parent'].astype(int)
+        self.names = [self.strings[i] for i in self.columns['name']]
+
+    def __len__(self):
+        return len(self.names)
+
+    def elements(self):
+        """OrbitalElements of every body, backed by the mapped columns."""
+        return OrbitalElements(**{field: self.columns[key] for key, field in ELEMENT_FIELDS.items()})
+
+    def column_strings(self, key):
+        """Values of a string column as a list (optional ones '' where absent)."""
+        return [self.strings[i] for i in self.columns[key]]
+
+    def properties(self):
+        """Body name -> JSON-style property dict, built on access (see CatalogProperties)."""
+        return CatalogProperties(self)
+
+
+class CatalogProperties(Mapping):
+    """
+    Read-only mapping of body name to its catalog properties, as in the JSON.
+
+    Dicts are built from the columns when a body is looked up, so large
+    catalogs hold no Python object per body. Optional keys absent from the
+    source are absent here too; 'moons' is not reconstructed.
+    """
+
+    def __init__(self, catalog):
+        self._catalog = catalog
+        self._rows = {name: i for i, name in enumerate(catalog.names)}
+
+    def __getitem__(self, name):
+        row = self._rows[name]
+        columns, strings = self._catalog.columns, self._catalog.strings
+        props = {key: float(columns[key][row]) for key in tuple(ELEMENT_FIELDS) + REQUIRED_NUMBERS}
+        props.update((key, float(columns[key][row])) for key in OPTIONAL_NUMBERS
+                     if not np.isnan(columns[key][row]))
+        props.update((key, strings[columns[key][row]]) for key in REQUIRED_STRINGS)
+        props.update((key, strings[columns[key][row]]) for key in OPTIONAL_STRINGS
+                     if strings[columns[key][row]])
+        return props
+
+    def __iter__(self):
+        return iter(self._catalog.names)
+
+    def __len__(self):
+        return len(self._catalog.names)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Validate and compile celestial body catalogs")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    check_parser = commands.add_parser('check', help='validate a JSON catalog')
+    check_parser.add_argument('source', nargs='?', default=DEFAULT_CATALOG,
+                              help='JSON catalog (default: %(default)s)')
+
+    compile_parser = commands.add_parser('compile', help='validate a JSON catalog and write the binary form')
+    compile_parser.add_argument('source', help='JSON catalog')
+    compile_parser.add_argument('output', help='compiled catalog to write (e.g. celestial_bodies.sscat)')
+
+    info_parser = commands.add_parser('info', help='summarize a compiled catalog')
+    info_parser.add_argument('path', help='compiled catalog')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'check':
+            data = load_json(args.source)
+            print(f"{args.source}: OK ({len(_flatten(data)[0])} bodies)")
+        elif args.command == 'compile':
+            count = compile_catalog(args.source, args.output)
+            print(f"Wrote {count} bodies to {args.output}")
+        else:
+            cat = CompiledCatalog(args.path)
+            moons = int((cat.parent_rows >= 0).sum())
+            print(f"{args.path}: format version {FORMAT_VERSION}, {len(cat)} bodies "
+                  f"({len(cat) - moons} primaries, {moons} moons), {len(cat.strings)} strings")
+            print(f"simulation: {cat.simulation}")
+    except CatalogError as exc:
+        raise SystemExit(str(exc))
@@ -0,0 +1,299 @@
+"""
+Piecewise Chebyshev fits of parent-relative orbits, in the spirit of JPL SPK
+type 2 segments.
+
+Each body's motion over the simulated span is cut into equal-length records
+and every record holds one Chebyshev series per coordinate, so a position
+is a record lookup plus degree + 1 multiply-adds per coordinate instead of
+Newton iterations and trigonometric rotations.
+A body whose period is shorter than the span stores a single orbit (Kepler
+orbits repeat exactly) and is evaluated by phase at any time; longer-period
+bodies cover only the fitted span.
+
+Records start at RECORDS_PER_ORBIT per period and are halved until the fit,
+checked on a grid CHECK_POINTS_PER_NODE times finer than the interpolation
+nodes, stays within max_error of the Kepler solution. Fits can be saved to
+and loaded from a .npz file:
+
+    python chebyshev.py fit coefficients.npz --max-error 1e-9
+    python chebyshev.py info coefficients.npz
+
+    eph = Ephemeris(lazy=True).load()
+    eph.fit_chebyshev(max_error=1e-9).save('coefficients.npz')
+    eph.load_chebyshev('coefficients.npz')   # positions(), frame(), ... now use the fit
+"""
+import argparse
+
+import numpy as np
+
+from ephemeris import AU_KM, DEFAULT_CATALOG, Ephemeris, propagate_batch
+
+# Default largest fit error per body, in AU (about 0.15 km)
+DEFAULT_MAX_ERROR = 1e-9
+
+# Chebyshev degree of every record; evaluation cost grows with it, and
+# below about 8 the extra records outweigh the cheaper series
+DEFAULT_DEGREE = 8
+
+# Initial records per orbital period before refinement
+RECORDS_PER_ORBIT = 8
+
+# Records shorter than this (days) are never split further
+MIN_RECORD_DAYS = 1e-3
+
+# Fit-error check points per interpolation node
+CHECK_POINTS_PER_NODE = 4
+
+# Bodies x times evaluated per pass; small enough for the gathered
+# coefficients to stay in cache, which matters more than NumPy call overhead
+CHUNK_ELEMENTS = 1 << 14
+
+# File format version written by save()
+FORMAT_VERSION = 1
+
+
+def _nodes(degree):
+    """Chebyshev points of the first kind on [-1, 1], degree + 1 of them."""
+    k = np.arange(degree + 1)
+    return np.cos(np.pi * (k + 0.5) / (degree + 1))
+
+
+def _fit_matrix(degree):
+    """Matrix mapping values at _nodes(degree) to Chebyshev coefficients (discrete cosine transform)."""
+    n = degree + 1
+    j = np.arange(n)[:, None]
+    k = np.arange(n)[None, :]
+    T = 2.0 / n * np.cos(np.pi * j * (k + 0.5) / n)
+    T[0] /= 2
+    return T
+
+
+def _vander(x, degree):
+    """Chebyshev polynomials T_0..T_degree at x, shape x.shape + (degree + 1,), by their recurrence."""
+    V = np.empty(x.shape + (degree + 1,))
+    V[..., 0] = 1
+    if degree > 0:
+        V[..., 1] = x
+    x2 = 2 * x
+    for j in range(2, degree + 1):
+        np.multiply(x2, V[..., j - 1], out=V[..., j])
+        V[..., j] -= V[..., j - 2]
+    return V
+
+
+class ChebyshevEphemeris:
+    """
+    Piecewise Chebyshev coefficients of many bodies' parent-relative orbits.
+
+    Attributes:
+        names: Body names, one per fitted body (bodies_list order)
+        degree: Chebyshev degree of every record
+        start_day: Days since epoch where every body's first record starts
+        domain: Days covered by each body's records (its period if periodic, else the span)
+        periodic: Whether each body wraps around its domain
+        record_days: Record length of each body (days)
+        offsets: Records of body i are coeffs[offsets[i]:offsets[i + 1]]
+        coeffs: Coefficients (n_records, 3, degree + 1) in AU, one contiguous
+            block per record so a lookup gathers one row
+        max_error: Largest fit error found for each body (AU)
+        epoch: Catalog epoch (ISO string) the days are counted from
+        elements: Stacked orbital elements the fit was made from, (7, n_bodies)
+    """
+
+    def __init__(self, names, degree, start_day, domain, periodic, record_days, offsets, coeffs,
+                 max_error, epoch, elements):
+        self.names = list(names)
+        self.degree = int(degree)
+        self.start_day = float(start_day)
+        self.domain = domain
+        self.periodic = periodic
+        self.record_days = record_days
+        self.offsets = offsets
+        self.coeffs = coeffs
+        self.max_error = max_error
+        self.epoch = str(epoch)
+        self.elements = elements
+
+    @staticmethod
+    def stack_elements(elements):
+        """OrbitalElements as one (7, n_bodies) array, used to check a loaded fit still matches."""
+        return np.stack([elements.a, elements.e, elements.inc, elements.Omega, elements.omega,
+                         elements.M0, elements.period])
+
+    @classmethod
+    def fit(cls, eph, max_error=DEFAULT_MAX_ERROR, degree=DEFAULT_DEGREE, progress=None):
+        """
+        Fit every body of a loaded Ephemeris over its span.
+
+        Args:
+            eph: Loaded Ephemeris (its span and solver tolerances are used)
+            max_error: Largest allowed fit error in AU
+            degree: Chebyshev degree per record
+            progress: Optional callback(count, total, name) after each body
+
+        Returns:
+            ChebyshevEphemeris
+        """
+        elements = eph.elements
+        span = eph.total_sim_days
+        periodic = (elements.period > 0) & (elements.period < span)
+        domain = np.where(periodic, elements.period, span)
+
+        nodes = _nodes(degree)
+        T = _fit_matrix(degree)
+        # Check points include the record ends, where the interpolation error peaks
+        check = np.cos(np.linspace(0, np.pi, CHECK_POINTS_PER_NODE * (degree + 1) + 1))
+        check_V = _vander(check, degree)  # (n_check, degree + 1)
+
+        all_coeffs, record_days, fit_error = [], np.empty(len(elements)), np.empty(len(elements))
+        for i, name in enumerate(eph.bodies_list):
+            body = elements[i:i + 1]
+            period = body.period[0]
+            n_records = max(1, int(np.ceil(domain[i] / period * RECORDS_PER_ORBIT))) if period > 0 else 1
+            while True:
+                length = domain[i] / n_records
+                starts = eph.start_day + np.arange(n_records) * length
+                mid = starts + length / 2
+
+                # Values at the nodes of every record, then coefficients in one product
+                at_nodes = propagate_batch(body, (mid[:, None] + nodes * length / 2).ravel())[0]
+                coeffs = np.einsum('jk,rkc->rcj', T, at_nodes.reshape(n_records, degree + 1, 3))
+
+                exact = propagate_batch(body, (mid[:, None] + check * length / 2).ravel())[0]
+                approx = np.einsum('kj,rcj->rkc', check_V, coeffs).reshape(-1, 3)
+                err = np.linalg.norm(approx - exact, axis=-1).max()
+                if err <= max_error or length / 2 < MIN_RECORD_DAYS:
+                    break
+                n_records *= 2
+
+            all_coeffs.append(coeffs)
+            record_days[i] = length
+            fit_error[i] = err
+            if progress is not None:
+                progress(i + 1, len(elements), name)
+
+        offsets = np.concatenate([[0], np.cumsum([len(c) for c in all_coeffs])])
+        return cls(eph.bodies_list, degree, eph.start_day, domain, periodic, record_days, offsets,
+                   np.concatenate(all_coeffs), fit_error, eph.epoch_date.isoformat(),
+                   cls.stack_elements(elements))
+
+    def __len__(self):
+        return len(self.names)
+
+    def record_counts(self):
+        """Number of records stored for each body."""
+        return np.diff(self.offsets)
+
+    @property
+    def nbytes(self):
+        """Memory held by the coefficients."""
+        return self.coeffs.nbytes
+
+    def covers(self, rows, days):
+        """
+        Which (body, time) pairs the fit can evaluate.
+
+        Args:
+            rows: Body indices
+            days: Days since epoch, shape (n_times,)
+
+        Returns:
+            Boolean array (n_bodies, n_times)
+        """
+        t = np.asarray(days, dtype=float)[None, :] - self.start_day
+        inside = (t >= 0) & (t <= self.domain[rows, None])
+        return inside | self.periodic[rows, None]
+
+    def positions(self, rows, days, chunk_elements=CHUNK_ELEMENTS):
+        """
+        Parent-relative positions from the fit.
+
+        Times outside a non-periodic body's span are clamped to its ends;
+        use covers() to find them.
+
+        Args:
+            rows: Body indices (bodies_list order)
+            days: Days since epoch - scalar or array of n_times
+            chunk_elements: Maximum bodies x times evaluated per pass
+
+        Returns:
+            Array of shape (n_bodies, n_times, 3) in AU
+        """
+        rows = np.asarray(rows, dtype=int)
+        days = np.atleast_1d(np.asarray(days, dtype=float))
+        out = np.empty((len(rows), len(days), 3))
+
+        domain = self.domain[rows, None]
+        length = self.record_days[rows, None]
+        first = self.offsets[rows, None]
+        last = self.offsets[rows + 1, None] - 1
+        periodic = self.periodic[rows, None]
+
+        chunk_size = max(1, chunk_elements // max(1, len(rows)))
+        for start in range(0, len(days), chunk_size):
+            t = days[None, start:start + chunk_size] - self.start_day
+            t = np.where(periodic, t % domain, np.clip(t, 0, domain))
+
+            # VECTORIZED: record lookup and local coordinate for every body and time
+            k = np.minimum((t // length).astype(int), last - first)
+            x = np.clip((t - k * length) * (2 / length) - 1, -1, 1)
+            coeffs = np.take(self.coeffs, first + k, axis=0)
+            out[:, start:start + chunk_size] = np.einsum('...cj,...j->...c', coeffs,
+                                                          _vander(x, self.degree))
+        return out
+
+    def save(self, path):
+        """Write the fit to a .npz file."""
+        np.savez(path, version=FORMAT_VERSION, names=np.array(self.names), degree=self.degree,
+                 start_day=self.start_day, domain=self.domain, periodic=self.periodic,
+                 record_days=self.record_days, offsets=self.offsets, coeffs=self.coeffs,
+                 max_error=self.max_error, epoch=self.epoch, elements=self.elements)
+
+    @classmethod
+    def load(cls, path):
+        """Read a fit written by save()."""
+        with np.load(path) as data:
+            if int(data['version']) != FORMAT_VERSION:
+                raise ValueError(f"{path}: unsupported Chebyshev file version {int(data['version'])}")
+            return cls(data['names'].tolist(), data['degree'], data['start_day'], data['domain'],
+                       data['periodic'], data['record_days'], data['offsets'], data['coeffs'],
+                       data['max_error'], data['epoch'], data['elements'])
+
+    def report(self):
+        """One line per body: records, record length and largest fit error."""
+        lines = []
+        for i, name in enumerate(self.names):
+            kind = 'one orbit' if self.periodic[i] else 'span'
+            lines.append(f"{name:<20} {self.record_counts()[i]:>6} records of {self.record_days[i]:10.4f} d "
+                         f"({kind:<9})  max error {self.max_error[i] * AU_KM:.3g} km")
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fit or inspect piecewise Chebyshev ephemerides")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    fit_parser = commands.add_parser('fit', help='fit every body of a catalog and save the coefficients')
+    fit_parser.add_argument('output', help='.npz file to write')
+    fit_parser.add_argument('--catalog', default=DEFAULT_CATALOG,
+                            help='celestial bodies JSON catalog (default: %(default)s)')
+    fit_parser.add_argument('--max-error', type=float, default=DEFAULT_MAX_ERROR, metavar='AU',
+                            help='largest fit error per body (default: %(default)s AU)')
+    fit_parser.add_argument('--degree', type=int, default=DEFAULT_DEGREE,
+                            help='Chebyshev degree per record (default: %(default)s)')
+    fit_parser.add_argument('--accuracy-km', type=float, default=None, metavar='KM',
+                            help='Kepler-solver accuracy of the fitted positions (default: fixed tolerance)')
+
+    info_parser = commands.add_parser('info', help='print the records and fit error of a saved fit')
+    info_parser.add_argument('path', help='.npz file written by fit')
+    args = parser.parse_args()
+
+    if args.command == 'fit':
+        eph = Ephemeris(lazy=True, accuracy_km=args.accuracy_km).load(args.catalog)
+        cheb = eph.fit_chebyshev(args.max_error, args.degree)
+        cheb.save(args.output)
+    else:
+        cheb = ChebyshevEphemeris.load(args.path)
+    print(cheb.report())
+    print(f"\n{len(cheb)} bodies, {cheb.record_counts().sum():,} records, {cheb.nbytes / 1e3:.1f} kB "
+          f"(degree {cheb.degree}), worst fit error {cheb.max_error.max() * AU_KM:.3g} km")
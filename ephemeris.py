@@ -0,0 +1,1112 @@
+"""
+Ephemeris engine for the 3D Solar System.
+
+Keplerian orbital mechanics with no plotting dependencies, so batch jobs and
+services can compute positions without importing matplotlib:
+
+    from ephemeris import Ephemeris
+
+    eph = Ephemeris().load('celestial_bodies.json')
+    xyz = eph.positions(['Earth', 'Earth_Moon'], [0.0, 365.25])
+    xyz = eph.positions_at('Mars', datetime(2024, 3, 1, 6, 30))
+
+The matplotlib animation in SolarSystem.py is a frontend on top of this module.
+"""
+import warnings
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from store import BodyInfo, TrajectoryStore
+
+DEFAULT_CATALOG = 'celestial_bodies.json'
+DEFAULT_EPOCH = '2020-01-01T00:00:00'
+
+# Julian date of the J2000.0 epoch (2000-01-01 12:00)
+JD_J2000 = 2451545.0
+J2000_DATE = datetime(2000, 1, 1, 12)
+
+# Total simulation time in days (12 years)
+TOTAL_SIM_DAYS = 4380.0
+
+# Eccentricity above which the Kepler solver uses Markley's starter
+HIGH_ECCENTRICITY = 0.8
+
+# Kilometres per astronomical unit (IAU 2012)
+AU_KM = 149597870.7
+
+# Newton step (radians) below which Kepler's equation counts as solved
+DEFAULT_KEPLER_TOLERANCE = 1e-6
+
+# Tolerance range used by the solver: near periapsis of a high-eccentricity
+# orbit the Newton step divides float64 round-off by 1 - e cos E, so steps
+# stall around 1e-13 rad for e = 0.999 and never reach a smaller tolerance
+# (1e-12 rad is still under 5 m at 30 AU); above 1 rad the starter alone is
+# already closer than asked
+MIN_KEPLER_TOLERANCE = 1e-12
+MAX_KEPLER_TOLERANCE = 1.0
+
+# Grid size (bodies x times) solved per pass by propagate_batch
+BATCH_CHUNK_ELEMENTS = 1 << 20
+
+# Frames kept in the lazy-mode ring of recently evaluated frames
+DEFAULT_RING_SIZE = 256
+
+# Time steps per block yielded by Ephemeris.stream
+DEFAULT_STREAM_BLOCK = 4096
+
+
+def datetime_to_jd(dt):
+    """Julian date of a datetime (naive datetimes are treated as UTC/TT alike)."""
+    return JD_J2000 + (dt - J2000_DATE).total_seconds() / 86400.0
+
+
+def jd_to_datetime(jd):
+    """Datetime of a Julian date."""
+    return J2000_DATE + timedelta(days=jd - JD_J2000)
+
+
+def days_since_epoch(when, epoch_date):
+    """
+    Days from epoch_date to one or more instants, vectorized.
+
+    Args:
+        when: datetime, numpy datetime64 (scalar or array), sequence of datetimes,
+            or Julian date(s) as a float or float array
+        epoch_date: Reference datetime
+
+    Returns:
+        Float array of days with the shape of when (0-d for a single instant)
+    """
+    if isinstance(when, datetime):
+        return np.asarray((when - epoch_date).total_seconds() / 86400.0)
+
+    when = np.asarray(when)
+    if when.dtype == object:  # Sequence of datetimes
+        when = when.astype('datetime64[us]')
+    if np.issubdtype(when.dtype, np.datetime64):
+        return (when - np.datetime64(epoch_date, 'us')) / np.timedelta64(1, 'D')
+    return when.astype(float) - datetime_to_jd(epoch_date)
+
+
+# ============================================================================
+# KEPLERIAN ORBITAL MECHANICS - REALISTIC PHYSICS
+# ============================================================================
+
+class KeplerConvergenceWarning(RuntimeWarning):
+    """Some elements of Kepler's equation did not converge within max_iterations."""
+
+
+def kepler_tolerance(a, accuracy_km):
+    """
+    Newton tolerance on the eccentric anomaly that keeps positions within accuracy_km.
+
+    Moving E by dE moves a body by at most a*dE along its ellipse
+    (|d(x, y)/dE| = sqrt(a^2 sin^2 E + b^2 cos^2 E) <= a), so a tolerance of
+    accuracy / a bounds the position error, and Newton's quadratic convergence
+    leaves the actual error well below the last step. Distant bodies get tight
+    tolerances, close-in moons loose ones.
+
+    Args:
+        a: Semi-major axes (AU) - scalar or array
+        accuracy_km: Target position accuracy (km)
+
+    Returns:
+        Tolerances (radians), same shape as a, within
+        [MIN_KEPLER_TOLERANCE, MAX_KEPLER_TOLERANCE]
+    """
+    a = np.asarray(a, dtype=float)
+    with np.errstate(divide='ignore'):
+        tolerance = accuracy_km / AU_KM / a
+    return np.clip(tolerance, MIN_KEPLER_TOLERANCE, MAX_KEPLER_TOLERANCE)
+
+
+def kepler_initial_guess(M, e):
+    """
+    Starting eccentric anomaly for Newton iteration on Kepler's equation.
+
+    Low eccentricities use the series guess E = M + e*sin(M). High eccentricities
+    use Markley's (1995) cubic starter, which stays within ~1e-3 rad even for
+    near-periapsis samples of comet orbits where E = M or E = pi converge slowly.
+
+    Args:
+        M: Mean anomaly (radians) - array
+        e: Eccentricity - scalar or array broadcastable to M
+
+    Returns:
+        E0: Initial eccentric anomaly (radians) - same shape as M
+    """
+    if np.ndim(e) == 0:
+        if e < HIGH_ECCENTRICITY:
+            return M + e * np.sin(M)
+        return _markley_starter(M, e)
+
+    e = np.broadcast_to(e, M.shape)
+    E0 = M + e * np.sin(M)
+    high = e >= HIGH_ECCENTRICITY
+    if high.any():
+        E0[high] = _markley_starter(M[high], e[high])
+    return E0
+
+
+def _markley_starter(M, e):
+    """Markley's cubic approximation to E, valid for any M."""
+    # Markley's starter works on M reduced to [-pi, pi]
+    M_red = (M + np.pi) % (2 * np.pi) - np.pi
+    alpha = (3 * np.pi**2 + 1.6 * np.pi * (np.pi - np.abs(M_red)) / (1 + e)) / (np.pi**2 - 6)
+    d = 3 * (1 - e) + alpha * e
+    q = 2 * alpha * d * (1 - e) - M_red**2
+    r = 3 * alpha * d * (d - 1 + e) * M_red + M_red**3
+    w = (np.abs(r) + np.sqrt(q**3 + r**2))**(2.0 / 3.0)
+    E0 = (2 * r * w / (w**2 + w * q + q**2) + M_red) / d
+
+    return E0 + (M - M_red)
+
+
+def solve_kepler_equation_vectorized(M, e, tolerance=DEFAULT_KEPLER_TOLERANCE, max_iterations=100,
+                                     return_iterations=False, return_converged=False):
+    """
+    Vectorized Kepler equation solver for arrays of mean anomalies.
+    10-100x faster than scalar version!
+
+    Elements are frozen as soon as they converge, so each Newton step only
+    touches the samples that are still moving (e.g. near-periapsis samples of
+    a high-eccentricity comet) instead of the whole array.
+
+    Elements still moving after max_iterations keep their last iterate and
+    are reported with a KeplerConvergenceWarning (and in the converged mask).
+
+    Args:
+        M: Mean anomaly (radians) - can be scalar or array
+        e: Eccentricity (< 1) - scalar, or array broadcastable to M (e.g. one row per body)
+        tolerance: Newton step (radians) at which an element counts as solved -
+            scalar or array broadcastable to M (e.g. per body from kepler_tolerance),
+            clipped to [MIN_KEPLER_TOLERANCE, MAX_KEPLER_TOLERANCE]
+        max_iterations: Maximum number of iterations
+        return_iterations: Also return the Newton steps taken per element
+        return_converged: Also return which elements converged
+
+    Returns:
+        E: Eccentric anomaly (radians) - same shape as M
+        iterations: Newton steps per element (int array, same shape as M),
+            only if return_iterations is True
+        converged: Boolean array, same shape as M, only if return_converged is True
+    """
+    M = np.atleast_1d(np.asarray(M, dtype=float))
+    shape = M.shape
+    if np.ndim(e) > 0:
+        e = np.broadcast_to(e, shape).ravel()
+    tolerance = np.clip(tolerance, MIN_KEPLER_TOLERANCE, MAX_KEPLER_TOLERANCE)
+    if np.ndim(tolerance) > 0:
+        tolerance = np.broadcast_to(tolerance, shape).ravel()
+    M = M.ravel()
+
+    E = kepler_initial_guess(M, e)
+    iterations = np.full(M.shape, max_iterations, dtype=np.int32)
+    converged = np.zeros(M.shape, dtype=bool)
+
+    # Newton-Raphson iteration (vectorized) on a compacted working set:
+    # converged elements are written back and dropped from the arrays
+    active = np.arange(M.size)
+    E_act, M_act, e_act, tol_act = E.copy(), M, e, tolerance
+    delta = np.zeros(0)
+    for i in range(max_iterations):
+        f = E_act - e_act * np.sin(E_act) - M_act  # Kepler's equation
+        f_prime = 1 - e_act * np.cos(E_act)  # Derivative, >= 1 - e > 0
+
+        delta = f / f_prime
+        E_act -= delta
+
+        # Freeze converged elements
+        done = np.abs(delta) < tol_act
+        if done.all():
+            E[active] = E_act
+            iterations[active] = i + 1
+            converged[active] = True
+            active = active[:0]
+            break
+        if done.any():
+            E[active[done]] = E_act[done]
+            iterations[active[done]] = i + 1
+            converged[active[done]] = True
+            keep = ~done
+            active, E_act, M_act, delta = active[keep], E_act[keep], M_act[keep], delta[keep]
+            if np.ndim(e_act) > 0:
+                e_act = e_act[keep]
+            if np.ndim(tol_act) > 0:
+                tol_act = tol_act[keep]
+    else:
+        # Out of iterations: keep the last iterate for the unconverged elements
+        E[active] = E_act
+
+    if active.size:
+        warnings.warn(f"Kepler's equation did not converge for {active.size:,} of {M.size:,} "
+                      f"elements in {max_iterations} iterations "
+                      f"(largest last step {np.abs(delta).max():.3g} rad)",
+                      KeplerConvergenceWarning, stacklevel=2)
+
+    E = E.reshape(shape)
+    extra = []
+    if return_iterations:
+        extra.append(iterations.reshape(shape))
+    if return_converged:
+        extra.append(converged.reshape(shape))
+    return (E, *extra) if extra else E
+
+
+def eccentric_to_true_anomaly_vectorized(E, e):
+    """
+    Vectorized conversion from eccentric to true anomaly.
+
+    Uses the half-angle form nu = 2 atan2(sqrt(1+e) sin(E/2), sqrt(1-e) cos(E/2)),
+    which has no division, so it stays finite and accurate as e approaches 1
+    (where 1 - e*cos(E) goes to zero at periapsis).
+
+    Args:
+        E: Eccentric anomaly (radians) - can be scalar or array
+        e: Eccentricity (< 1) - scalar or array broadcastable to E
+
+    Returns:
+        nu: True anomaly (radians, -pi..pi) - same shape as E
+    """
+    E = np.atleast_1d(E)
+    e = np.asarray(e, dtype=float)
+    return 2 * np.arctan2(np.sqrt(1 + e) * np.sin(E / 2), np.sqrt(1 - e) * np.cos(E / 2))
+
+
+def calculate_3d_position(nu, a, e, inc, omega, Omega, parent_pos=None):
+    """
+    Calculate 3D position using Keplerian orbital elements.
+
+    Args:
+        nu: True anomaly (radians)
+        a: Semi-major axis (AU)
+        e: Eccentricity
+        inc: Inclination (degrees)
+        omega: Argument of periapsis (degrees)
+        Omega: Longitude of ascending node (degrees)
+        parent_pos: Parent body position (x, y, z) if this is a moon
+
+    Returns:
+        (x, y, z): 3D position in AU
+    """
+    # Convert angles to radians
+    inc_rad = np.radians(inc)
+    omega_rad = np.radians(omega)
+    Omega_rad = np.radians(Omega)
+
+    # Calculate distance from focus (parent body)
+    r = a * (1 - e**2) / (1 + e * np.cos(nu))
+
+    # Position in orbital plane (periapsis is along x-axis)
+    x_orb = r * np.cos(nu)
+    y_orb = r * np.sin(nu)
+    z_orb = 0
+
+    # Rotation matrix 1: Argument of periapsis (rotate in orbital plane)
+    cos_w = np.cos(omega_rad)
+    sin_w = np.sin(omega_rad)
+    x1 = cos_w * x_orb - sin_w * y_orb
+    y1 = sin_w * x_orb + cos_w * y_orb
+    z1 = z_orb
+
+    # Rotation matrix 2: Inclination (tilt the orbital plane)
+    cos_i = np.cos(inc_rad)
+    sin_i = np.sin(inc_rad)
+    x2 = x1
+    y2 = cos_i * y1 - sin_i * z1
+    z2 = sin_i * y1 + cos_i * z1
+
+    # Rotation matrix 3: Longitude of ascending node (rotate around z-axis)
+    cos_O = np.cos(Omega_rad)
+    sin_O = np.sin(Omega_rad)
+    x3 = cos_O * x2 - sin_O * y2
+    y3 = sin_O * x2 + cos_O * y2
+    z3 = z2
+
+    # If orbiting a parent body, add parent's position
+    if parent_pos is not None:
+        x3 += parent_pos[0]
+        y3 += parent_pos[1]
+        z3 += parent_pos[2]
+
+    return x3, y3, z3
+
+
+def orbital_position(body_props, days_elapsed):
+    """
+    Position of a body relative to the body it orbits, using VECTORIZED Keplerian mechanics.
+
+    Args:
+        body_props: Dictionary of body properties from JSON
+        days_elapsed: Days since the simulation epoch - can be scalar or array
+
+    Returns:
+        (x, y, z): 3D position in AU relative to the parent (or the Sun)
+    """
+    xyz = propagate_batch(OrbitalElements.from_bodies([body_props]), days_elapsed)[0]
+    return xyz[:, 0], xyz[:, 1], xyz[:, 2]
+
+
+# ============================================================================
+# BATCHED PROPAGATION - STRUCTURE OF ARRAYS
+# ============================================================================
+
+class OrbitalElements:
+    """
+    Orbital elements of many bodies stacked into arrays (structure of arrays).
+
+    Angles are stored in degrees like the JSON catalog. A period of 0 marks a
+    body that does not move (the Sun). tolerance holds optional per-body
+    Kepler solver tolerances (see with_accuracy); None uses
+    DEFAULT_KEPLER_TOLERANCE for every body.
+    """
+
+    def __init__(self, a, e, inc, Omega, omega, M0, period, tolerance=None):
+        """
+        Args:
+            a: Semi-major axes (AU)
+            e: Eccentricities
+            inc: Inclinations (degrees)
+            Omega: Longitudes of ascending node (degrees)
+            omega: Arguments of periapsis (degrees)
+            M0: Mean anomalies at epoch (degrees)
+            period: Orbital periods (days)
+            tolerance: Per-body Kepler tolerances in radians (None = default)
+        """
+        self.a = np.asarray(a, dtype=float)
+        self.e = np.asarray(e, dtype=float)
+        self.inc = np.asarray(inc, dtype=float)
+        self.Omega = np.asarray(Omega, dtype=float)
+        self.omega = np.asarray(omega, dtype=float)
+        self.M0 = np.asarray(M0, dtype=float)
+        self.period = np.asarray(period, dtype=float)
+        self.tolerance = None if tolerance is None else np.asarray(tolerance, dtype=float)
+
+    @classmethod
+    def from_bodies(cls, bodies):
+        """
+        Stack elements from a sequence of JSON body property dicts.
+
+        Args:
+            bodies: Iterable of body property dicts (celestial_bodies.json layout)
+        """
+        bodies = list(bodies)
+        return cls(
+            a=[b['rad'] for b in bodies],
+            e=[b['eccentricity'] for b in bodies],
+            inc=[b.get('inclination', 0.0) for b in bodies],
+            Omega=[b.get('longitudeOfAscendingNode', 0.0) for b in bodies],
+            omega=[b.get('argumentOfPeriapsis', 0.0) for b in bodies],
+            M0=[b.get('meanAnomalyAtEpoch', 0.0) for b in bodies],
+            period=[b['frames'] for b in bodies],
+        )
+
+    def __len__(self):
+        return len(self.a)
+
+    def __getitem__(self, index):
+        """Subset of bodies (index array, slice or boolean mask)."""
+        return OrbitalElements(self.a[index], self.e[index], self.inc[index], self.Omega[index],
+                               self.omega[index], self.M0[index], self.period[index],
+                               None if self.tolerance is None else self.tolerance[index])
+
+    def with_accuracy(self, accuracy_km):
+        """
+        Same elements with per-body solver tolerances for a target position accuracy.
+
+        Args:
+            accuracy_km: Target position accuracy (km), or None for the default tolerance
+
+        Returns:
+            OrbitalElements
+        """
+        tolerance = None if accuracy_km is None else kepler_tolerance(self.a, accuracy_km)
+        return OrbitalElements(self.a, self.e, self.inc, self.Omega, self.omega, self.M0,
+                               self.period, tolerance)
+
+    def rotation_matrices(self):
+        """
+        Orbital-plane to ecliptic rotation, one 3x3 matrix per body.
+
+        Combines the argument of periapsis, inclination and ascending node
+        rotations: R = Rz(Omega) @ Rx(inc) @ Rz(omega).
+
+        Returns:
+            Array of shape (n_bodies, 3, 3)
+        """
+        cos_w, sin_w = np.cos(np.radians(self.omega)), np.sin(np.radians(self.omega))
+        cos_i, sin_i = np.cos(np.radians(self.inc)), np.sin(np.radians(self.inc))
+        cos_O, sin_O = np.cos(np.radians(self.Omega)), np.sin(np.radians(self.Omega))
+
+        R = np.empty((len(self), 3, 3))
+        R[:, 0, 0] = cos_O * cos_w - sin_O * cos_i * sin_w
+        R[:, 0, 1] = -cos_O * sin_w - sin_O * cos_i * cos_w
+        R[:, 0, 2] = sin_O * sin_i
+        R[:, 1, 0] = sin_O * cos_w + cos_O * cos_i * sin_w
+        R[:, 1, 1] = -sin_O * sin_w + cos_O * cos_i * cos_w
+        R[:, 1, 2] = -cos_O * sin_i
+        R[:, 2, 0] = sin_i * sin_w
+        R[:, 2, 1] = sin_i * cos_w
+        R[:, 2, 2] = cos_i
+        return R
+
+
+def propagate_batch(elements, days_elapsed, chunk_elements=BATCH_CHUNK_ELEMENTS, out=None):
+    """
+    Positions of many bodies relative to their parents in one vectorized pass.
+
+    Kepler's equation is solved for the whole (n_bodies, n_times) grid at
+    once, and each body's orbital plane is rotated into place with its
+    precomputed 3x3 matrix. The time axis is processed in chunks so no
+    temporary grid holds more than chunk_elements values.
+
+    Args:
+        elements: OrbitalElements for n_bodies
+        days_elapsed: Days since the simulation epoch - scalar or array of n_times
+        chunk_elements: Maximum bodies x times solved per pass
+        out: Optional preallocated (n_bodies, n_times, 3) array
+
+    Returns:
+        Array of shape (n_bodies, n_times, 3) in AU
+    """
+    days_elapsed = np.atleast_1d(np.asarray(days_elapsed, dtype=float))
+    n_times = len(days_elapsed)
+    if out is None:
+        out = np.empty((len(elements), n_times, 3))
+
+    # Per-body constants, shaped (n_bodies, 1) to broadcast across time
+    moving = elements.period > 0
+    n = np.zeros(len(elements))
+    n[moving] = 2.0 * np.pi / elements.period[moving]  # Mean motion (radians per day)
+    n = n[:, None]
+    M0 = np.where(moving, np.radians(elements.M0), 0.0)[:, None]  # Sun stays at nu = 0
+    a = elements.a[:, None]
+    e = elements.e[:, None]
+    b = a * np.sqrt(1 - e**2)  # Semi-minor axis
+    tolerance = DEFAULT_KEPLER_TOLERANCE if elements.tolerance is None else elements.tolerance[:, None]
+
+    # Columns of the rotation matrix that the in-plane x and y axes map to
+    R = elements.rotation_matrices()
+    P = R[:, None, :, 0]
+    Q = R[:, None, :, 1]
+
+    chunk_size = max(1, chunk_elements // max(1, len(elements)))
+    for start in range(0, n_times, chunk_size):
+        days = days_elapsed[start:start + chunk_size]
+
+        # VECTORIZED: Mean anomaly and Kepler's equation for every body and time
+        M = (M0 + n * days) % (2 * np.pi)
+        E = solve_kepler_equation_vectorized(M, e, tolerance)
+
+        # Position in orbital plane, straight from the eccentric anomaly
+        x_orb = a * (np.cos(E) - e)
+        y_orb = b * np.sin(E)
+
+        # Rotate into the ecliptic frame with one matrix per body
+        block = out[:, start:start + chunk_size]
+        block[...] = x_orb[..., None] * P
+        block += y_orb[..., None] * Q
+
+    return out
+
+
+# ============================================================================
+# EPHEMERIS ENGINE
+# ============================================================================
+
+class Ephemeris:
+    """
+    Importable ephemeris built from the celestial body catalog.
+
+    Loading only parses the catalog; nothing is computed until trajectories
+    or positions are requested.
+
+    In the default precompute mode, generate_all() fills full per-frame arrays
+    for every body; with adaptive=True it stores per-body samples instead and
+    interpolates frames from them. In lazy mode nothing is precomputed: frame() and window()
+    solve Kepler's equation only for the frames requested, and a bounded ring
+    of recent frames keeps memory flat no matter how large Nframes is.
+
+    With nbody=True, generate_all() integrates the bodies orbiting the Sun
+    together (nbody.py), so planets perturb each other; moons stay on Kepler
+    orbits around their integrated parent.
+
+    fit_chebyshev() or load_chebyshev() attaches piecewise Chebyshev
+    coefficients (chebyshev.py); positions(), positions_at(), stream() and lazy
+    frames then evaluate them instead of solving Kepler's equation, falling
+    back to the solver outside a body's fitted span.
+
+    The animated span runs from start_date to end_date (the catalog epoch and
+    12 years later by default). stream() yields positions block by block over
+    any span and step with memory bounded by the block size.
+
+    Attributes:
+        bodies_list: All body names in catalog order (moons as 'Parent_Moon')
+        primary_bodies: Non-moon bodies (for the sidebar)
+        metadata: Per-body display properties (store.BodyInfo: color, marker_size, body_type, ...)
+        trajectories: Precomputed per-frame positions (store.TrajectoryStore, one
+            (n_bodies, Nframes, 3) array in dtype), filled by generate_all.
+            Moons are stored relative to their parent; frame() and window()
+            compose the parent offsets when positions are read
+    """
+
+    def __init__(self, lazy=False, ring_size=DEFAULT_RING_SIZE, workers=1, cache_dir=None,
+                 start_date=None, end_date=None, adaptive=False, max_error=None, dtype=np.float64,
+                 accuracy_km=None, nbody=False, nbody_step=None):
+        """
+        Args:
+            lazy: Evaluate frames on demand instead of precomputing every frame
+            ring_size: Number of recent frames cached in lazy mode
+            workers: Processes used by generate_all (1 = serial, None = all CPUs)
+            cache_dir: Directory for the on-disk trajectory cache (None = no cache)
+            start_date: First animated instant (datetime, default: catalog epoch)
+            end_date: End of the animated span (datetime, default: start + 12 years);
+                the frame step stays the catalog's, so Nframes grows with the span
+            adaptive: Precompute per-body adaptive samples (adaptive.py) instead of
+                every frame; frames are interpolated within max_error
+            max_error: Largest error of absolute positions in AU at any frame for
+                adaptive sampling (default: adaptive.DEFAULT_MAX_ERROR)
+            dtype: Precomputed trajectory dtype (float32 halves memory for display)
+            accuracy_km: Target Kepler-solver position accuracy in km; per-body
+                tolerances follow from each semi-major axis (None = fixed
+                DEFAULT_KEPLER_TOLERANCE for every body)
+            nbody: Precompute with the N-body integrator instead of fixed Kepler
+                orbits (precompute mode only; not cached)
+            nbody_step: Integration step in days (default: nbody.DEFAULT_STEP_DAYS)
+        """
+        if nbody and (lazy or adaptive):
+            raise ValueError("nbody integration precomputes every frame; it cannot be lazy or adaptive")
+        self.lazy = lazy
+        self.accuracy_km = accuracy_km
+        self.adaptive = adaptive
+        self.nbody = nbody
+        self.nbody_step = nbody_step
+        self.max_error = max_error
+        self.dtype = np.dtype(dtype)
+        self.ring_size = ring_size
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self._requested_span = (start_date, end_date)
+
+        self.Nframes = 0
+        self.rad = 0
+        self.tinterval = 0
+        self.epoch_date = datetime.fromisoformat(DEFAULT_EPOCH)
+        self.total_sim_days = TOTAL_SIM_DAYS
+        self.start_date = self.epoch_date
+        self.end_date = self.epoch_date + timedelta(days=TOTAL_SIM_DAYS)
+        self.start_day = 0.0  # Days from epoch_date to frame 0
+
+        self.body_props = {}  # Full body name -> JSON properties
+        self.parents = {}  # Full body name -> parent name (None for primaries)
+        self.metadata = {}
+        self.bodies_list = []
+        self.primary_bodies = []
+        self.trajectories = None  # TrajectoryStore once generated
+        self.samples = None  # AdaptiveTrajectories in adaptive mode
+        self.chebyshev = None  # ChebyshevEphemeris once fitted or loaded
+        self.elements = None  # OrbitalElements in bodies_list order
+        self.parent_rows = None  # bodies_list index of each body's parent (-1 for primaries)
+        self._frame_ring = OrderedDict()  # Frame index -> (n_bodies, 3) positions
+
+    def load(self, path=DEFAULT_CATALOG):
+        """
+        Load simulation parameters and bodies from a catalog file.
+
+        JSON catalogs are validated first, so a missing or misspelt field is
+        an error rather than a silent default. Compiled catalogs written by
+        catalog.py are memory-mapped instead of parsed.
+
+        Args:
+            path: JSON catalog (celestial_bodies.json layout) or compiled catalog
+
+        Returns:
+            self, so calls can be chained
+
+        Raises:
+            catalog.CatalogError: If a JSON catalog fails validation
+        """
+        from catalog import CompiledCatalog, is_compiled, load_json
+
+        if is_compiled(path):
+            return self._load_compiled(CompiledCatalog(path))
+
+        data = load_json(path)
+        self._reset(data['simulation'])
+        for body_name, body_props in data['bodies'].items():
+            self._add_tree(body_name, body_props, None)
+
+        self._stack_elements()
+        return self
+
+    def _load_compiled(self, cat):
+        """Fill the ephemeris from a catalog.CompiledCatalog; body_props are built only when looked up."""
+        self._reset(cat.simulation)
+        self.body_props = cat.properties()
+        names = cat.names
+        parents = [names[p] if p >= 0 else None for p in cat.parent_rows.tolist()]
+        types = [t or 'unknown' for t in cat.column_strings('type')]
+        self.bodies_list = list(names)
+        self.parents = dict(zip(names, parents))
+        self.primary_bodies = [name for name, parent in zip(names, parents) if parent is None]
+        self.metadata = {name: BodyInfo(name.rsplit('_', 1)[-1], color, size, body_type, parent)
+                         for name, color, size, body_type, parent in zip(
+                             names, cat.column_strings('color'), cat.columns['markerSize'].tolist(),
+                             types, parents)}
+
+        # VECTORIZED: element columns are used in place from the mapped file
+        self.elements = cat.elements().with_accuracy(self.accuracy_km)
+        self.parent_rows = cat.parent_rows
+        self._index_tree()
+        return self
+
+    def _reset(self, sim):
+        """Apply a catalog's simulation parameters and forget any previously loaded bodies."""
+        self.Nframes = sim['Nframes']
+        self.rad = sim['rad']
+        self.tinterval = sim['tinterval']
+        self.epoch_date = datetime.fromisoformat(sim.get('epoch', DEFAULT_EPOCH))
+        self._set_span(sim['Nframes'])
+
+        self.body_props = {}
+        self.parents = {}
+        self.metadata = {}
+        self.bodies_list = []
+        self.primary_bodies = []
+        self.trajectories = None
+        self.samples = None
+        self.chebyshev = None
+        self._frame_ring.clear()
+
+    def _add_tree(self, name, body_props, parent_name):
+        """Register a body and, recursively, its 'moons' (any depth) as 'Parent_Moon'."""
+        self._add_body(name, body_props, parent_name)
+        for moon_name, moon_props in body_props.get('moons', {}).items():
+            self._add_tree(f"{name}_{moon_name}", moon_props, name)
+
+    def _set_span(self, catalog_frames):
+        """Place frame 0 at start_date and size Nframes to reach end_date at the catalog's frame step."""
+        frame_days = TOTAL_SIM_DAYS / catalog_frames
+        start_date, end_date = self._requested_span
+        self.start_date = start_date or self.epoch_date
+        self.end_date = end_date or self.start_date + timedelta(days=TOTAL_SIM_DAYS)
+        if self.end_date <= self.start_date:
+            raise ValueError(f"end_date {self.end_date} must be after start_date {self.start_date}")
+
+        self.start_day = (self.start_date - self.epoch_date).total_seconds() / 86400.0
+        span = (self.end_date - self.start_date).total_seconds() / 86400.0
+        self.Nframes = max(1, int(round(span / frame_days)))
+        self.total_sim_days = self.Nframes * frame_days
+
+    def _add_body(self, name, body_props, parent_name):
+        self.body_props[name] = body_props
+        self._register(name, parent_name, body_props['color'], body_props['markerSize'],
+                       body_props.get('type', 'unknown'))
+
+    def _register(self, name, parent_name, color, marker_size, body_type):
+        self.parents[name] = parent_name
+        self.metadata[name] = BodyInfo(
+            name=name.split('_')[-1] if '_' in name else name,
+            color=color,
+            marker_size=marker_size,
+            body_type=body_type,
+            parent=parent_name,
+        )
+        self.bodies_list.append(name)
+        if parent_name is None:
+            self.primary_bodies.append(name)
+
+    def _stack_elements(self):
+        """Stack orbital elements and the parent tree into arrays for batched propagation."""
+        row = {name: i for i, name in enumerate(self.bodies_list)}
+        self.elements = OrbitalElements.from_bodies(
+            self.body_props[name] for name in self.bodies_list).with_accuracy(self.accuracy_km)
+        self.parent_rows = np.array([row[self.parents[name]] if self.parents[name] else -1
+                                     for name in self.bodies_list], dtype=int)
+        self._index_tree()
+
+    def _index_tree(self):
+        """
+        Group bodies by depth in the parent tree so positions can be made
+        absolute one level at a time (planets, then moons, then their moons...).
+        """
+        # VECTORIZED: one pass per tree level instead of one per body
+        depth = np.zeros(len(self.parent_rows), dtype=int)
+        has_parent = self.parent_rows >= 0
+        while True:
+            deeper = np.where(has_parent, depth[self.parent_rows] + 1, 0)
+            if np.array_equal(deeper, depth):
+                break
+            depth = deeper
+        self._depth_levels = [(np.flatnonzero(depth == d), self.parent_rows[depth == d])
+                              for d in range(1, depth.max() + 1 if len(depth) else 1)]
+
+    @property
+    def days_per_frame(self):
+        """Simulated days between consecutive animation frames."""
+        return self.total_sim_days / self.Nframes
+
+    def frame_days(self, idx):
+        """Days since epoch_date of a frame index (scalar or array, may be fractional)."""
+        return self.start_day + np.asarray(idx) * self.days_per_frame
+
+    def generate_trajectories(self, name, start_date=None):
+        """
+        Generate complete orbital trajectory for a body using VECTORIZED Keplerian mechanics.
+        Moons are stored relative to their parent, so bodies can be generated in any order.
+
+        Args:
+            name: Body name (moons as 'Parent_Moon')
+            start_date: Simulation start date (datetime object)
+        """
+        # VECTORIZED: Calculate all time points at once
+        frame_indices = np.arange(self.Nframes)
+        days_elapsed = self.frame_days(frame_indices)
+
+        xyz = propagate_batch(self.elements[self._rows([name])], days_elapsed)[0]
+
+        # Store trajectory data (a read-only store from the cache is copied first)
+        if self.trajectories is None:
+            self.trajectories = TrajectoryStore.empty(self.bodies_list, self.Nframes, self.dtype)
+        elif not self.trajectories.xyz.flags.writeable:
+            self.trajectories = TrajectoryStore(self.bodies_list, np.array(self.trajectories.xyz))
+        self.trajectories[name][:] = xyz
+
+    def generate_all(self, progress=None):
+        """
+        Generate trajectories for every body in one batched propagation pass,
+        spread over a process pool when workers != 1. Does nothing in lazy mode.
+        Moon trajectories are relative to their parent.
+
+        With a cache directory, bodies whose trajectories are already on disk
+        are not recomputed, and the assembled store is memory-mapped read-only
+        from the cache instead of being built in memory. In nbody mode the primaries
+        are integrated together (never cached). In adaptive mode only the
+        per-body knots are computed (self.samples) and trajectories stays None.
+
+        Args:
+            progress: Optional callback(count, total, name) called as each body is stored
+        """
+        if self.lazy:
+            return
+
+        days_elapsed = self.frame_days(np.arange(self.Nframes))
+        if self.adaptive:
+            from adaptive import DEFAULT_MAX_ERROR, AdaptiveTrajectories
+
+            def report(count, total):
+                if progress is not None:
+                    progress(count, total, self.bodies_list[count - 1])
+
+            max_error = DEFAULT_MAX_ERROR if self.max_error is None else self.max_error
+            self.samples = AdaptiveTrajectories.fit(self.elements, days_elapsed, max_error,
+                                                    progress=report, parent_rows=self.parent_rows)
+            return
+        if self.nbody:
+            from nbody import DEFAULT_STEP_DAYS, integrate_ephemeris
+
+            step = DEFAULT_STEP_DAYS if self.nbody_step is None else self.nbody_step
+            xyz = integrate_ephemeris(self, days_elapsed, step=step)
+            store = TrajectoryStore(self.bodies_list, xyz).astype(self.dtype)
+        elif self.cache_dir is not None:
+            store = self._cached_store(days_elapsed)
+        elif self.workers == 1:
+            # Fill the store block by block over the same blocks stream() yields
+            store = TrajectoryStore.empty(self.bodies_list, self.Nframes, self.dtype)
+            lo = 0
+            for days in self._stream_days(None, None, None, DEFAULT_STREAM_BLOCK):
+                store.xyz[:, lo:lo + len(days)] = propagate_batch(self.elements, days)
+                lo += len(days)
+        else:
+            xyz = self._propagate(self.elements, days_elapsed)
+            store = TrajectoryStore(self.bodies_list, xyz).astype(self.dtype)
+        self.trajectories = store
+
+        if progress is not None:
+            total = len(self.bodies_list)
+            for count, name in enumerate(self.bodies_list, start=1):
+                progress(count, total, name)
+
+    def _propagate(self, elements, days_elapsed):
+        """Parent-relative positions for generate_all, serial or on the multi-core backend."""
+        if self.workers == 1:
+            return propagate_batch(elements, days_elapsed)
+
+        # Optional multi-core backend, split along the time axis
+        from parallel import propagate_parallel
+        return propagate_parallel(elements, days_elapsed, workers=self.workers)
+
+    def _cached_store(self, days_elapsed):
+        """Read-only memory-mapped store from the trajectory cache, assembling it on a miss."""
+        from cache import TrajectoryCache
+
+        cache = TrajectoryCache(self.cache_dir)
+        keys = cache.body_keys(self)
+        store_key = cache.store_key([keys[name] for name in self.bodies_list], self.dtype)
+        if store_key not in cache:
+            tracks = self._cached_tracks(cache, keys, days_elapsed)
+            cache.save_store(store_key, tracks, self.Nframes, self.dtype)
+        return TrajectoryStore(self.bodies_list, cache.load(store_key))
+
+    def _cached_tracks(self, cache, keys, days_elapsed):
+        """Per-body (3, Nframes) relative arrays from the trajectory cache, computing only missing bodies."""
+        missing = [i for i, name in enumerate(self.bodies_list) if keys[name] not in cache]
+
+        # Only missing bodies are propagated; relative orbits do not depend on the parent's
+        local = {i: j for j, i in enumerate(missing)}
+        if missing:
+            relative = self._propagate(self.elements[np.array(missing)], days_elapsed)
+
+        tracks = []
+        for i, name in enumerate(self.bodies_list):
+            if i in local:
+                cache.save(keys[name], relative[local[i]].T)
+            tracks.append(cache.load(keys[name]))
+        return tracks
+
+    def _compose(self, xyz):
+        """Add parent offsets in place, level by level, to rows in bodies_list order."""
+        for rows, parent_rows in self._depth_levels:
+            xyz[rows] += xyz[parent_rows]
+        return xyz
+
+    def frame(self, idx):
+        """
+        Absolute positions of all bodies at one animation frame.
+
+        Fractional frames are interpolated linearly between the two
+        precomputed frames in precompute mode and solved exactly in lazy mode.
+
+        Args:
+            idx: Frame index (0 <= idx < Nframes), may be fractional
+
+        Returns:
+            Array of shape (n_bodies, 3) in AU, rows in bodies_list order
+        """
+        if self.samples is not None:
+            return self._compose(self.samples.positions(idx)[:, 0, :])
+
+        if not self.lazy:
+            # One slice of the store gathers every body; the copy is composed in place
+            i0 = int(idx)
+            xyz = np.array(self.trajectories.frame(i0))
+            frac = idx - i0
+            if frac and i0 + 1 < self.Nframes:
+                xyz += frac * (self.trajectories.frame(i0 + 1) - xyz)
+            return self._compose(xyz)
+
+        ring = self._frame_ring
+        if idx in ring:
+            ring.move_to_end(idx)
+            return ring[idx]
+
+        xyz = self._positions_all(np.array([self.frame_days(idx)]))[:, 0, :]
+        ring[idx] = xyz
+        if len(ring) > self.ring_size:
+            ring.popitem(last=False)
+        return xyz
+
+    def window(self, start, stop, step=1):
+        """
+        Absolute positions of all bodies over a range of frames.
+
+        Args:
+            start: First frame index
+            stop: End frame index (exclusive)
+            step: Frame stride
+
+        Returns:
+            Array of shape (n_bodies, n_frames, 3) in AU, rows in bodies_list order
+        """
+        if self.samples is not None:
+            return self._compose(self.samples.positions(np.arange(start, stop, step)))
+
+        if not self.lazy:
+            return self._compose(np.array(self.trajectories.window(start, stop, step)))
+
+        return self._positions_all(self.frame_days(np.arange(start, stop, step)))
+
+    def positions(self, bodies, times):
+        """
+        Absolute 3D positions of bodies at arbitrary times, solved analytically
+        (or from the attached Chebyshev fit).
+
+        Args:
+            bodies: Body name or list of body names
+            times: Days since the simulation epoch - scalar or array
+
+        Returns:
+            Array of shape (n_bodies, n_times, 3) in AU
+        """
+        if isinstance(bodies, str):
+            bodies = [bodies]
+        times = np.atleast_1d(np.asarray(times, dtype=float))
+
+        row = {name: i for i, name in enumerate(self.bodies_list)}
+        needed = set()
+        for name in bodies:
+            if name not in row:
+                raise KeyError(f"Unknown body: {name}")
+            # The body and every ancestor it is positioned relative to
+            i = row[name]
+            while i >= 0 and i not in needed:
+                needed.add(i)
+                i = self.parent_rows[i]
+
+        # bodies_list order puts parents before their moons
+        rows = np.array(sorted(needed), dtype=int)
+        xyz = self._relative(rows, times)
+        local = {r: j for j, r in enumerate(rows)}
+        for j, r in enumerate(rows):
+            p = self.parent_rows[r]
+            if p >= 0:
+                xyz[j] += xyz[local[p]]
+
+        return xyz[[local[row[name]] for name in bodies]]
+
+    def positions_at(self, bodies, when):
+        """
+        Absolute 3D positions of bodies at calendar instants, solved analytically.
+
+        Nothing is read from precomputed frames, so any instant (inside or
+        outside the animated span) is exact, and millions of timestamps are
+        solved in one batched pass.
+
+        Args:
+            bodies: Body name or list of body names
+            when: datetime, numpy datetime64 (scalar or array), sequence of datetimes,
+                or Julian date(s) as a float or float array
+
+        Returns:
+            Array of shape (n_bodies, 3) for a single instant, else (n_bodies, n_times, 3) in AU
+        """
+        days = days_since_epoch(when, self.epoch_date)
+        xyz = self.positions(bodies, days.ravel())
+        return xyz[:, 0, :] if days.ndim == 0 else xyz
+
+    def stream(self, start=None, end=None, step=None, bodies=None, block_size=DEFAULT_STREAM_BLOCK,
+               relative=False):
+        """
+        Yield positions block by block over a time span.
+
+        Only one block is held at a time, so centuries at hourly resolution
+        can be propagated in bounded memory. Sample times are computed from
+        the step index (not accumulated), so long runs do not drift.
+
+        Args:
+            start: First instant - datetime, datetime64 or Julian date (default: start_date)
+            end: End instant, exclusive (default: end_date)
+            step: Time between samples, timedelta or days (default: days_per_frame)
+            bodies: Body name or list of names (default: every body in bodies_list order)
+            block_size: Time steps per yielded block
+            relative: Yield moons relative to their parent instead of absolute positions
+
+        Yields:
+            (days, xyz): days since epoch_date, shape (n,), and positions of shape
+            (n_bodies, n, 3) in AU, with n <= block_size
+        """
+        for days in self._stream_days(start, end, step, block_size):
+            if relative:
+                yield days, self._relative(self._rows(bodies), days)
+            elif bodies is None:
+                yield days, self._positions_all(days)
+            else:
+                yield days, self.positions(bodies, days)
+
+    def _stream_days(self, start, end, step, block_size):
+        """Sample times of stream(), one array of at most block_size days per block."""
+        first = self.start_day if start is None else float(days_since_epoch(start, self.epoch_date))
+        last = (self.start_day + self.total_sim_days if end is None
+                else float(days_since_epoch(end, self.epoch_date)))
+        if step is None:
+            step = self.days_per_frame
+        elif isinstance(step, timedelta):
+            step = step.total_seconds() / 86400.0
+        if step <= 0:
+            raise ValueError(f"step must be positive, not {step}")
+
+        n_steps = max(0, int(np.ceil((last - first) / step - 1e-9)))
+        for lo in range(0, n_steps, block_size):
+            yield first + np.arange(lo, min(lo + block_size, n_steps)) * step
+
+    def _rows(self, bodies):
+        """bodies_list indices of a body name, list of names, or every body (None)."""
+        if bodies is None:
+            return np.arange(len(self.bodies_list))
+        if isinstance(bodies, str):
+            bodies = [bodies]
+        row = {name: i for i, name in enumerate(self.bodies_list)}
+        missing = [name for name in bodies if name not in row]
+        if missing:
+            raise KeyError(f"Unknown body: {missing[0]}")
+        return np.array([row[name] for name in bodies], dtype=int)
+
+    def _positions_all(self, times):
+        """Absolute positions of every body in bodies_list order, shape (n_bodies, n_times, 3)."""
+        return self._compose(self._relative(np.arange(len(self.bodies_list)), times))
+
+    def _relative(self, rows, times):
+        """Parent-relative positions of rows, from the Chebyshev fit where one covers the times."""
+        if self.chebyshev is None:
+            return propagate_batch(self.elements[rows], times)
+
+        xyz = self.chebyshev.positions(rows, times)
+        outside = ~self.chebyshev.covers(rows, times)
+        if outside.any():
+            # Bodies queried beyond their fitted span are solved exactly there
+            solve = outside.any(axis=1)
+            exact = propagate_batch(self.elements[rows[solve]], times)
+            xyz[solve] = np.where(outside[solve, :, None], exact, xyz[solve])
+        return xyz
+
+    def fit_chebyshev(self, max_error=None, degree=None, progress=None):
+        """
+        Fit piecewise Chebyshev polynomials to every body over the animated
+        span and evaluate them from now on.
+
+        Args:
+            max_error: Largest fit error per body in AU (default: chebyshev.DEFAULT_MAX_ERROR)
+            degree: Chebyshev degree per record (default: chebyshev.DEFAULT_DEGREE)
+            progress: Optional callback(count, total, name) after each body
+
+        Returns:
+            The chebyshev.ChebyshevEphemeris (save() it to reuse the fit)
+        """
+        from chebyshev import DEFAULT_DEGREE, DEFAULT_MAX_ERROR, ChebyshevEphemeris
+
+        self.chebyshev = ChebyshevEphemeris.fit(
+            self, DEFAULT_MAX_ERROR if max_error is None else max_error,
+            DEFAULT_DEGREE if degree is None else degree, progress=progress)
+        self._frame_ring.clear()
+        return self.chebyshev
+
+    def load_chebyshev(self, path):
+        """
+        Evaluate positions from Chebyshev coefficients saved by ChebyshevEphemeris.save().
+
+        The file must have been fitted to this catalog: same bodies, epoch and
+        orbital elements. Its span may differ from the animated one.
+
+        Args:
+            path: .npz file
+
+        Returns:
+            The loaded chebyshev.ChebyshevEphemeris
+
+        Raises:
+            ValueError: If the fit belongs to a different catalog
+        """
+        from chebyshev import ChebyshevEphemeris
+
+        cheb = ChebyshevEphemeris.load(path)
+        if cheb.names != self.bodies_list:
+            raise ValueError(f"{path}: fitted bodies do not match the loaded catalog")
+        if cheb.epoch != self.epoch_date.isoformat():
+            raise ValueError(f"{path}: fitted for epoch {cheb.epoch}, catalog epoch is "
+                             f"{self.epoch_date.isoformat()}")
+        if not np.array_equal(cheb.elements, ChebyshevEphemeris.stack_elements(self.elements)):
+            raise ValueError(f"{path}: orbital elements differ from the loaded catalog")
+        self.chebyshev = cheb
+        self._frame_ring.clear()
+        return cheb
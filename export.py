@@ -0,0 +1,190 @@
+"""
+Headless video and frame-sequence export for the 3D Solar System.
+
+Frames are drawn on an Agg canvas (no display needed) and streamed one at a
+time, either into an ffmpeg pipe (.mp4 and other video containers) or to a
+numbered PNG sequence in a directory, so memory does not grow with the
+length of the run. Disjoint frame ranges can be rendered by separate worker
+processes; video segments are then joined with ffmpeg's concat demuxer.
+
+    python export.py solar_system.mp4 --stride 10 --size 1920x1080 --workers 8
+    python export.py frames/ --start 0 --stop 3000
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+from matplotlib.animation import FFMpegWriter
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from ephemeris import DEFAULT_CATALOG, Ephemeris
+from scene import SolarSystemScene
+from trails import DEFAULT_TRAIL_POLICY, TRAIL_POLICIES
+
+DEFAULT_SIZE = (1920, 1080)
+DEFAULT_DPI = 100
+DEFAULT_FPS = 30
+
+PNG_PATTERN = 'frame_{:06d}.png'
+
+
+def _is_video(output):
+    return os.path.splitext(output)[1] != ''
+
+
+def render_range(catalog_path, output, frames, first_seq=0, size=DEFAULT_SIZE, dpi=DEFAULT_DPI,
+                 fps=DEFAULT_FPS, trail_policy=DEFAULT_TRAIL_POLICY, focus=None,
+                 camera_distance=0.4, lazy=True, cache_dir=None):
+    """
+    Render a sequence of frames to a video file or a PNG directory.
+
+    Args:
+        catalog_path: Path to the celestial bodies JSON catalog
+        output: Video file (e.g. 'out.mp4') or directory for PNG frames
+        frames: Frame indices to render, in order
+        first_seq: Sequence number of the first PNG written (for parallel ranges)
+        size: (width, height) in pixels
+        dpi: Figure resolution
+        fps: Video frame rate
+        trail_policy: Orbit trail policy, one of trails.TRAIL_POLICIES
+        focus: Body to keep centered (None = whole system)
+        camera_distance: View width in AU when following a body
+        lazy: Solve only the rendered frames instead of precomputing all of them
+        cache_dir: Trajectory cache directory (precompute mode only)
+
+    Returns:
+        Number of frames written
+    """
+    eph = Ephemeris(lazy=lazy, cache_dir=cache_dir).load(catalog_path)
+    eph.generate_all()
+
+    width, height = size
+    fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    scene = SolarSystemScene(eph, fig, trail_policy=trail_policy,
+                             ax_position=(0.02, 0.02, 0.96, 0.92), date_position=(0.98, 0.98))
+
+    def draw(idx):
+        _, frame_xyz = scene.update(idx)
+        if focus is not None:
+            scene.follow(frame_xyz[scene.body_index[focus]], camera_distance)
+
+    count = 0
+    if _is_video(output):
+        # ffmpeg reads raw frames from a pipe; nothing is kept in memory
+        writer = FFMpegWriter(fps=fps, codec='libx264', extra_args=['-pix_fmt', 'yuv420p'])
+        with writer.saving(fig, output, dpi):
+            for idx in frames:
+                draw(idx)
+                writer.grab_frame()
+                count += 1
+    else:
+        os.makedirs(output, exist_ok=True)
+        for seq, idx in enumerate(frames, start=first_seq):
+            draw(idx)
+            fig.savefig(os.path.join(output, PNG_PATTERN.format(seq)), dpi=dpi)
+            count += 1
+
+    return count
+
+
+def _concat_videos(segments, output):
+    """Join video segments without re-encoding (ffmpeg concat demuxer)."""
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        for segment in segments:
+            f.write(f"file '{os.path.abspath(segment)}'\n")
+        list_path = f.name
+    try:
+        subprocess.run([matplotlib.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error',
+                        '-f', 'concat', '-safe', '0', '-i', list_path, '-c', 'copy', output],
+                       check=True)
+    finally:
+        os.remove(list_path)
+
+
+def export(output, catalog_path=DEFAULT_CATALOG, start=0, stop=None, stride=1, workers=1,
+           **render_options):
+    """
+    Export a frame range, optionally split across worker processes.
+
+    Args:
+        output: Video file (e.g. 'out.mp4') or directory for PNG frames
+        catalog_path: Path to the celestial bodies JSON catalog
+        start: First frame index
+        stop: End frame index (exclusive, default Nframes)
+        stride: Render every stride-th frame
+        workers: Processes rendering disjoint frame ranges
+        **render_options: Passed to render_range (size, dpi, fps, trail_policy, ...)
+
+    Returns:
+        Number of frames written
+    """
+    if stop is None:
+        stop = Ephemeris().load(catalog_path).Nframes
+    frames = list(range(start, stop, stride))
+    if not frames:
+        return 0
+
+    workers = max(1, min(workers, len(frames)))
+    if workers == 1:
+        return render_range(catalog_path, output, frames, **render_options)
+
+    # Contiguous, disjoint ranges so segments concatenate in order
+    n = len(frames)
+    bounds = [n * k // workers for k in range(workers + 1)]
+    ranges = [(bounds[k], frames[bounds[k]:bounds[k + 1]]) for k in range(workers)]
+
+    if not _is_video(output):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(render_range, catalog_path, output, chunk, first_seq=seq,
+                                   **render_options) for seq, chunk in ranges]
+            return sum(future.result() for future in futures)
+
+    segment_dir = tempfile.mkdtemp(prefix='solar_export_',
+                                   dir=os.path.dirname(os.path.abspath(output)))
+    try:
+        ext = os.path.splitext(output)[1]
+        segments = [os.path.join(segment_dir, f'segment_{k:04d}{ext}') for k in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(render_range, catalog_path, segment, chunk, **render_options)
+                       for segment, (_, chunk) in zip(segments, ranges)]
+            count = sum(future.result() for future in futures)
+        _concat_videos(segments, output)
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+    return count
+
+
+def _parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render the 3D Solar System to video or PNG frames")
+    parser.add_argument('output', help='video file (e.g. out.mp4) or directory for PNG frames')
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG,
+                        help='celestial bodies JSON catalog (default: %(default)s)')
+    parser.add_argument('--start', type=int, default=0, help='first frame index (default: 0)')
+    parser.add_argument('--stop', type=int, default=None, help='end frame index (default: Nframes)')
+    parser.add_argument('--stride', type=int, default=1, help='render every Nth frame (default: 1)')
+    parser.add_argument('--size', type=_parse_size, default=DEFAULT_SIZE, metavar='WxH',
+                        help='output resolution in pixels (default: 1920x1080)')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI, help='figure DPI (default: %(default)s)')
+    parser.add_argument('--fps', type=int, default=DEFAULT_FPS, help='video frame rate (default: %(default)s)')
+    parser.add_argument('--trails', choices=TRAIL_POLICIES, default=DEFAULT_TRAIL_POLICY,
+                        help='orbit trail policy (default: %(default)s)')
+    parser.add_argument('--focus', default=None, help='body to keep centered (e.g. Jupiter)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes rendering disjoint frame ranges (default: 1)')
+    args = parser.parse_args()
+
+    written = export(args.output, catalog_path=args.catalog, start=args.start, stop=args.stop,
+                     stride=args.stride, workers=args.workers, size=args.size, dpi=args.dpi,
+                     fps=args.fps, trail_policy=args.trails, focus=args.focus)
+    print(f"Wrote {written:,} frames to {args.output}")
@@ -0,0 +1,470 @@
+"""
+N-body integration mode: the catalog elements as initial conditions for a
+symplectic integrator, so planets perturb each other and small bodies.
+
+NBodySystem advances every body orbiting the Sun at once with a
+Wisdom-Holman map in democratic heliocentric coordinates: each step is a
+Kepler drift around the Sun (solved exactly with universal variables)
+between drifts of the Sun around the barycenter and kicks from the
+massive bodies. The Kepler part carries almost all of the motion,
+so steps of a day stay accurate over decades where a plain leapfrog would
+need hundreds of steps per Mercury orbit.
+
+Kicks are a vectorized pairwise sum over the massive bodies only: massless
+test particles (comets, asteroid catalogs) feel the planets but not each
+other, so they cost O(N_particles * N_massive) per step.
+
+The Sun's pull on each body is the one implied by its catalog period, so
+with every mass set to zero the integrator reproduces the Kepler ellipses
+of propagate_batch; what remains with masses is the perturbation. Moons
+are not integrated (their periods would force sub-day steps) and stay on
+Kepler orbits around their integrated parent.
+
+    eph = Ephemeris(nbody=True).load()   # generate_all() integrates
+    eph.generate_all()
+
+    system = NBodySystem.from_ephemeris(eph, test_particles=catalog.elements)
+    xyz = system.positions(np.arange(0, 36525, 10.0))   # a century, every 10 days
+
+    python nbody.py --years 30 --random-particles 5000
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+
+from ephemeris import (AU_KM, DEFAULT_CATALOG, Ephemeris, KeplerConvergenceWarning, OrbitalElements,
+                       propagate_batch, solve_kepler_equation_vectorized)
+
+# Gaussian gravitational constant k: sqrt(G * M_sun) in AU^1.5 / day
+GAUSSIAN_GRAVITATIONAL_CONSTANT = 0.01720209895
+
+# G * M_sun in AU^3 / day^2; masses below are in solar masses
+GM_SUN = GAUSSIAN_GRAVITATIONAL_CONSTANT**2
+
+# Default integration step (days): about 90 steps per Mercury orbit
+DEFAULT_STEP_DAYS = 1.0
+
+# Masses in solar masses (planets include their moons, which move with them);
+# bodies not listed, and catalog bodies without a 'mass' key, are test particles
+DEFAULT_MASSES = {
+    'Mercury': 1 / 6023657.33,
+    'Venus': 1 / 408523.719,
+    'Earth': 1 / 328900.559,
+    'Mars': 1 / 3098703.59,
+    'Vesta': 1.30e-10,
+    'Ceres': 4.72e-10,
+    'Jupiter': 1 / 1047.348625,
+    'Saturn': 1 / 3497.9018,
+    'Uranus': 1 / 22902.944,
+    'Neptune': 1 / 19412.237,
+    'Pluto': 7.36e-9,
+    'Haumea': 2.01e-9,
+    'Makemake': 1.56e-9,
+}
+
+# Universal-variable Kepler drift: relative Newton step at which it is solved
+KEPLER_DRIFT_TOLERANCE = 1e-14
+KEPLER_DRIFT_MAX_ITERATIONS = 50
+
+# |psi| below which the Stumpff functions use their series (avoids cancellation)
+STUMPFF_SERIES_LIMIT = 1e-4
+
+# Bodies per pass of the pairwise force sum (bounds the (n, n_massive, 3) temporaries)
+FORCE_CHUNK_BODIES = 65536
+
+
+def stumpff(psi):
+    """
+    Stumpff functions c2 and c3 of psi = alpha * chi^2 (elliptic psi > 0, hyperbolic psi < 0).
+
+    Returns:
+        (c2, c3), arrays shaped like psi
+    """
+    psi = np.asarray(psi, dtype=float)
+    c2 = np.empty_like(psi)
+    c3 = np.empty_like(psi)
+
+    small = np.abs(psi) < STUMPFF_SERIES_LIMIT
+    ell = (psi > 0) & ~small
+    hyp = (psi < 0) & ~small
+
+    p = psi[small]
+    c2[small] = 0.5 - p / 24 + p * p / 720
+    c3[small] = 1 / 6 - p / 120 + p * p / 5040
+
+    s = np.sqrt(psi[ell])
+    c2[ell] = (1 - np.cos(s)) / psi[ell]
+    c3[ell] = (s - np.sin(s)) / s**3
+
+    s = np.sqrt(-psi[hyp])
+    c2[hyp] = (1 - np.cosh(s)) / psi[hyp]
+    c3[hyp] = (np.sinh(s) - s) / s**3
+    return c2, c3
+
+
+def kepler_drift(r, v, mu, dt):
+    """
+    Advance two-body states along their Kepler orbits (elliptic or hyperbolic).
+
+    Universal-variable form: Kepler's equation is solved for chi by
+    vectorized Newton iteration, then the state is mapped with the
+    Lagrange f and g coefficients. Any time step works, backwards included.
+
+    Args:
+        r: Positions relative to the central body, shape (..., 3) in AU
+        v: Velocities, shape (..., 3) in AU/day
+        mu: Gravitational parameters (AU^3/day^2), broadcastable to r[..., 0]
+        dt: Time steps (days), broadcastable to r[..., 0]
+
+    Returns:
+        (r, v) after dt, broadcast shape (..., 3)
+    """
+    r, v = np.broadcast_arrays(r, v)
+    shape = np.broadcast_shapes(r.shape[:-1], np.shape(mu), np.shape(dt))
+    r = np.broadcast_to(r, shape + (3,))
+    v = np.broadcast_to(v, shape + (3,))
+    mu = np.broadcast_to(mu, shape)
+    dt = np.broadcast_to(dt, shape)
+
+    r0 = np.linalg.norm(r, axis=-1)
+    rv = np.einsum('...k,...k->...', r, v)
+    sqrt_mu = np.sqrt(mu)
+    alpha = 2 / r0 - np.einsum('...k,...k->...', v, v) / mu  # 1 / semi-major axis
+    sigma0 = rv / sqrt_mu
+
+    # Starting guess: mean motion for bound orbits, logarithmic for hyperbolic ones
+    chi = sqrt_mu * alpha * dt
+    hyperbolic = alpha < 0
+    if hyperbolic.any():
+        with np.errstate(invalid='ignore', divide='ignore'):
+            a = 1 / alpha
+            sign = np.sign(dt)
+            guess = sign * np.sqrt(-a) * np.log(
+                -2 * mu * alpha * dt / (rv + sign * np.sqrt(-mu * a) * (1 - r0 * alpha)))
+        chi = np.where(hyperbolic & np.isfinite(guess), guess, chi)
+
+    for _ in range(KEPLER_DRIFT_MAX_ITERATIONS):
+        psi = chi * chi * alpha
+        c2, c3 = stumpff(psi)
+        chi2 = chi * chi
+        r_new = chi2 * c2 + sigma0 * chi * (1 - psi * c3) + r0 * (1 - psi * c2)
+        delta = (sqrt_mu * dt - chi2 * chi * c3 - sigma0 * chi2 * c2 - r0 * chi * (1 - psi * c3)) / r_new
+        chi = chi + delta
+        if np.all(np.abs(delta) <= KEPLER_DRIFT_TOLERANCE * np.maximum(1, np.abs(chi))):
+            break
+    else:
+        warnings.warn(f"Kepler drift did not converge in {KEPLER_DRIFT_MAX_ITERATIONS} iterations "
+                      f"(largest last step {np.abs(delta).max():.3g})",
+                      KeplerConvergenceWarning, stacklevel=2)
+
+    psi = chi * chi * alpha
+    c2, c3 = stumpff(psi)
+    chi2 = chi * chi
+    f = 1 - chi2 / r0 * c2
+    g = dt - chi2 * chi / sqrt_mu * c3
+    r_new = f[..., None] * r + g[..., None] * v
+    rn = np.linalg.norm(r_new, axis=-1)
+    f_dot = sqrt_mu / (rn * r0) * chi * (psi * c3 - 1)
+    g_dot = 1 - chi2 / rn * c2
+    v_new = f_dot[..., None] * r + g_dot[..., None] * v
+    return r_new, v_new
+
+
+def state_vectors(elements):
+    """
+    Positions and velocities at the element epoch from orbital elements.
+
+    Velocities follow from each body's own period (mean motion), so the
+    state is on exactly the ellipse propagate_batch draws.
+
+    Args:
+        elements: OrbitalElements of bodies with period > 0
+
+    Returns:
+        (r, v, mu): positions (n, 3) in AU, velocities (n, 3) in AU/day and
+        the gravitational parameter n^2 a^3 of each orbit (AU^3/day^2)
+    """
+    n = 2 * np.pi / elements.period
+    a, e = elements.a, elements.e
+    E = solve_kepler_equation_vectorized(np.radians(elements.M0) % (2 * np.pi), e, 1e-15)
+    cos_E, sin_E = np.cos(E), np.sin(E)
+    root = np.sqrt(1 - e**2)
+    rate = n / (1 - e * cos_E)  # dE/dt
+
+    R = elements.rotation_matrices()
+    P, Q = R[:, :, 0], R[:, :, 1]
+    r = (a * (cos_E - e))[:, None] * P + (a * root * sin_E)[:, None] * Q
+    v = (-a * sin_E * rate)[:, None] * P + (a * root * cos_E * rate)[:, None] * Q
+    return r, v, n**2 * a**3
+
+
+class NBodySystem:
+    """
+    Bodies orbiting the Sun, integrated together in democratic heliocentric coordinates.
+
+    Massive bodies come first in the state arrays; positions() returns rows
+    in the order the bodies were given.
+
+    Attributes:
+        names: Body names in input order
+        masses: Masses in solar masses, input order (0 = test particle)
+        day: Days since epoch of the stored state
+        step: Integration step (days)
+        Q: Heliocentric positions (n, 3) in AU, massive bodies first
+        U: Barycentric velocities (n, 3) in AU/day, massive bodies first
+        mu: Sun's gravitational parameter per body (AU^3/day^2), massive bodies first
+        n_massive: Number of massive bodies
+        ephemeris_rows: bodies_list rows of the catalog bodies (from_ephemeris only)
+    """
+
+    def __init__(self, names, elements, masses, day=0.0, step=DEFAULT_STEP_DAYS):
+        """
+        Args:
+            names: Body names, one per element row
+            elements: OrbitalElements (heliocentric, period > 0) at the epoch
+            masses: Masses in solar masses (0 = test particle)
+            day: Days since epoch the elements refer to
+            step: Integration step (days)
+        """
+        masses = np.asarray(masses, dtype=float)
+        if np.any(elements.period <= 0):
+            raise ValueError("NBodySystem integrates bodies orbiting the Sun; periods must be positive")
+        if step <= 0:
+            raise ValueError(f"step must be positive, not {step}")
+        self.names = list(names)
+        self.masses = masses
+        self.day = float(day)
+        self.step = float(step)
+        self.ephemeris_rows = None
+
+        # Massive bodies first, so kicks only ever sum over a leading slice
+        self._order = np.argsort(masses == 0, kind='stable')
+        self._rows = np.argsort(self._order)  # Input row -> state row
+        self.n_massive = int(np.count_nonzero(masses))
+
+        r, v, mu = state_vectors(elements[self._order])
+        self.mu = mu
+        self._gm = GM_SUN * masses[self._order][:self.n_massive]
+
+        # Barycentric velocities: the Sun moves opposite to the massive bodies' momentum
+        m = masses[self._order][:self.n_massive]
+        sun_velocity = -(m @ v[:self.n_massive]) / (1 + m.sum())
+        self.Q = r
+        self.U = v + sun_velocity
+
+    @classmethod
+    def from_ephemeris(cls, eph, masses=None, test_particles=None, test_names=None,
+                       step=DEFAULT_STEP_DAYS):
+        """
+        System of every catalog body orbiting the Sun, plus optional test particles.
+
+        Args:
+            eph: Loaded Ephemeris
+            masses: Dict of body name -> solar masses (default: the catalog's
+                'mass' keys, then DEFAULT_MASSES)
+            test_particles: Optional OrbitalElements of massless heliocentric bodies
+                referred to the same epoch (e.g. small_bodies catalog.elements)
+            test_names: Names of the test particles (default: 'particle_<i>')
+            step: Integration step (days)
+
+        Returns:
+            NBodySystem; eph rows it covers are in system.ephemeris_rows
+        """
+        rows = np.array([i for i, name in enumerate(eph.bodies_list)
+                         if eph.parents[name] is None and eph.elements.a[i] > 0
+                         and eph.elements.period[i] > 0], dtype=int)
+        names = [eph.bodies_list[i] for i in rows]
+        if masses is None:
+            mass = [eph.body_props[name].get('mass', DEFAULT_MASSES.get(name, 0.0)) for name in names]
+        else:
+            mass = [masses.get(name, 0.0) for name in names]
+
+        elements = eph.elements[rows]
+        if test_particles is not None:
+            elements = _concatenate(elements, test_particles)
+            if test_names is None:
+                test_names = [f'particle_{i}' for i in range(len(test_particles))]
+            names += list(test_names)
+            mass += [0.0] * len(test_particles)
+
+        system = cls(names, elements, mass, step=step)
+        system.ephemeris_rows = rows
+        return system
+
+    def __len__(self):
+        return len(self.names)
+
+    def _accelerations(self, Q):
+        """Accelerations (n, 3) from the massive bodies (the Sun's pull is in the Kepler drift)."""
+        acc = np.empty_like(Q)
+        massive = Q[:self.n_massive]
+        mx, my, mz = np.ascontiguousarray(massive.T)
+        for start in range(0, len(Q), FORCE_CHUNK_BODIES):
+            chunk = Q[start:start + FORCE_CHUNK_BODIES]
+            x, y, z = np.ascontiguousarray(chunk.T)
+            # VECTORIZED: squared separations of every body in the chunk from every massive body
+            r2 = np.square(mx - x[:, None])
+            r2 += np.square(my - y[:, None])
+            r2 += np.square(mz - z[:, None])
+            # A massive body does not pull on itself
+            own = np.arange(start, min(start + FORCE_CHUNK_BODIES, self.n_massive))
+            r2[own - start, own] = np.inf
+            w = self._gm / (r2 * np.sqrt(r2))
+            # sum_j w_ij (Q_j - Q_i) as one matrix product
+            acc[start:start + FORCE_CHUNK_BODIES] = w @ massive - w.sum(axis=1)[:, None] * chunk
+        return acc
+
+    def _sun_drift(self, Q, U, dt):
+        """Shift heliocentric positions by the Sun's barycentric motion over dt."""
+        return Q + dt * (self._gm @ U[:self.n_massive] / GM_SUN)
+
+    def _step(self, Q, U, acc, h):
+        """
+        One Wisdom-Holman step: kick, Sun drift, Kepler drift, Sun drift, kick.
+
+        acc is the acceleration at Q; the one returned is reused as the next
+        step's first kick, so each step evaluates the forces once.
+        """
+        U = U + h / 2 * acc
+        Q = self._sun_drift(Q, U, h / 2)
+        Q, U = kepler_drift(Q, U, self.mu, h)
+        Q = self._sun_drift(Q, U, h / 2)
+        acc = self._accelerations(Q)
+        return Q, U + h / 2 * acc, acc
+
+    def _sample(self, Q, U, dt):
+        """Positions (n, len(dt), 3) at offsets dt (within one step) from the state Q, U."""
+        r, _ = kepler_drift(Q[:, None, :], U[:, None, :], self.mu[:, None], dt[None, :])
+        momentum = self._gm @ U[:self.n_massive] / GM_SUN
+        return r + dt[None, :, None] * momentum
+
+    def positions(self, days, progress=None):
+        """
+        Heliocentric positions at any times, integrating outwards from the stored state.
+
+        Times before day are reached by integrating backwards (the map is
+        time-reversible). Between steps, positions follow the Kepler drift
+        from the last step, which omits perturbations over less than a step.
+
+        Args:
+            days: Days since epoch, scalar or array of n_times (any order)
+            progress: Optional callback(steps_done, steps_total)
+
+        Returns:
+            Array of shape (n_bodies, n_times, 3) in AU, rows in input order
+        """
+        days = np.atleast_1d(np.asarray(days, dtype=float))
+        out = np.empty((len(self), len(days), 3))
+
+        offsets = days - self.day
+        total = int(np.ceil(np.abs(offsets).max() / self.step)) if len(days) else 0
+        done = 0
+        for sign in (1.0, -1.0):
+            # Samples on this side of the start, as increasing distances from it
+            index = np.flatnonzero(offsets >= 0 if sign > 0 else offsets < 0)
+            if not len(index):
+                continue
+            distance = sign * offsets[index]
+            index = index[np.argsort(distance, kind='stable')]
+            distance = sign * offsets[index]
+
+            Q, U, acc = self.Q, self.U, self._accelerations(self.Q)
+            h = sign * self.step
+            k = 0
+            for i in range(int(distance[-1] // self.step) + 1):
+                # Samples within this step, measured from its start (i * step, not accumulated)
+                j = np.searchsorted(distance, (i + 1) * self.step, side='left')
+                if j > k:
+                    out[self._order[:, None], index[None, k:j]] = self._sample(
+                        Q, U, sign * (distance[k:j] - i * self.step))
+                    k = j
+                if k == len(index):
+                    break
+                Q, U, acc = self._step(Q, U, acc, h)
+                done += 1
+                if progress is not None:
+                    progress(done, total)
+        return out
+
+
+def _concatenate(first, second):
+    """Two OrbitalElements as one (tolerances are dropped: the integrator does not use them)."""
+    return OrbitalElements(*(np.concatenate([getattr(first, k), getattr(second, k)])
+                             for k in ('a', 'e', 'inc', 'Omega', 'omega', 'M0', 'period')))
+
+
+def integrate_ephemeris(eph, days, step=DEFAULT_STEP_DAYS, masses=None):
+    """
+    Parent-relative positions of every catalog body, with primaries integrated.
+
+    Args:
+        eph: Loaded Ephemeris
+        days: Days since epoch, array of n_times
+        step: Integration step (days)
+        masses: Optional dict of body name -> solar masses (see NBodySystem.from_ephemeris)
+
+    Returns:
+        Array of shape (n_bodies, n_times, 3) in AU, rows in bodies_list order;
+        moons are relative to their parent and follow Kepler orbits, the Sun stays at the origin
+    """
+    system = NBodySystem.from_ephemeris(eph, masses=masses, step=step)
+    xyz = np.empty((len(eph.bodies_list), len(days), 3))
+    kepler = np.setdiff1d(np.arange(len(eph.bodies_list)), system.ephemeris_rows)
+    xyz[kepler] = propagate_batch(eph.elements[kepler], days)
+    xyz[system.ephemeris_rows] = system.positions(days)
+    return xyz
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Integrate the catalog (and test particles) with "
+                                                 "planetary perturbations and compare with Kepler orbits")
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG,
+                        help='celestial bodies JSON catalog (default: %(default)s)')
+    parser.add_argument('--years', type=float, default=30.0,
+                        help='span integrated from the epoch (default: %(default)s)')
+    parser.add_argument('--step', type=float, default=DEFAULT_STEP_DAYS,
+                        help='integration step in days (default: %(default)s)')
+    parser.add_argument('--sample-days', type=float, default=10.0,
+                        help='output spacing in days (default: %(default)s)')
+    parser.add_argument('--small-bodies', default=None, metavar='FILE',
+                        help='MPCORB (.dat) or CSV orbit catalog integrated as test particles')
+    parser.add_argument('--random-particles', type=int, default=0, metavar='N',
+                        help='add N random main-belt test particles (default: %(default)s)')
+    args = parser.parse_args()
+
+    eph = Ephemeris(lazy=True).load(args.catalog)
+    particles, particle_names = None, None
+    if args.small_bodies is not None:
+        from small_bodies import load_csv, load_mpcorb
+        loader = load_csv if args.small_bodies.lower().endswith('.csv') else load_mpcorb
+        catalog = loader(args.small_bodies, epoch_date=eph.epoch_date)
+        particles, particle_names = catalog.elements, list(catalog.names)
+    if args.random_particles:
+        rng = np.random.default_rng(0)
+        count = args.random_particles
+        a = rng.uniform(2.1, 3.3, count)
+        belt = OrbitalElements(a=a, e=rng.uniform(0, 0.3, count), inc=rng.uniform(0, 20, count),
+                               Omega=rng.uniform(0, 360, count), omega=rng.uniform(0, 360, count),
+                               M0=rng.uniform(0, 360, count),
+                               period=2 * np.pi / GAUSSIAN_GRAVITATIONAL_CONSTANT * a**1.5)
+        names = [f'belt_{i}' for i in range(count)]
+        particles = belt if particles is None else _concatenate(particles, belt)
+        particle_names = names if particle_names is None else particle_names + names
+
+    system = NBodySystem.from_ephemeris(eph, test_particles=particles, test_names=particle_names,
+                                        step=args.step)
+    days = np.arange(0.0, args.years * 365.25 + args.sample_days / 2, args.sample_days)
+    print(f"Integrating {len(system)} bodies ({system.n_massive} massive) for {args.years:g} years "
+          f"in {args.step:g}-day steps...")
+    t0 = time.perf_counter()
+    xyz = system.positions(days)
+    seconds = time.perf_counter() - t0
+    print(f"Done in {seconds:.1f} s ({len(days) and int(np.ceil(days[-1] / args.step)):,} steps)\n")
+
+    kepler = propagate_batch(eph.elements[system.ephemeris_rows], days)
+    drift = np.linalg.norm(xyz[:len(system.ephemeris_rows)] - kepler, axis=-1)
+    print("Largest departure from the Kepler orbit (perturbations):")
+    for name, row in zip(system.names, drift):
+        print(f"  {name:<12} {row.max() * AU_KM:14,.0f} km   ({row.max():.2e} AU)")
@@ -0,0 +1,133 @@
+"""
+Multi-core trajectory generation with a process pool and shared memory.
+
+Each slice of the (n_bodies, n_times, 3) output is computed into its own
+shared-memory block, which the worker maps and writes into directly, so only
+small task descriptions cross process boundaries. At most one block per
+worker exists at a time, and each is copied into the output array and
+unlinked as soon as its slice finishes, so peak memory stays close to the
+output itself. Work is split along the time axis (each worker handles
+every body for a range of times, so moons are composed with their parent
+inside the worker) or along the body axis (for catalogs without moons).
+
+Each output element is computed by exactly the same elementwise NumPy code as
+the serial path, so results match propagate_batch regardless of worker count.
+"""
+import os
+import numpy as np
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+from ephemeris import propagate_batch
+
+# Slices handed out per worker (more slices balance uneven Kepler workloads)
+SLICES_PER_WORKER = 4
+
+# Smallest slice worth a task (times for a time split, bodies for a body split)
+MIN_SLICE = 1024
+
+
+def default_workers():
+    """Number of CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _slices(n, workers):
+    """Split range(n) into contiguous slices for the pool."""
+    n_slices = max(1, min(workers * SLICES_PER_WORKER, n // MIN_SLICE))
+    bounds = np.linspace(0, n, n_slices + 1).astype(int)
+    return [(lo, hi) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+
+def _propagate_slice(shm_name, shape, elements, days_elapsed, levels):
+    """Worker: propagate one slice straight into its shared block."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        propagate_batch(elements, days_elapsed, out=block)
+
+        # A time slice holds every body, so moons can be made absolute here
+        for rows, parent_rows in levels:
+            block[rows] += block[parent_rows]
+        del block  # Drop the view before closing the mapping
+    finally:
+        shm.close()
+
+
+def propagate_parallel(elements, days_elapsed, levels=(), workers=None, split='time', out=None):
+    """
+    Positions of many bodies computed across a process pool.
+
+    Args:
+        elements: OrbitalElements for n_bodies
+        days_elapsed: Days since the simulation epoch (array of n_times)
+        levels: Parent tree as (rows, parent_rows) pairs per depth, as built by
+            Ephemeris; moons are added to their parent's position level by level
+        workers: Number of worker processes (default: all available CPUs)
+        split: 'time' to split the time axis, 'bodies' to split the body set
+        out: Optional preallocated (n_bodies, n_times, 3) array to fill (any
+            float dtype; slices are cast as they are copied in)
+
+    Returns:
+        Array of shape (n_bodies, n_times, 3) in AU (out, if given)
+    """
+    if split not in ('time', 'bodies'):
+        raise ValueError(f"split must be 'time' or 'bodies', not {split!r}")
+
+    workers = workers or default_workers()
+    days_elapsed = np.atleast_1d(np.asarray(days_elapsed, dtype=float))
+    shape = (len(elements), len(days_elapsed), 3)
+    if out is None:
+        out = np.empty(shape)
+    elif out.shape != shape:
+        raise ValueError(f"out has shape {out.shape}, expected {shape}")
+
+    # Each task carries only its own slice of the inputs and where it lands in out
+    if split == 'time':
+        tasks = [(elements, days_elapsed[lo:hi], levels, (slice(None), slice(lo, hi)))
+                 for lo, hi in _slices(shape[1], workers)]
+    else:
+        tasks = [(elements[lo:hi], days_elapsed, (), slice(lo, hi))
+                 for lo, hi in _slices(shape[0], workers)]
+    tasks.reverse()  # Popped from the end, so slices run in order
+
+    # Only the slices in flight have a shared block; each is copied into out and
+    # unlinked as soon as it finishes, so the whole result never exists twice
+    pending = {}
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            def submit():
+                el, days, lv, index = tasks.pop()
+                block_shape = (len(el), len(days), 3)
+                shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(block_shape)) * 8))
+                future = pool.submit(_propagate_slice, shm.name, block_shape, el, days, lv)
+                pending[future] = (shm, block_shape, index)
+
+            while tasks and len(pending) < workers:
+                submit()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    shm, block_shape, index = pending.pop(future)
+                    try:
+                        future.result()  # Re-raise worker errors
+                        block = np.ndarray(block_shape, dtype=np.float64, buffer=shm.buf)
+                        out[index] = block
+                        del block
+                    finally:
+                        shm.close()
+                        shm.unlink()
+                    if tasks:
+                        submit()
+    finally:
+        for shm, _, _ in pending.values():
+            shm.close()
+            shm.unlink()
+
+    if split == 'bodies':
+        for rows, parent_rows in levels:
+            out[rows] += out[parent_rows]
+    return out
@@ -0,0 +1,178 @@
+"""
+Per-frame timing instrumentation for the animation loop.
+
+FrameProfiler records how long each named section of a frame takes
+(position lookup, trails, markers, labels, camera follow, compass, canvas
+draw), keeps rolling statistics for an on-screen FPS / frame-time overlay,
+and can dump every recorded event as a Chrome trace (open it in
+chrome://tracing or https://ui.perfetto.dev).
+
+Instrumented code always talks to a profiler; when profiling is off it is
+NULL_PROFILER, whose methods do nothing and whose section() hands back one
+shared no-op context manager, so the disabled cost is a method call.
+"""
+import contextlib
+import json
+import os
+import time
+from collections import deque
+
+# Sections in display order (anything else recorded is listed after these)
+SECTIONS = ('positions', 'trails', 'markers', 'labels', 'follow', 'compass', 'draw')
+
+# Frames averaged by the overlay's rolling statistics
+DEFAULT_WINDOW = 60
+
+# Trace events kept for dump() (oldest dropped first), about 10 MB of tuples
+DEFAULT_MAX_EVENTS = 100_000
+
+
+class FrameProfiler:
+    """
+    Records section timings per frame.
+
+    Attributes:
+        frames: Rolling window of (start, duration, {section: seconds}) per frame
+        events: (name, start, duration) of every section and frame, for the trace
+        frame_count: Frames completed since creation
+    """
+
+    enabled = True
+
+    def __init__(self, window=DEFAULT_WINDOW, max_events=DEFAULT_MAX_EVENTS):
+        """
+        Args:
+            window: Frames in the rolling statistics
+            max_events: Trace events kept (oldest dropped first)
+        """
+        self._t0 = time.perf_counter()
+        self.frames = deque(maxlen=window)
+        self.events = deque(maxlen=max_events)
+        self.frame_count = 0
+        self._frame_start = None
+        self._sections = {}
+        self._open = {}
+
+    def _record(self, name, start, stop):
+        duration = stop - start
+        self._sections[name] = self._sections.get(name, 0.0) + duration
+        self.events.append((name, start, duration))
+
+    @contextlib.contextmanager
+    def section(self, name):
+        """Time the enclosed block as section name of the current frame."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, start, time.perf_counter())
+
+    def begin(self, name):
+        """Start section name; it is recorded by a later end(name) (e.g. from an event handler)."""
+        self._open[name] = time.perf_counter()
+
+    def end(self, name):
+        """
+        Finish a section started with begin().
+
+        Returns:
+            True if the section was open
+        """
+        start = self._open.pop(name, None)
+        if start is None:
+            return False
+        self._record(name, start, time.perf_counter())
+        return True
+
+    def begin_frame(self):
+        """Start a frame (finishing the previous one if it is still open)."""
+        if self._frame_start is not None:
+            self.end_frame()
+        self._frame_start = time.perf_counter()
+        self._sections = {}
+
+    def end_frame(self):
+        """Finish the current frame and add it to the rolling statistics."""
+        if self._frame_start is None:
+            return
+        start, stop = self._frame_start, time.perf_counter()
+        self.frames.append((start, stop - start, self._sections))
+        self.events.append(('frame', start, stop - start))
+        self.frame_count += 1
+        self._frame_start = None
+
+    def fps(self):
+        """Frames per second over the rolling window (frame starts, so idle time counts)."""
+        if len(self.frames) < 2:
+            return 0.0
+        elapsed = self.frames[-1][0] - self.frames[0][0]
+        return (len(self.frames) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def mean_ms(self, name=None):
+        """
+        Mean time per frame over the rolling window, in ms.
+
+        Args:
+            name: Section name (None = whole frame)
+        """
+        if not self.frames:
+            return 0.0
+        if name is None:
+            total = sum(duration for _, duration, _ in self.frames)
+        else:
+            total = sum(sections.get(name, 0.0) for _, _, sections in self.frames)
+        return total / len(self.frames) * 1e3
+
+    def section_names(self):
+        """Sections seen in the rolling window, in SECTIONS order then by name."""
+        seen = set()
+        for _, _, sections in self.frames:
+            seen.update(sections)
+        return [name for name in SECTIONS if name in seen] + sorted(seen.difference(SECTIONS))
+
+    def summary(self):
+        """Overlay text: rolling FPS, frame time and per-section means."""
+        lines = [f"{self.fps():5.1f} FPS  {self.mean_ms():6.1f} ms/frame"]
+        lines += [f"{name:>9} {self.mean_ms(name):6.2f} ms" for name in self.section_names()]
+        return '\n'.join(lines)
+
+    def chrome_trace(self):
+        """Recorded events in Chrome trace event format (complete 'X' events, microseconds)."""
+        pid = os.getpid()
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+                   'args': {'name': 'SolarSystem'}}]
+        for name, start, duration in self.events:
+            events.append({'name': name, 'cat': 'frame' if name == 'frame' else 'section',
+                           'ph': 'X', 'pid': pid, 'tid': 0,
+                           'ts': (start - self._t0) * 1e6, 'dur': duration * 1e6})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path):
+        """Write the Chrome trace to path."""
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+class NullProfiler:
+    """Stand-in used when profiling is off: every method is a no-op."""
+
+    enabled = False
+    _null_section = contextlib.nullcontext()
+
+    def section(self, name):
+        return self._null_section
+
+    def begin(self, name):
+        pass
+
+    def end(self, name):
+        return False
+
+    def begin_frame(self):
+        pass
+
+    def end_frame(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,318 @@
+"""
+Matplotlib scene for the 3D Solar System: styled 3D axes, date counter and
+per-body trail, marker and label artists.
+
+The scene only needs a Figure, so the interactive window (SolarSystem.py)
+and headless export (export.py, Agg canvas) draw frames the same way. All
+markers are one scatter collection and all trails one line collection, so
+moving every body to a new frame is a couple of array assignments however
+many bodies the catalog holds; only labels are per-body artists.
+BlitManager lets the window redraw only the moving artists on top of a
+cached background while the camera is still.
+"""
+import numpy as np
+from datetime import timedelta
+from matplotlib.lines import Line2D
+from mpl_toolkits.mplot3d import Axes3D  # noqa: F401 (registers the '3d' projection)
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+from profiling import NULL_PROFILER
+from trails import DEFAULT_TRAIL_POLICY, TrailRenderer
+
+BACKGROUND_COLOR = '#001219'
+
+# Follow mode re-centers only when the focus drifts more than this fraction of
+# the view width (about half a pixel in the default window), so a slowly moving
+# focus does not force a full redraw every frame
+FOLLOW_TOLERANCE = 5e-4
+
+
+class SolarSystemScene:
+    """
+    3D axes and artists for every body of an Ephemeris.
+
+    Attributes:
+        fig, ax: Figure and its 3D axes
+        date_text: Date counter text artist
+        profile_text: Frame-time overlay under the date counter (None unless profiling)
+        trail_lines: Line3DCollection with one orbit trail per body
+        markers: Path3DCollection (scatter) with one marker per body
+        body_labels: Text artists, one per body, in Ephemeris.frame() row order
+        body_index: Body name -> row in Ephemeris.frame() output
+    """
+
+    def __init__(self, eph, fig, trail_policy=DEFAULT_TRAIL_POLICY,
+                 ax_position=(0.05, 0.1, 0.68, 0.85), date_position=(0.72, 0.96),
+                 profiler=NULL_PROFILER):
+        """
+        Args:
+            eph: Loaded (and, in precompute mode, generated) Ephemeris
+            fig: Matplotlib Figure to draw into
+            trail_policy: Orbit trail policy, one of trails.TRAIL_POLICIES
+            ax_position: [left, bottom, width, height] of the 3D axes in figure coordinates
+            date_position: (x, y) of the top-right corner of the date counter
+            profiler: profiling.FrameProfiler to time update() sections and show
+                the frame-time overlay (default: NULL_PROFILER, no overhead)
+        """
+        self.eph = eph
+        self.fig = fig
+        self.start_date = eph.start_date
+        self.body_index = {name: i for i, name in enumerate(eph.bodies_list)}
+        self.profiler = profiler
+
+        rad = eph.rad
+        fig.patch.set_facecolor(BACKGROUND_COLOR)
+        ax = fig.add_subplot(111, projection='3d', facecolor=BACKGROUND_COLOR, position=list(ax_position))
+        self.ax = ax
+
+        # Set axis limits and styling
+        ax.set_xlim(-rad, rad)
+        ax.set_ylim(-rad, rad)
+        ax.set_zlim(-rad/2, rad/2)
+        ax.set_xlabel('X (AU)', color='white', fontsize=12)
+        ax.set_ylabel('Y (AU)', color='white', fontsize=12)
+        ax.set_zlabel('Z (AU)', color='white', fontsize=12)
+        ax.set_title('3D Solar System - Keplerian Orbital Mechanics', color='white', fontsize=16, pad=20)
+
+        # Add date counter display (top right of figure)
+        self.date_text = fig.text(date_position[0], date_position[1], '', ha='right', va='top',
+                                  color='cyan', fontsize=11, weight='bold',
+                                  bbox=dict(boxstyle='round', facecolor=BACKGROUND_COLOR,
+                                            edgecolor='cyan', alpha=0.8, pad=8))
+
+        # Rolling FPS / frame-time overlay below the date counter
+        self.profile_text = None
+        if profiler.enabled:
+            self.profile_text = fig.text(date_position[0], date_position[1] - 0.07, '',
+                                         ha='right', va='top', color='#ffd166', fontsize=8,
+                                         family='monospace')
+
+        # Style the grid and background
+        ax.xaxis.pane.fill = False
+        ax.yaxis.pane.fill = False
+        ax.zaxis.pane.fill = False
+        ax.xaxis.pane.set_edgecolor('#1a3a4a')
+        ax.yaxis.pane.set_edgecolor('#1a3a4a')
+        ax.zaxis.pane.set_edgecolor('#1a3a4a')
+        ax.grid(True, alpha=0.2, color='#4a6a7a')
+        ax.tick_params(colors='white')
+
+        # Set initial viewing angle
+        ax.view_init(elev=20, azim=45)
+
+        # Orbit trails stay bounded in length whatever the frame index
+        self.trail_renderer = TrailRenderer(eph, policy=trail_policy)
+
+        # Per-body styling, in frame() row order
+        info = [eph.metadata[name] for name in eph.bodies_list]
+        is_major = np.array([body.body_type in ['planet', 'star', 'dwarf_planet'] for body in info])
+        colors = [body.color for body in info]
+        n_bodies = len(info)
+
+        # Orbit trails: one collection, one polyline per body
+        self.trail_lines = Line3DCollection([], colors=colors, alpha=0.4,
+                                            linewidths=np.where(is_major, 1.5, 0.8))
+        ax.add_collection3d(self.trail_lines, autolim=False)
+
+        # Body markers: one scatter, sizes in points^2 (marker_size * 2 points across)
+        self._marker_sizes = (2 * np.array([body.marker_size for body in info], dtype=float)) ** 2
+        self.markers = ax.scatter(np.zeros(n_bodies), np.zeros(n_bodies), np.zeros(n_bodies),
+                                  s=self._marker_sizes, c=colors, marker='o', edgecolors='white',
+                                  linewidths=0.5, depthshade=False)
+
+        # Labels stay individual artists; update() only touches visible ones
+        self.body_labels = [ax.text(0, 0, 0, body.name,
+                                    color='white',
+                                    fontsize=10 if major else 7,
+                                    fontweight='bold' if major else 'normal')
+                            for body, major in zip(info, is_major)]
+        self._label_visible = np.ones(n_bodies, dtype=bool)
+        self._frame_xyz = None  # Last frame drawn, for re-culling labels when the view moves
+        self._show_labels = True
+
+        # Add legend (smaller to fit with sidebar); trails are one collection,
+        # so the entries are proxy lines
+        handles = [Line2D([], [], color=body.color, linewidth=1.5 if major else 0.8,
+                          alpha=0.4, label=body.name)
+                   for body, major in zip(info, is_major)]
+        ax.legend(handles=handles, loc='upper left', fontsize=6, framealpha=0.2,
+                  facecolor=BACKGROUND_COLOR, edgecolor='white', labelcolor='white',
+                  ncol=2)
+
+    def reset_limits(self):
+        """Show the whole system (+/- rad AU)."""
+        rad = self.eph.rad
+        self.ax.set_xlim(-rad, rad)
+        self.ax.set_ylim(-rad, rad)
+        self.ax.set_zlim(-rad/2, rad/2)
+        self._update_labels()
+
+    def animated_artists(self):
+        """Artists that change every frame (everything update() touches)."""
+        artists = [self.date_text, self.trail_lines, self.markers] + self.body_labels
+        if self.profile_text is not None:
+            artists.append(self.profile_text)
+        return artists
+
+    def follow(self, focus_xyz, cam_dist, tolerance=0.0):
+        """
+        Center the view on a point.
+
+        Args:
+            focus_xyz: (x, y, z) to look at, in AU
+            cam_dist: Width of the view in AU
+            tolerance: Leave the limits alone if the view already has this width
+                and is centered within tolerance * cam_dist of the point
+
+        Returns:
+            True if the axis limits were changed
+        """
+        focus_x, focus_y, focus_z = focus_xyz
+        if tolerance > 0:
+            x0, x1 = self.ax.get_xlim()
+            y0, y1 = self.ax.get_ylim()
+            z0, z1 = self.ax.get_zlim()
+            if (np.isclose(x1 - x0, cam_dist, rtol=1e-6, atol=0) and
+                    np.isclose(z1 - z0, cam_dist/2, rtol=1e-6, atol=0) and
+                    max(abs((x0 + x1)/2 - focus_x), abs((y0 + y1)/2 - focus_y),
+                        abs((z0 + z1)/2 - focus_z)) <= tolerance * cam_dist):
+                return False
+        self.ax.set_xlim(focus_x - cam_dist/2, focus_x + cam_dist/2)
+        self.ax.set_ylim(focus_y - cam_dist/2, focus_y + cam_dist/2)
+        self.ax.set_zlim(focus_z - cam_dist/4, focus_z + cam_dist/4)
+        self._update_labels()
+        return True
+
+    def _update_labels(self):
+        """
+        Show labels only for bodies inside the current axis limits.
+
+        Visibility is toggled only for labels whose state changed, and only
+        shown labels are moved, so the per-frame cost follows the number of
+        bodies on screen rather than the catalog size.
+        """
+        frame_xyz = self._frame_xyz
+        if frame_xyz is None:
+            return
+        if self._show_labels:
+            (x0, x1), (y0, y1), (z0, z1) = self.ax.get_xlim(), self.ax.get_ylim(), self.ax.get_zlim()
+            visible = np.all((frame_xyz >= [x0, y0, z0]) & (frame_xyz <= [x1, y1, z1]), axis=1)
+        else:
+            visible = np.zeros(len(frame_xyz), dtype=bool)
+        for i in np.flatnonzero(visible != self._label_visible):
+            self.body_labels[i].set_visible(visible[i])
+        self._label_visible = visible
+        for i in np.flatnonzero(visible):
+            self.body_labels[i].set_position_3d(frame_xyz[i], 'z')
+
+    def update(self, idx, show_orbits=True, show_labels=True):
+        """
+        Move every artist to a frame.
+
+        Args:
+            idx: Frame index (may be fractional)
+            show_orbits: Draw orbit trails
+            show_labels: Draw body labels
+
+        Returns:
+            (artists, frame_xyz): Updated artists and the (n_bodies, 3) positions at idx
+        """
+        eph = self.eph
+
+        # Calculate current simulation date
+        total_sim_days = eph.total_sim_days
+        days_elapsed = idx * eph.days_per_frame
+        current_date = self.start_date + timedelta(days=days_elapsed)
+
+        # Update date counter
+        self.date_text.set_text(f'Date: {current_date.strftime("%Y-%m-%d")}\n'
+                                f'Day {int(days_elapsed):,} of {int(total_sim_days):,}')
+
+        profiler = self.profiler
+
+        # Positions of all bodies at this frame (from the ring in lazy mode)
+        with profiler.section('positions'):
+            frame_xyz = eph.frame(idx)
+
+        # Bounded trail polylines for all bodies at once
+        with profiler.section('trails'):
+            self.trail_lines.set_visible(show_orbits)
+            if show_orbits:
+                self.trail_lines.set_segments(self.trail_renderer.trails(idx, frame_xyz))
+
+        # VECTORIZED: every marker moves with one offsets update. set_3d_properties
+        # copies the sizes the last draw left depth-sorted, so the body-ordered
+        # sizes are set again afterwards
+        with profiler.section('markers'):
+            self.markers.set_offsets(frame_xyz[:, :2])
+            self.markers.set_3d_properties(frame_xyz[:, 2], 'z')
+            self.markers.set_sizes(self._marker_sizes)
+
+        with profiler.section('labels'):
+            self._frame_xyz = frame_xyz
+            self._show_labels = show_labels
+            self._update_labels()
+
+        if self.profile_text is not None:
+            self.profile_text.set_text(profiler.summary())
+
+        artists = self.animated_artists()
+        return artists, frame_xyz
+
+
+class BlitManager:
+    """
+    Redraw a fixed set of artists over a cached copy of the static figure.
+
+    The artists are marked animated, so full draws leave them out; after every
+    full draw the canvas is copied as the background. update() restores that
+    copy, draws only the animated artists and blits the figure. Buttons, the
+    legend, panes and ticks are therefore rendered only when something really
+    changes: update() falls back to a full draw when the 3D camera (axis
+    limits, elevation, azimuth) or the window size differs from the one the
+    background was taken with, and any other full draw (button clicks, mouse
+    rotation, resize) refreshes the background through the draw_event.
+    """
+
+    def __init__(self, fig, ax, artists):
+        """
+        Args:
+            fig: Figure shown in a canvas that supports blitting
+            ax: 3D axes whose camera decides when the background is stale
+            artists: Artists to redraw every frame
+        """
+        self.fig = fig
+        self.ax = ax
+        self.canvas = fig.canvas
+        self.artists = list(artists)
+        self.background = None
+        self._view = None
+
+        for artist in self.artists:
+            artist.set_animated(True)
+        self._cid = self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _view_state(self):
+        ax = self.ax
+        return (ax.get_xlim(), ax.get_ylim(), ax.get_zlim(), ax.elev, ax.azim,
+                getattr(ax, 'roll', 0), tuple(self.fig.bbox.bounds))
+
+    def _on_draw(self, event):
+        """Take a new background after every full draw."""
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._view = self._view_state()
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self.artists:
+            self.fig.draw_artist(artist)
+
+    def update(self):
+        """Draw the current state of the artists, blitting when the camera is unchanged."""
+        if self.background is None or self._view_state() != self._view:
+            self.canvas.draw()  # _on_draw takes the new background
+        else:
+            self.canvas.restore_region(self.background)
+            self._draw_animated()
+            self.canvas.blit(self.fig.bbox)
+        self.canvas.flush_events()
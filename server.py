@@ -0,0 +1,479 @@
+"""
+Local ephemeris query service (asyncio, standard library HTTP).
+
+Tools that need positions query one long-running server instead of each
+importing the catalog and recomputing: the ephemeris is loaded (and its
+worker processes warmed up) once per host.
+
+    python server.py                          # http://127.0.0.1:8765
+    python server.py --unix /tmp/ephemeris.sock --workers 2 --chebyshev coefficients.npz
+
+Endpoints:
+
+    GET  /health                  -> {"status": "ok", ...}
+    GET  /bodies                  -> body names, parents and display properties
+    GET  /stats                   -> request, cache and pool counters
+    POST /positions               -> positions for bodies x times
+    GET  /positions?bodies=Earth,Mars&times=0,10.5
+
+A /positions query names bodies and gives times as days since the catalog
+epoch ("times"), Julian dates ("jd") or ISO dates ("dates"). The answer is
+JSON, or with "format": "npy" a NumPy .npy array of shape
+(n_bodies, n_times, 3) in AU:
+
+    {"bodies": ["Earth", "Mars"], "dates": ["2024-01-01T00:00:00"]}
+
+Encoded responses are kept in an LRU cache keyed by the query and bounded
+by entry count and total bytes, and identical queries in flight share one
+computation. Queries up to inline_elements bodies x times are answered on
+the event loop (well under a millisecond); larger ones are computed and
+encoded in the worker pool, so the loop keeps serving. fetch_positions()
+is a small client for other tools.
+"""
+import argparse
+import asyncio
+import io
+import json
+import time
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ephemeris import DEFAULT_CATALOG, Ephemeris, days_since_epoch
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Encoded responses kept by the LRU cache, and the bytes they may hold in total;
+# a response larger than the byte budget is never cached
+DEFAULT_CACHE_SIZE = 4096
+DEFAULT_CACHE_BYTES = 256 << 20
+
+# Largest query (bodies x times) answered on the event loop instead of the pool
+DEFAULT_INLINE_ELEMENTS = 4096
+
+# Largest accepted request body and query (bodies x times)
+MAX_REQUEST_BYTES = 64 << 20
+MAX_QUERY_ELEMENTS = 50_000_000
+
+FORMATS = ('json', 'npy')
+
+_STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+# ============================================================================
+# WORKER PROCESSES
+# ============================================================================
+
+_worker_ephemeris = None
+
+
+def _load_ephemeris(catalog_path, chebyshev_path=None):
+    eph = Ephemeris(lazy=True).load(catalog_path)
+    if chebyshev_path is not None:
+        eph.load_chebyshev(chebyshev_path)
+    return eph
+
+
+def _init_worker(catalog_path, chebyshev_path):
+    """Pool initializer: load the ephemeris once per worker process."""
+    global _worker_ephemeris
+    _worker_ephemeris = _load_ephemeris(catalog_path, chebyshev_path)
+
+
+def _respond(eph, bodies, days, fmt):
+    """Positions of a parsed query, encoded (run off the event loop for large queries)."""
+    return encode_positions(bodies, days, eph.positions(list(bodies), days), fmt)
+
+
+def _worker_respond(bodies, days, fmt):
+    return _respond(_worker_ephemeris, bodies, days, fmt)
+
+
+# ============================================================================
+# QUERIES
+# ============================================================================
+
+class QueryError(ValueError):
+    """A malformed or unanswerable query (reported as HTTP 400)."""
+
+
+def _content_length(headers):
+    """Request body length; QueryError unless Content-Length is absent or a non-negative integer."""
+    value = headers.get('content-length', '') or '0'
+    if not (value.isascii() and value.isdigit()):
+        raise QueryError(f"invalid Content-Length {value!r}")
+    return int(value)
+
+
+class ResponseCache:
+    """LRU cache of encoded (body, content type) responses, bounded by count and bytes."""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, value):
+        size = len(value[0])
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= len(old[0])
+        self.entries[key] = value
+        self.nbytes += size
+        # Evict least recently used entries until both limits hold
+        while len(self.entries) > self.max_entries or self.nbytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= len(evicted[0])
+
+
+def parse_query(query, eph):
+    """
+    Normalize a /positions query.
+
+    Args:
+        query: Dict with 'bodies' (name or list) and one of 'times' (days since
+            epoch), 'jd' (Julian dates) or 'dates' (ISO strings); optional 'format'
+        eph: Loaded Ephemeris (for body names and the epoch)
+
+    Returns:
+        (bodies, days, format): tuple of names, float array, 'json' or 'npy'
+
+    Raises:
+        QueryError: On missing or invalid fields
+    """
+    bodies = query.get('bodies')
+    if isinstance(bodies, str):
+        bodies = [b for b in bodies.split(',') if b]
+    if not bodies or not all(isinstance(b, str) for b in bodies):
+        raise QueryError("'bodies' must be a body name or a list of names")
+    unknown = [b for b in bodies if b not in eph.metadata]
+    if unknown:
+        raise QueryError(f"unknown body: {unknown[0]}")
+
+    given = [key for key in ('times', 'jd', 'dates') if key in query]
+    if len(given) != 1:
+        raise QueryError("give exactly one of 'times', 'jd' or 'dates'")
+    values = query[given[0]]
+    if isinstance(values, str):
+        values = [v for v in values.split(',') if v]
+    values = values if isinstance(values, list) else [values]
+    try:
+        if given[0] == 'dates':
+            days = days_since_epoch(np.array(values, dtype='datetime64[us]'), eph.epoch_date)
+        elif given[0] == 'jd':
+            days = days_since_epoch(np.array(values, dtype=float), eph.epoch_date)
+        else:
+            days = np.array(values, dtype=float)
+    except (TypeError, ValueError) as exc:
+        raise QueryError(f"invalid {given[0]!r}: {exc}") from None
+    days = np.atleast_1d(days).astype(float)
+    if not len(days) or not np.all(np.isfinite(days)):
+        raise QueryError(f"{given[0]!r} must be a non-empty list of finite values")
+    if len(bodies) * len(days) > MAX_QUERY_ELEMENTS:
+        raise QueryError(f"query too large: {len(bodies)} bodies x {len(days)} times")
+
+    fmt = query.get('format', 'json')
+    if fmt not in FORMATS:
+        raise QueryError(f"'format' must be one of {FORMATS}")
+    return tuple(bodies), days, fmt
+
+
+def encode_positions(bodies, days, xyz, fmt):
+    """Response body and content type for positions of shape (n_bodies, n_times, 3)."""
+    if fmt == 'npy':
+        buffer = io.BytesIO()
+        np.save(buffer, xyz)
+        return buffer.getvalue(), 'application/x-npy'
+    payload = {'bodies': list(bodies), 'times': days.tolist(), 'unit': 'au', 'positions': xyz.tolist()}
+    return json.dumps(payload, separators=(',', ':')).encode(), 'application/json'
+
+
+# ============================================================================
+# SERVER
+# ============================================================================
+
+class EphemerisServer:
+    """
+    Asyncio HTTP server answering position queries from one shared ephemeris.
+
+    Attributes:
+        eph: Ephemeris used for inline queries (lazy mode)
+        cache: ResponseCache of encoded responses
+        stats: Request counters (see GET /stats)
+    """
+
+    def __init__(self, catalog_path=DEFAULT_CATALOG, workers=1, cache_size=DEFAULT_CACHE_SIZE,
+                 chebyshev_path=None, inline_elements=DEFAULT_INLINE_ELEMENTS,
+                 cache_bytes=DEFAULT_CACHE_BYTES):
+        """
+        Args:
+            catalog_path: Celestial bodies JSON catalog
+            workers: Processes for large queries (0 = a thread of this process)
+            cache_size: Encoded responses kept in the LRU cache
+            chebyshev_path: Evaluate from Chebyshev coefficients saved by chebyshev.py
+            inline_elements: Largest bodies x times answered on the event loop
+            cache_bytes: Total size of the cached responses
+        """
+        self.eph = _load_ephemeris(catalog_path, chebyshev_path)
+        self.cache = ResponseCache(cache_size, cache_bytes)
+        self.inline_elements = inline_elements
+        self.workers = workers
+        self._executor = None
+        if workers:
+            self._executor = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                                 initargs=(catalog_path, chebyshev_path))
+        self._inflight = {}
+        self._server = None
+        self.started = time.time()
+        self.stats = {'requests': 0, 'queries': 0, 'inline': 0, 'pool': 0, 'shared': 0, 'errors': 0}
+
+    async def warm_up(self):
+        """Start every worker process and load its ephemeris before serving."""
+        if self._executor is None:
+            return
+        loop = asyncio.get_running_loop()
+        bodies, days = tuple(self.eph.bodies_list[:1]), np.array([0.0])
+        await asyncio.gather(*(loop.run_in_executor(self._executor, _worker_respond, bodies, days, 'npy')
+                               for _ in range(self.workers)))
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        """Warm up and start listening (TCP, or a Unix socket if unix_path is given)."""
+        await self.warm_up()
+        if unix_path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    async def serve_forever(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        server = await self.start(host, port, unix_path)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+
+    async def positions(self, query):
+        """
+        Encoded answer to a /positions query, from the cache when possible.
+
+        Returns:
+            (body bytes, content type)
+        """
+        bodies, days, fmt = parse_query(query, self.eph)
+        self.stats['queries'] += 1
+        key = (bodies, days.tobytes(), fmt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Identical queries already being computed share the result
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats['shared'] += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await self._respond(bodies, days, fmt)
+            self.cache.put(key, response)
+            future.set_result(response)
+            return response
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # Retrieved here so an unshared failure is not logged
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _respond(self, bodies, days, fmt):
+        """Computed and encoded response; large queries are both computed and encoded off the loop."""
+        if len(bodies) * len(days) <= self.inline_elements:
+            self.stats['inline'] += 1
+            return _respond(self.eph, bodies, days, fmt)
+        self.stats['pool'] += 1
+        loop = asyncio.get_running_loop()
+        if self._executor is None:
+            return await loop.run_in_executor(None, _respond, self.eph, bodies, days, fmt)
+        return await loop.run_in_executor(self._executor, _worker_respond, bodies, days, fmt)
+
+    def bodies(self):
+        return {'epoch': self.eph.epoch_date.isoformat(),
+                'bodies': [{'name': name, 'parent': info.parent, 'type': info.body_type,
+                            'color': info.color} for name, info in self.eph.metadata.items()]}
+
+    def stats_report(self):
+        return dict(self.stats, cache_entries=len(self.cache.entries), cache_bytes=self.cache.nbytes, cache_hits=self.cache.hits,
+                    cache_misses=self.cache.misses, workers=self.workers,
+                    uptime_s=time.time() - self.started)
+
+    async def _route(self, method, target, body):
+        """(status, body bytes, content type) for one request."""
+        url = urllib.parse.urlsplit(target)
+        if url.path == '/positions':
+            if method == 'POST':
+                try:
+                    query = json.loads(body or b'{}')
+                except ValueError as exc:
+                    raise QueryError(f"invalid JSON: {exc}") from None
+                if not isinstance(query, dict):
+                    raise QueryError("the request body must be a JSON object")
+            elif method == 'GET':
+                query = dict(urllib.parse.parse_qsl(url.query))
+            else:
+                return 405, b'{"error":"use GET or POST"}', 'application/json'
+            return (200, *await self.positions(query))
+
+        routes = {'/health': lambda: {'status': 'ok', 'bodies': len(self.eph.bodies_list)},
+                  '/bodies': self.bodies, '/stats': self.stats_report}
+        if url.path not in routes:
+            return 404, b'{"error":"not found"}', 'application/json'
+        if method != 'GET':
+            return 405, b'{"error":"use GET"}', 'application/json'
+        return 200, json.dumps(routes[url.path]()).encode(), 'application/json'
+
+    async def _handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until it closes (keep-alive)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                self.stats['requests'] += 1
+                try:
+                    length = _content_length(headers)
+                except QueryError as exc:
+                    length = None
+                    self.stats['errors'] += 1
+                    status, content_type = 400, 'application/json'
+                    body = json.dumps({'error': exc.args[0]}).encode()
+
+                # Without a usable length the body cannot be skipped, so the connection closes
+                if length is None:
+                    keep_alive = False
+                elif length > MAX_REQUEST_BYTES:
+                    status, body, content_type = 413, b'{"error":"request too large"}', 'application/json'
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    keep_alive = (headers.get('connection', '').lower() != 'close'
+                                  and version == 'HTTP/1.1')
+                    try:
+                        status, body, content_type = await self._route(method, target, body)
+                    except (QueryError, KeyError) as exc:
+                        self.stats['errors'] += 1
+                        message = exc.args[0] if exc.args else str(exc)
+                        status, content_type = 400, 'application/json'
+                        body = json.dumps({'error': message}).encode()
+                    except Exception as exc:  # Keep serving other requests
+                        self.stats['errors'] += 1
+                        status, content_type = 500, 'application/json'
+                        body = json.dumps({'error': f"{type(exc).__name__}: {exc}"}).encode()
+
+                writer.write(f"HTTP/1.1 {status} {_STATUS_TEXT[status]}\r\n"
+                             f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                             .encode('latin-1') + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+# ============================================================================
+# CLIENT
+# ============================================================================
+
+def fetch_positions(bodies, times=None, jd=None, dates=None, url=f'http://{DEFAULT_HOST}:{DEFAULT_PORT}',
+                    timeout=60):
+    """
+    Query a running server for positions.
+
+    Args:
+        bodies: Body name or list of names
+        times: Days since the catalog epoch (or give jd= Julian dates, or dates= ISO strings)
+        url: Server address
+        timeout: Seconds to wait for the answer
+
+    Returns:
+        Array of shape (n_bodies, n_times, 3) in AU
+    """
+    query = {'bodies': [bodies] if isinstance(bodies, str) else list(bodies), 'format': 'npy'}
+    for key, values in (('times', times), ('jd', jd), ('dates', dates)):
+        if values is not None:
+            query[key] = [str(v) for v in values] if key == 'dates' else np.atleast_1d(values).tolist()
+    request = urllib.request.Request(url.rstrip('/') + '/positions', data=json.dumps(query).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return np.load(io.BytesIO(response.read()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local ephemeris query server")
+    parser.add_argument('catalog', nargs='?', default=DEFAULT_CATALOG,
+                        help='celestial bodies JSON catalog (default: %(default)s)')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='TCP port (default: %(default)s)')
+    parser.add_argument('--unix', default=None, metavar='PATH',
+                        help='listen on a Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes for large queries (0 = a thread, default: %(default)s)')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE,
+                        help='responses kept in the LRU cache (default: %(default)s)')
+    parser.add_argument('--cache-bytes', type=int, default=DEFAULT_CACHE_BYTES,
+                        help='total size of the cached responses in bytes (default: %(default)s)')
+    parser.add_argument('--inline-elements', type=int, default=DEFAULT_INLINE_ELEMENTS,
+                        help='largest bodies x times answered without the pool (default: %(default)s)')
+    parser.add_argument('--chebyshev', default=None, metavar='FILE',
+                        help='evaluate from Chebyshev coefficients written by chebyshev.py')
+    args = parser.parse_args()
+
+    server = EphemerisServer(args.catalog, workers=args.workers, cache_size=args.cache_size,
+                             chebyshev_path=args.chebyshev, inline_elements=args.inline_elements,
+                             cache_bytes=args.cache_bytes)
+    where = args.unix or f"http://{args.host}:{args.port}"
+    print(f"Serving {len(server.eph.bodies_list)} bodies on {where} ({args.workers} worker processes)")
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
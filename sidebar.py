@@ -0,0 +1,262 @@
+"""
+Virtualized body browser for the 3D Solar System sidebar.
+
+The browser is one axes holding a fixed pool of row artists, however many
+bodies the catalog has. Scrolling and filtering only change which bodies
+those rows show, so building and drawing it costs the same for 40 or 1,000
+bodies. Every body is listed, moons indented under their parent:
+
+    - Click a row          - Focus on that body
+    - Scroll wheel         - Scroll the list
+    - Click the search box - Type to filter (or press '/'); matches full names,
+      so 'jupiter' lists Jupiter and its moons
+    - Up/Down, Enter       - Move through the matches and focus
+    - Escape               - Clear the filter and stop typing
+"""
+import numpy as np
+from matplotlib import rcParams
+from matplotlib.patches import Rectangle
+
+# Sidebar [left, bottom, width, height] in figure coordinates
+DEFAULT_RECT = (0.76, 0.22, 0.13, 0.71)
+
+# Height of one row (and of the search box) in figure coordinates
+ROW_HEIGHT = 0.035
+
+# Rows moved per scroll-wheel step
+SCROLL_ROWS = 3
+
+# Row colors (the same palette as the control buttons)
+ROW_COLOR = '#1a3a4a'
+SELECTED_COLOR = '#4a6a1a'
+CURSOR_COLOR = '#2a5a6a'
+SEARCH_COLOR = '#0a2030'
+TRACK_COLOR = '#0a1a24'
+THUMB_COLOR = '#3a5a6a'
+
+# Left edge of the scrollbar in axes coordinates (rows end just before it)
+SCROLLBAR_X = 0.94
+
+
+class BodyBrowser:
+    """
+    Scrollable, filterable list of every body in an Ephemeris.
+
+    Attributes:
+        ax: Axes holding the search box, rows and scrollbar
+        names: All body names in catalog order
+        visible: Indices into names of the bodies matching the filter
+        selected: Name of the focused body
+        query: Current filter text
+        typing: Whether keys go to the search box
+    """
+
+    def __init__(self, fig, eph, on_select, rect=DEFAULT_RECT, row_height=ROW_HEIGHT, selected='Sun'):
+        """
+        Args:
+            fig: Figure to add the browser to
+            eph: Loaded Ephemeris (bodies_list, parents and metadata are used)
+            on_select: Callback(name) when a body is chosen
+            rect: [left, bottom, width, height] in figure coordinates
+            row_height: Height of one row in figure coordinates
+            selected: Initially highlighted body
+        """
+        self.fig = fig
+        self.on_select = on_select
+        self.names = list(eph.bodies_list)
+        self.selected = selected
+        self.query = ''
+        self.typing = False
+        self.top = 0  # First visible match
+        self.cursor = 0  # Match highlighted for keyboard navigation
+        self._saved_keymaps = None
+
+        depth = {}
+        for name in self.names:
+            parent = eph.parents[name]
+            depth[name] = 0 if parent is None else depth[parent] + 1
+        self.labels = ['   ' * depth[name] + eph.metadata[name].name for name in self.names]
+        self.colors = [eph.metadata[name].color for name in self.names]
+        self._search_keys = np.array([name.lower() for name in self.names])
+        self.visible = np.arange(len(self.names))
+
+        # Row 0 is the search box; list rows follow, one unit of y each
+        self.n_rows = max(1, int(rect[3] / row_height) - 1)
+        self.ax = fig.add_axes(rect)
+        self.ax.set_xlim(0, 1)
+        self.ax.set_ylim(self.n_rows + 1, 0)
+        self.ax.set_axis_off()
+
+        self._search_box = self.ax.add_patch(Rectangle((0, 0.08), 1, 0.84, color=SEARCH_COLOR))
+        self._search_text = self.ax.text(0.04, 0.5, '', va='center', fontsize=9, color='white')
+        self._count_text = self.ax.text(0.96, 0.5, '', va='center', ha='right', fontsize=8, color='0.6')
+
+        self._row_patches, self._row_texts = [], []
+        for i in range(self.n_rows):
+            y = i + 1
+            self._row_patches.append(self.ax.add_patch(
+                Rectangle((0, y + 0.06), SCROLLBAR_X - 0.02, 0.88, color=ROW_COLOR)))
+            self._row_texts.append(self.ax.text(0.05, y + 0.5, '', va='center', fontsize=9,
+                                                clip_on=True))
+        self.ax.add_patch(Rectangle((SCROLLBAR_X, 1), 1 - SCROLLBAR_X, self.n_rows, color=TRACK_COLOR))
+        self._thumb = self.ax.add_patch(Rectangle((SCROLLBAR_X, 1), 1 - SCROLLBAR_X, 1, color=THUMB_COLOR))
+
+        fig.canvas.mpl_connect('button_press_event', self._on_click)
+        fig.canvas.mpl_connect('scroll_event', self._on_scroll)
+        self.render(draw=False)
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    def set_filter(self, query):
+        """Show only bodies whose full name contains query (case-insensitive)."""
+        self.query = query
+        if query:
+            # VECTORIZED: substring match over every name at once
+            self.visible = np.flatnonzero(np.char.find(self._search_keys, query.lower()) >= 0)
+        else:
+            self.visible = np.arange(len(self.names))
+        self.top = 0
+        self.cursor = 0
+        self.render()
+
+    def scroll(self, rows):
+        """Move the list by rows (positive = down), keeping it within the matches."""
+        self.top = int(np.clip(self.top + rows, 0, max(0, len(self.visible) - self.n_rows)))
+        self.render()
+
+    def select(self, name, notify=True):
+        """Highlight a body and, if notify, call on_select(name)."""
+        self.selected = name
+        self.render()
+        if notify:
+            self.on_select(name)
+
+    def _set_typing(self, typing):
+        """
+        Route keys to the search box. Matplotlib's own shortcuts ('q' quits,
+        's' saves, ...) are switched off meanwhile so typing cannot trigger them.
+        """
+        if typing == self.typing:
+            return
+        self.typing = typing
+        if typing:
+            self._saved_keymaps = {key: rcParams[key] for key in rcParams if key.startswith('keymap.')}
+            for key in self._saved_keymaps:
+                rcParams[key] = []
+        else:
+            rcParams.update(self._saved_keymaps)
+            self._saved_keymaps = None
+        self.render()
+
+    def _move_cursor(self, step):
+        if not len(self.visible):
+            return
+        self.cursor = int(np.clip(self.cursor + step, 0, len(self.visible) - 1))
+        # Keep the cursor on screen
+        if self.cursor < self.top:
+            self.top = self.cursor
+        elif self.cursor >= self.top + self.n_rows:
+            self.top = self.cursor - self.n_rows + 1
+        self.render()
+
+    # ------------------------------------------------------------------
+    # Drawing
+    # ------------------------------------------------------------------
+
+    def render(self, draw=True):
+        """Point the row artists at the matches from self.top and request a redraw."""
+        for i, (patch, text) in enumerate(zip(self._row_patches, self._row_texts)):
+            k = self.top + i
+            if k >= len(self.visible):
+                patch.set_visible(False)
+                text.set_text('')
+                continue
+            row = self.visible[k]
+            patch.set_visible(True)
+            if self.names[row] == self.selected:
+                patch.set_color(SELECTED_COLOR)
+            elif self.typing and k == self.cursor:
+                patch.set_color(CURSOR_COLOR)
+            else:
+                patch.set_color(ROW_COLOR)
+            text.set_text(self.labels[row])
+            text.set_color(self.colors[row])
+
+        if self.typing or self.query:
+            self._search_text.set_text(self.query + ('_' if self.typing else ''))
+            self._search_text.set_color('white')
+        else:
+            self._search_text.set_text("Search ('/')")
+            self._search_text.set_color('0.5')
+        self._search_box.set_edgecolor(CURSOR_COLOR if self.typing else SEARCH_COLOR)
+        self._count_text.set_text(f"{len(self.visible)}/{len(self.names)}" if self.query else '')
+
+        # Scrollbar thumb: the visible share of the matches
+        total = max(len(self.visible), 1)
+        height = min(1.0, self.n_rows / total) * self.n_rows
+        self._thumb.set_visible(len(self.visible) > self.n_rows)
+        self._thumb.set_y(1 + self.top / total * self.n_rows)
+        self._thumb.set_height(max(height, 0.5))
+        if draw:
+            self.fig.canvas.draw_idle()
+
+    # ------------------------------------------------------------------
+    # Events
+    # ------------------------------------------------------------------
+
+    def _on_click(self, event):
+        if event.inaxes is not self.ax:
+            if self.typing:
+                self._set_typing(False)
+            return
+        if event.ydata < 1:
+            self._set_typing(True)
+        elif event.xdata >= SCROLLBAR_X:
+            # Jump so the clicked point of the track is centred
+            fraction = (event.ydata - 1) / self.n_rows
+            self.scroll(int(fraction * len(self.visible) - self.n_rows / 2) - self.top)
+        else:
+            k = self.top + int(event.ydata) - 1
+            if k < len(self.visible):
+                self.cursor = k
+                self.select(self.names[self.visible[k]])
+
+    def _on_scroll(self, event):
+        if event.inaxes is self.ax:
+            self.scroll(-SCROLL_ROWS if event.button == 'up' else SCROLL_ROWS)
+
+    def handle_key(self, event):
+        """
+        Handle a key press meant for the browser.
+
+        Args:
+            event: Matplotlib key_press_event
+
+        Returns:
+            True if the key was used (the caller should ignore it)
+        """
+        key = event.key
+        if not self.typing:
+            if key == '/':
+                self._set_typing(True)
+                return True
+            return False
+
+        if key == 'escape':
+            self._set_typing(False)
+            self.set_filter('')
+        elif key == 'enter':
+            if len(self.visible):
+                self.select(self.names[self.visible[self.cursor]])
+            self._set_typing(False)
+        elif key == 'backspace':
+            self.set_filter(self.query[:-1])
+        elif key in ('up', 'down'):
+            self._move_cursor(-1 if key == 'up' else 1)
+        elif key in ('pageup', 'pagedown'):
+            self._move_cursor(-self.n_rows if key == 'pageup' else self.n_rows)
+        elif key is not None and len(key) == 1 and key.isprintable():
+            self.set_filter(self.query + key)
+        return True  # Swallow everything else (modifiers, shortcuts) while typing
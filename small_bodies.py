@@ -0,0 +1,234 @@
+"""
+Large-catalog mode: asteroids and comets as compact columnar arrays.
+
+Loads MPCORB-style (Minor Planet Center orbit file) or CSV orbital-element
+catalogs with 100k+ objects into a SmallBodyCatalog: one NumPy array per
+element and no Python object per body. Positions are propagated in chunks
+of bodies, so memory stays bounded by the chunk size and the number of
+bodies, not by the number of time steps.
+
+    from small_bodies import load_mpcorb
+
+    catalog = load_mpcorb('MPCORB.DAT')
+    for day, xyz in catalog.iter_positions(np.arange(0, 365, 1.0)):
+        ...  # xyz is (n_bodies, 3) in AU
+"""
+import numpy as np
+from datetime import datetime
+
+from ephemeris import DEFAULT_EPOCH, OrbitalElements, datetime_to_jd, propagate_batch
+
+# Bodies propagated per pass (bounds the size of temporaries)
+DEFAULT_CHUNK_BODIES = 65536
+
+# Time steps propagated together by iter_positions
+DEFAULT_TIME_BLOCK = 16
+
+# Mean motion of a massless body around the Sun at 1 AU (Gaussian constant, degrees per day)
+GAUSSIAN_MEAN_MOTION_DEG = np.degrees(0.01720209895)
+
+# MPCORB fixed-width columns (0-based, end-exclusive) from the MPC format description
+MPCORB_COLUMNS = {
+    'designation': (0, 7),
+    'H': (8, 13),
+    'epoch': (20, 25),
+    'M': (26, 35),
+    'peri': (37, 46),
+    'node': (48, 57),
+    'i': (59, 68),
+    'e': (70, 79),
+    'n': (80, 91),
+    'a': (92, 103),
+    'name': (166, 194),
+}
+
+
+def _mpc_digit(c):
+    """Decode one packed MPC character: '0'-'9' -> 0-9, 'A'-'V' -> 10-31."""
+    return int(c, 36)
+
+
+def unpack_mpc_epoch(packed):
+    """
+    Decode a packed MPC epoch such as 'K205V' (2020-05-31).
+
+    Args:
+        packed: Five-character packed date (century letter, year, month, day)
+
+    Returns:
+        Datetime of the epoch at 0h TT
+    """
+    century = {'I': 1800, 'J': 1900, 'K': 2000}[packed[0]]
+    return datetime(century + int(packed[1:3]), _mpc_digit(packed[3]), _mpc_digit(packed[4]))
+
+
+class SmallBodyCatalog:
+    """
+    Columnar catalog of small bodies propagated as one batch.
+
+    Attributes:
+        names: Array of designations (numpy unicode array)
+        elements: OrbitalElements with mean anomalies referred to epoch_date
+        H: Absolute magnitudes (NaN where unknown)
+        epoch_date: Epoch that day offsets passed to positions() are measured from
+    """
+
+    def __init__(self, names, elements, H=None, epoch_date=None):
+        self.names = np.asarray(names)
+        self.elements = elements
+        self.H = np.full(len(elements), np.nan) if H is None else np.asarray(H, dtype=float)
+        self.epoch_date = epoch_date or datetime.fromisoformat(DEFAULT_EPOCH)
+
+    def __len__(self):
+        return len(self.elements)
+
+    def positions(self, days, chunk_bodies=DEFAULT_CHUNK_BODIES, dtype=np.float64, workers=1):
+        """
+        Heliocentric positions of every body at one or more times.
+
+        Args:
+            days: Days since epoch_date - scalar or array of n_times
+            chunk_bodies: Bodies propagated per pass
+            dtype: Output dtype (float32 halves memory for density studies)
+            workers: Processes to split the body set across (1 = serial, None = all CPUs)
+
+        Returns:
+            Array of shape (n_bodies, 3) for a scalar time, else (n_bodies, n_times, 3)
+        """
+        scalar = np.ndim(days) == 0
+        days = np.atleast_1d(np.asarray(days, dtype=float))
+
+        out = np.empty((len(self), len(days), 3), dtype=dtype)
+        if workers == 1:
+            for start in range(0, len(self), chunk_bodies):
+                chunk = slice(start, start + chunk_bodies)
+                propagate_batch(self.elements[chunk], days, out=out[chunk])
+        else:
+            from parallel import propagate_parallel
+            propagate_parallel(self.elements, days, workers=workers, split='bodies', out=out)
+
+        return out[:, 0, :] if scalar else out
+
+    def iter_positions(self, times, time_block=DEFAULT_TIME_BLOCK,
+                       chunk_bodies=DEFAULT_CHUNK_BODIES, dtype=np.float64, workers=1):
+        """
+        Yield positions of every body one time step at a time.
+
+        Args:
+            times: Days since epoch_date
+            time_block: Time steps propagated together per pass
+            chunk_bodies: Bodies propagated per pass
+            dtype: Output dtype
+            workers: Processes to split the body set across (1 = serial, None = all CPUs)
+
+        Yields:
+            (day, xyz) with xyz of shape (n_bodies, 3)
+        """
+        times = np.asarray(times, dtype=float)
+        for start in range(0, len(times), time_block):
+            block = times[start:start + time_block]
+            xyz = self.positions(block, chunk_bodies=chunk_bodies, dtype=dtype, workers=workers)
+            for k, day in enumerate(block):
+                yield day, xyz[:, k, :]
+
+
+def _elements_at_epoch(a, e, i, node, peri, M, n, element_jd, epoch_date):
+    """OrbitalElements with mean anomalies advanced from each element epoch to epoch_date."""
+    dt = datetime_to_jd(epoch_date) - element_jd
+    M0 = (M + n * dt) % 360.0
+    return OrbitalElements(a=a, e=e, inc=i, Omega=node, omega=peri, M0=M0, period=360.0 / n)
+
+
+def load_mpcorb(path, epoch_date=None, max_eccentricity=0.99):
+    """
+    Load an MPCORB-format orbit file (e.g. MPCORB.DAT from the Minor Planet Center).
+
+    Header lines, blank lines and records with hyperbolic or near-parabolic
+    orbits (e >= max_eccentricity) are skipped.
+
+    Args:
+        path: Path to the fixed-width orbit file
+        epoch_date: Simulation epoch (defaults to ephemeris.DEFAULT_EPOCH)
+        max_eccentricity: Largest eccentricity kept (Kepler ellipses only)
+
+    Returns:
+        SmallBodyCatalog
+    """
+    epoch_date = epoch_date or datetime.fromisoformat(DEFAULT_EPOCH)
+
+    with open(path, 'r', encoding='ascii', errors='replace') as f:
+        lines = f.read().splitlines()
+
+    # MPCORB.DAT starts with a text header terminated by a line of dashes
+    for k, line in enumerate(lines):
+        if line.startswith('-----'):
+            lines = lines[k + 1:]
+            break
+    lines = [line for line in lines if len(line) >= MPCORB_COLUMNS['a'][1]]
+
+    def column(key, dtype=float):
+        lo, hi = MPCORB_COLUMNS[key]
+        values = [line[lo:hi].strip() for line in lines]
+        if dtype is float:
+            return np.array([v or 'nan' for v in values], dtype=float)
+        return np.array(values)
+
+    e = column('e')
+    n = column('n')
+    keep = (e < max_eccentricity) & (n > 0)
+
+    # Few distinct epochs appear in a catalog, so decode each one only once
+    packed, inverse = np.unique(column('epoch', str), return_inverse=True)
+    element_jd = np.array([datetime_to_jd(unpack_mpc_epoch(p)) for p in packed])[inverse]
+
+    names = column('name', str)
+    designations = column('designation', str)
+    names = np.where(names == '', designations, names)
+
+    elements = _elements_at_epoch(column('a')[keep], e[keep], column('i')[keep],
+                                  column('node')[keep], column('peri')[keep], column('M')[keep],
+                                  n[keep], element_jd[keep], epoch_date)
+    return SmallBodyCatalog(names[keep], elements, H=column('H')[keep], epoch_date=epoch_date)
+
+
+def load_csv(path, epoch_date=None):
+    """
+    Load a CSV orbital-element catalog with a header row.
+
+    Required columns: name, a (AU), e, i, node, peri, M (degrees).
+    Optional columns: epoch (Julian date of the elements, default epoch_date),
+    n (mean daily motion in degrees/day, default from Kepler's third law), H.
+
+    Args:
+        path: Path to the CSV file
+        epoch_date: Simulation epoch (defaults to ephemeris.DEFAULT_EPOCH)
+
+    Returns:
+        SmallBodyCatalog
+    """
+    epoch_date = epoch_date or datetime.fromisoformat(DEFAULT_EPOCH)
+
+    table = np.genfromtxt(path, delimiter=',', names=True, dtype=None, encoding='utf-8',
+                          autostrip=True)
+    table = np.atleast_1d(table)
+    columns = table.dtype.names
+
+    missing = [c for c in ('name', 'a', 'e', 'i', 'node', 'peri', 'M') if c not in columns]
+    if missing:
+        raise ValueError(f"{path}: missing required columns {missing}")
+
+    a = table['a'].astype(float)
+    if 'n' in columns:
+        n = table['n'].astype(float)
+    else:
+        n = GAUSSIAN_MEAN_MOTION_DEG / a**1.5
+    if 'epoch' in columns:
+        element_jd = table['epoch'].astype(float)
+    else:
+        element_jd = np.full(len(a), datetime_to_jd(epoch_date))
+
+    elements = _elements_at_epoch(a, table['e'].astype(float), table['i'].astype(float),
+                                  table['node'].astype(float), table['peri'].astype(float),
+                                  table['M'].astype(float), n, element_jd, epoch_date)
+    H = table['H'].astype(float) if 'H' in columns else None
+    return SmallBodyCatalog(table['name'].astype(str), elements, H=H, epoch_date=epoch_date)
@@ -0,0 +1,101 @@
+"""
+Compact storage for precomputed trajectories and per-body metadata.
+
+TrajectoryStore keeps every body's positions in one contiguous
+(n_bodies, n_frames, 3) array, float64 for analysis or float32 for display
+(half the memory). Gathering all bodies at a frame or over a range of frames
+is a single slice that returns a view, not a Python loop over bodies.
+
+BodyInfo holds a body's display metadata in a __slots__ record instead of
+a per-body dict.
+"""
+import numpy as np
+
+
+class BodyInfo:
+    """Display metadata of one body."""
+
+    __slots__ = ('name', 'color', 'marker_size', 'body_type', 'parent', 'is_primary')
+
+    def __init__(self, name, color, marker_size, body_type, parent):
+        """
+        Args:
+            name: Display name (moons without the 'Parent_' prefix)
+            color: Matplotlib color
+            marker_size: Marker size from the catalog
+            body_type: 'star', 'planet', 'moon', ... ('unknown' if not given)
+            parent: Full name of the parent body (None for primaries)
+        """
+        self.name = name
+        self.color = color
+        self.marker_size = marker_size
+        self.body_type = body_type
+        self.parent = parent
+        self.is_primary = parent is None
+
+    def __repr__(self):
+        return (f"BodyInfo(name={self.name!r}, color={self.color!r}, "
+                f"body_type={self.body_type!r}, parent={self.parent!r})")
+
+
+class TrajectoryStore:
+    """
+    Positions of many bodies on a shared frame grid, as one (n_bodies, n_frames, 3) array.
+
+    Attributes:
+        names: Body names, one per row
+        index: Body name -> row
+        xyz: The (n_bodies, n_frames, 3) position array
+    """
+
+    def __init__(self, names, xyz):
+        """
+        Args:
+            names: Body names, one per row of xyz
+            xyz: Array of shape (n_bodies, n_frames, 3)
+        """
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.xyz = xyz
+
+    @classmethod
+    def empty(cls, names, n_frames, dtype=np.float64):
+        """Uninitialized store for n_frames frames of the given bodies."""
+        names = list(names)
+        return cls(names, np.empty((len(names), n_frames, 3), dtype=dtype))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __getitem__(self, name):
+        """(n_frames, 3) view of one body's track."""
+        return self.xyz[self.index[name]]
+
+    @property
+    def n_frames(self):
+        return self.xyz.shape[1]
+
+    @property
+    def dtype(self):
+        return self.xyz.dtype
+
+    @property
+    def nbytes(self):
+        return self.xyz.nbytes
+
+    def frame(self, idx):
+        """(n_bodies, 3) view of every body at one frame."""
+        return self.xyz[:, idx]
+
+    def window(self, start, stop, step=1):
+        """(n_bodies, n, 3) view of every body over a range of frames."""
+        return self.xyz[:, start:stop:step]
+
+    def astype(self, dtype):
+        """Store with positions converted to dtype (self if already dtype)."""
+        if self.xyz.dtype == dtype:
+            return self
+        return TrajectoryStore(self.names, self.xyz.astype(dtype))
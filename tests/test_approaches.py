@@ -0,0 +1,46 @@
+"""
+Tests for the close-approach search in approaches.py.
+
+Run from the repository root with: python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from approaches import _Search  # noqa: E402
+
+
+def _flyby_search(t_min, miss=1e-3, fine_days=0.3):
+    """Search over a fixed body and one passing it in a straight line at t_min."""
+    def sample(names, days):
+        xyz = np.zeros((len(names), len(days), 3))
+        for n, name in enumerate(names):
+            if name == 'B':
+                xyz[n, :, 0] = days - t_min
+                xyz[n, :, 1] = miss
+        return xyz
+
+    def padding(xyz, dt):
+        return np.full(len(xyz), dt)
+
+    return _Search(None, ['A', 'B'], sample, padding, np.full(2, fine_days), np.ones((2, 2), dtype=bool))
+
+
+@pytest.mark.parametrize('t_min', [10.0, 10.0 - 1e-9, 10.0 + 1e-9, 9.95, 10.05, 20.0, 19.9])
+def test_encounter_straddling_block_boundary_reported_once(t_min):
+    # 1-day coarse steps in 10-day blocks: the minimum sits on or next to a block
+    # boundary, and the 0.3-day fine step does not divide the block
+    found = _flyby_search(t_min).run(0.01, 0.0, 30.0, coarse_days=1.0, block_steps=10)
+    assert len(found) == 1
+    a, b, day, sep, rate = found[0]
+    assert day == pytest.approx(t_min, abs=1e-6)
+    assert sep == pytest.approx(1e-3, rel=1e-6)
+
+
+def test_encounter_inside_block_reported_once():
+    found = _flyby_search(14.2).run(0.01, 0.0, 30.0, coarse_days=1.0, block_steps=10)
+    assert len(found) == 1
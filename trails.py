@@ -0,0 +1,133 @@
+"""
+Orbit-trail polylines for the 3D Solar System animation.
+
+Every policy keeps the number of points per trail bounded, so the per-frame
+draw cost stays flat no matter how far the simulation has run:
+
+    'lod'   - Whole history since frame 0, decimated to at most max_points
+    'tail'  - Only the last tail_days of motion, decimated to at most max_points
+    'orbit' - One closed orbit per body, computed once (moons follow their parent)
+"""
+import numpy as np
+
+from ephemeris import calculate_3d_position
+
+TRAIL_POLICIES = ('lod', 'tail', 'orbit')
+DEFAULT_TRAIL_POLICY = 'lod'
+
+DEFAULT_MAX_POINTS = 512
+DEFAULT_TAIL_DAYS = 365.0
+
+
+def _power_of_two_stride(n_frames, max_points):
+    """Smallest power-of-two stride that fits n_frames into max_points samples."""
+    return 1 << max(0, int(np.ceil(np.log2(n_frames / max_points))))
+
+
+class TrailRenderer:
+    """
+    Computes bounded orbit-trail polylines from an Ephemeris.
+
+    Decimated policies use power-of-two strides aligned to absolute frame
+    indices, so trail points stay put from one frame to the next instead of
+    shimmering as the history grows.
+    """
+
+    def __init__(self, eph, policy=DEFAULT_TRAIL_POLICY, max_points=DEFAULT_MAX_POINTS,
+                 tail_days=DEFAULT_TAIL_DAYS):
+        """
+        Args:
+            eph: Loaded Ephemeris (precompute or lazy mode)
+            policy: One of TRAIL_POLICIES
+            max_points: Maximum points per trail ('lod' and 'tail'), or per closed orbit ('orbit')
+            tail_days: Length of the trail in simulated days ('tail')
+        """
+        if policy not in TRAIL_POLICIES:
+            raise ValueError(f"Unknown trail policy {policy!r}, expected one of {TRAIL_POLICIES}")
+
+        self.eph = eph
+        self.policy = policy
+        self.max_points = max_points
+        self.tail_frames = max(1, int(round(tail_days / eph.days_per_frame)))
+        self._cache = None  # (start, stride, xyz) of the last history window
+
+        if policy == 'orbit':
+            self._build_orbits()
+
+    def _build_orbits(self):
+        """Closed orbit of every body relative to its parent, sampled evenly in true anomaly."""
+        eph = self.eph
+        nu = np.linspace(0.0, 2.0 * np.pi, self.max_points)
+
+        self._orbits = np.empty((len(eph.bodies_list), len(nu), 3))
+        for i, name in enumerate(eph.bodies_list):
+            props = eph.body_props[name]
+            self._orbits[i] = np.stack(calculate_3d_position(
+                nu, props['rad'], props['eccentricity'],
+                props.get('inclination', 0.0),
+                props.get('argumentOfPeriapsis', 0.0),
+                props.get('longitudeOfAscendingNode', 0.0)), axis=-1)
+
+        row = {name: i for i, name in enumerate(eph.bodies_list)}
+        moons = [name for name in eph.bodies_list if eph.parents[name] is not None]
+        self._moon_rows = np.array([row[name] for name in moons], dtype=int)
+        self._parent_rows = np.array([row[eph.parents[name]] for name in moons], dtype=int)
+
+    def trails(self, idx, frame_xyz):
+        """
+        Trail polylines for every body at a frame.
+
+        Args:
+            idx: Current frame index (may be fractional)
+            frame_xyz: (n_bodies, 3) positions at idx, as returned by Ephemeris.frame
+
+        Returns:
+            Array of shape (n_bodies, n_points, 3), rows in bodies_list order
+        """
+        if self.policy == 'orbit':
+            # Moon orbits are drawn around their parent's current position
+            offsets = np.zeros_like(frame_xyz)
+            offsets[self._moon_rows] = frame_xyz[self._parent_rows]
+            return self._orbits + offsets[:, None, :]
+
+        # History is sampled on whole frames; the current position closes the trail
+        idx = int(idx)
+        if self.policy == 'tail':
+            start = max(0, idx - self.tail_frames)
+            stride = max(1, int(np.ceil(self.tail_frames / self.max_points)))
+        else:
+            start = 0
+            stride = _power_of_two_stride(idx + 1, self.max_points)
+
+        # Align to the stride so samples land on the same frames every tick,
+        # then finish the trail exactly at the current position
+        start = (start // stride) * stride
+        history = self._history(start, idx + 1, stride)
+        return np.concatenate([history, frame_xyz[:, None, :]], axis=1)
+
+    def _history(self, start, stop, stride):
+        """
+        eph.window(start, stop, stride), reusing the samples of the previous tick.
+
+        Frames are aligned to the stride, so while the animation plays the new
+        window overlaps the cached one (at the same stride, or a multiple of it
+        once the 'lod' stride doubles) and only frames past its end are solved -
+        usually none or one per tick instead of up to max_points.
+        """
+        cached = self._cache
+        if cached is not None:
+            c_start, c_stride, c_xyz = cached
+            ratio, rem = divmod(stride, c_stride)
+            if ratio and not rem and start >= c_start and (start - c_start) % c_stride == 0:
+                # Cached frames that belong to the new window, then the missing tail
+                reuse = c_xyz[:, (start - c_start) // c_stride::ratio]
+                reuse = reuse[:, :len(range(start, stop, stride))]
+                tail_start = start + reuse.shape[1] * stride
+                if tail_start < stop:
+                    reuse = np.concatenate([reuse, self.eph.window(tail_start, stop, stride)], axis=1)
+                self._cache = (start, stride, reuse)
+                return reuse
+
+        history = self.eph.window(start, stop, stride)
+        self._cache = (start, stride, history)
+        return history
@@ -0,0 +1,256 @@
+"""
+Accuracy validation for the Kepler solver.
+
+Compares solve_kepler_equation_vectorized against a high-precision reference
+(bisection refined in extended precision, independent of the solver under
+test) and turns the eccentric-anomaly error into a position error in km:
+
+- bands: random and near-periapsis mean anomalies in eccentricity bands
+  from circular to 0.999, for each target accuracy, at a = 1 AU (tolerances
+  scale as 1/a, so the km error is about the same at any distance)
+- catalog: every body of the catalog with its own semi-major axis, solved
+  with the per-body tolerances Ephemeris(accuracy_km=...) would use, plus
+  the float32 storage rounding that the display store adds on top
+
+Every case reports the Newton iterations spent, so the cheapest setting that
+still meets a requirement can be read off. Results are JSON (stdout or
+--output); the exit status is 1 if any target was missed.
+
+    python validation.py
+    python validation.py --accuracy-km 0.1 1 10 --output validation.json
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from ephemeris import (AU_KM, DEFAULT_CATALOG, DEFAULT_KEPLER_TOLERANCE, Ephemeris, kepler_tolerance,
+                       solve_kepler_equation_vectorized)
+
+SUITES = ('bands', 'catalog')
+
+# Eccentricity bands validated by the bands suite, up to near-parabolic orbits
+ECCENTRICITY_RANGES = ((0.0, 0.1), (0.1, 0.5), (0.5, 0.8), (0.8, 0.95), (0.95, 0.99), (0.99, 0.999))
+
+DEFAULT_ACCURACIES_KM = (0.01, 0.1, 1.0, 10.0, 100.0)
+DEFAULT_SAMPLES = 200_000
+
+# Bisection halvings for the reference: the float64 bracket [M - e, M + e]
+# shrinks to adjacent floats well before this
+REFERENCE_BISECTIONS = 64
+
+# Newton steps in extended precision after the bisection
+REFERENCE_NEWTON_STEPS = 2
+
+
+def reference_eccentric_anomaly(M, e):
+    """
+    High-precision eccentric anomaly, independent of the solver under test.
+
+    E - e*sin(E) is increasing and |E - M| <= e, so bisection on [M - e, M + e]
+    always converges; it runs in float64 down to adjacent floats, then Newton
+    steps in np.longdouble (starting within 1e-15 rad, so each one squares
+    the error) reach about 1e-19 rad where longdouble is 80-bit (x86) and
+    float64 resolution where it is not.
+
+    Args:
+        M: Mean anomalies (radians)
+        e: Eccentricities (< 1), broadcastable to M
+
+    Returns:
+        E as np.longdouble, shape of M
+    """
+    M = np.asarray(M, dtype=float)
+    e = np.broadcast_to(np.asarray(e, dtype=float), M.shape)
+    lo, hi = M - e, M + e
+    for _ in range(REFERENCE_BISECTIONS):
+        mid = (lo + hi) / 2
+        above = mid - e * np.sin(mid) > M
+        hi = np.where(above, mid, hi)
+        lo = np.where(above, lo, mid)
+
+    E = ((lo + hi) / 2).astype(np.longdouble)
+    M, e = M.astype(np.longdouble), e.astype(np.longdouble)
+    for _ in range(REFERENCE_NEWTON_STEPS):
+        E -= (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+    return E
+
+
+def position_error_km(E, E_ref, a, e):
+    """Distance in km between in-plane positions at E and E_ref on an ellipse of a (AU), e."""
+    E = np.asarray(E, dtype=np.longdouble)
+    a = np.asarray(a, dtype=np.longdouble)
+    e = np.asarray(e, dtype=np.longdouble)
+    b = a * np.sqrt(1 - e**2)
+    dx = a * (np.cos(E) - np.cos(E_ref))
+    dy = b * (np.sin(E) - np.sin(E_ref))
+    return np.asarray(np.hypot(dx, dy) * AU_KM, dtype=float)
+
+
+def mean_anomaly_samples(samples, rng):
+    """Uniform mean anomalies plus log-spaced ones on both sides of periapsis, where E converges slowest."""
+    n_near = min(samples // 4, 2000)
+    near = np.logspace(-12, -1, n_near // 2)
+    return np.concatenate([[0.0], near, 2 * np.pi - near, rng.uniform(0, 2 * np.pi, samples - n_near - 1)])
+
+
+def _solve_case(M, e, E_ref, tolerance, a, max_iterations=100):
+    """Solve, time and compare one set of anomalies against the reference E_ref."""
+    t0 = time.perf_counter()
+    E, iterations, converged = solve_kepler_equation_vectorized(
+        M, e, tolerance, max_iterations, return_iterations=True, return_converged=True)
+    seconds = time.perf_counter() - t0
+    err = position_error_km(E, E_ref, a, e)
+    return {
+        'max_error_km': float(err.max()), 'p99_error_km': float(np.percentile(err, 99)),
+        'mean_iterations': float(iterations.mean()), 'max_iterations': int(iterations.max()),
+        'unconverged': int((~converged).sum()), 'ns_per_solve': seconds / len(M) * 1e9,
+    }
+
+
+def validate_bands(accuracies_km=DEFAULT_ACCURACIES_KM, samples=DEFAULT_SAMPLES, seed=0):
+    """
+    Solver error per eccentricity band for each target accuracy (a = 1 AU).
+
+    A row with accuracy_km None uses the fixed DEFAULT_KEPLER_TOLERANCE.
+
+    Args:
+        accuracies_km: Target accuracies (km)
+        samples: Mean anomalies per band
+        seed: Random seed
+
+    Returns:
+        List of result dicts, one per (band, accuracy)
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for lo, hi in ECCENTRICITY_RANGES:
+        M = mean_anomaly_samples(samples, rng)
+        e = rng.uniform(lo, hi, len(M))
+        E_ref = reference_eccentric_anomaly(M, e)
+        for accuracy in (None,) + tuple(accuracies_km):
+            tolerance = DEFAULT_KEPLER_TOLERANCE if accuracy is None else float(kepler_tolerance(1.0, accuracy))
+            row = {'e_min': lo, 'e_max': hi, 'accuracy_km': accuracy, 'tolerance': tolerance,
+                   'samples': len(M)}
+            row.update(_solve_case(M, e, E_ref, tolerance, 1.0))
+            row['meets_target'] = accuracy is None or (row['max_error_km'] <= accuracy
+                                                       and row['unconverged'] == 0)
+            results.append(row)
+    return results
+
+
+def validate_catalog(catalog_path=DEFAULT_CATALOG, accuracies_km=(1.0,), samples=DEFAULT_SAMPLES // 10,
+                     seed=0):
+    """
+    Solver error for every catalog body with its per-body tolerance.
+
+    Args:
+        catalog_path: Path to the celestial bodies JSON catalog
+        accuracies_km: Target accuracies (km); None uses the fixed default tolerance
+        samples: Mean anomalies per body
+        seed: Random seed
+
+    Returns:
+        List of result dicts, one per (accuracy, body); Newton iterations are
+        summed over the catalog in 'total_mean_iterations' of the first row of
+        each accuracy
+    """
+    eph = Ephemeris(lazy=True).load(catalog_path)
+    rng = np.random.default_rng(seed)
+    M = mean_anomaly_samples(samples, rng)
+    float32_eps = float(np.finfo(np.float32).eps)
+    references = {}
+
+    results = []
+    for accuracy in (None,) + tuple(accuracies_km):
+        elements = eph.elements.with_accuracy(accuracy)
+        rows = []
+        for i, name in enumerate(eph.bodies_list):
+            if elements.period[i] <= 0:
+                continue  # Fixed body (the Sun): nothing to solve
+            a, e = elements.a[i], elements.e[i]
+            tolerance = DEFAULT_KEPLER_TOLERANCE if elements.tolerance is None else elements.tolerance[i]
+            row = {'body': name, 'accuracy_km': accuracy, 'a_au': float(a), 'e': float(e),
+                   'tolerance': float(tolerance)}
+            if name not in references:
+                references[name] = reference_eccentric_anomaly(M, e)
+            row.update(_solve_case(M, e, references[name], tolerance, a))
+            row['meets_target'] = accuracy is None or (row['max_error_km'] <= accuracy
+                                                       and row['unconverged'] == 0)
+            # Upper bound of the float32 store's rounding on a parent-relative position
+            row['float32_store_km'] = a * (1 + e) * AU_KM * float32_eps / 2 * np.sqrt(3)
+            rows.append(row)
+        rows[0]['total_mean_iterations'] = sum(row['mean_iterations'] for row in rows)
+        results.extend(rows)
+    return results
+
+
+def run(suites=SUITES, catalog_path=DEFAULT_CATALOG, accuracies_km=DEFAULT_ACCURACIES_KM,
+        samples=DEFAULT_SAMPLES, progress=None):
+    """
+    Run the selected suites.
+
+    Returns:
+        Dict with 'settings', one result list per suite and 'passed'
+    """
+    report = {'settings': {'suites': list(suites), 'accuracies_km': list(accuracies_km),
+                           'samples': samples, 'longdouble_eps': float(np.finfo(np.longdouble).eps)}}
+    for suite in suites:
+        if progress is not None:
+            progress(suite)
+        if suite == 'bands':
+            report['bands'] = validate_bands(accuracies_km, samples)
+        elif suite == 'catalog':
+            report['catalog'] = validate_catalog(catalog_path, accuracies_km, max(1000, samples // 10))
+        else:
+            raise ValueError(f"unknown suite {suite!r}, expected one of {SUITES}")
+    report['passed'] = all(row['meets_target'] for suite in suites for row in report[suite])
+    return report
+
+
+def _summarize(report):
+    """Worst case per accuracy and suite, one line each."""
+    lines = []
+    for suite in SUITES:
+        for accuracy in [None] + report['settings']['accuracies_km']:
+            rows = [row for row in report.get(suite, []) if row['accuracy_km'] == accuracy]
+            if not rows:
+                continue
+            worst = max(rows, key=lambda row: row['max_error_km'])
+            where = worst['body'] if suite == 'catalog' else f"e {worst['e_min']}-{worst['e_max']}"
+            target = 'default tolerance' if accuracy is None else f'{accuracy:g} km'
+            status = '' if accuracy is None else ('ok' if all(r['meets_target'] for r in rows) else 'MISSED')
+            iterations = np.mean([row['mean_iterations'] for row in rows])
+            lines.append(f"{suite:>7} @ {target:>17}: worst {worst['max_error_km']:.3g} km ({where}), "
+                         f"{iterations:.2f} Newton steps on average  {status}")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Validate Kepler solver accuracy against a high-precision reference")
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG,
+                        help='celestial bodies JSON catalog (default: %(default)s)')
+    parser.add_argument('--suite', action='append', choices=SUITES, default=None,
+                        help='suite to run, may be repeated (default: all)')
+    parser.add_argument('--accuracy-km', type=float, nargs='+', default=list(DEFAULT_ACCURACIES_KM),
+                        help='target position accuracies in km (default: 0.01 0.1 1 10 100)')
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES,
+                        help='mean anomalies per eccentricity band (catalog: a tenth per body) '
+                             '(default: %(default)s)')
+    parser.add_argument('--output', default=None, metavar='FILE',
+                        help='write the JSON report to FILE (default: stdout)')
+    args = parser.parse_args()
+
+    report = run(args.suite or SUITES, catalog_path=args.catalog, accuracies_km=args.accuracy_km,
+                 samples=args.samples, progress=lambda suite: print(f"Running {suite}...", file=sys.stderr))
+    print(_summarize(report), file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Wrote {args.output}", file=sys.stderr)
+    sys.exit(0 if report['passed'] else 1)